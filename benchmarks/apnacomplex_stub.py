@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import uuid
+import pathlib
+import datetime
+import threading
+from email.utils import formatdate
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(pathlib.Path(__file__).parent, "fixtures")
+
+
+def loadFixture(fileName: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, fileName)) as fixtureFile:
+        return fixtureFile.read()
+
+
+class ApnaComplexStub:
+    def __init__(
+        self,
+        email: str = "user@example.com",
+        password: str = "secret",
+        latency: float = 0.0,
+        clockSkew: float = 0.0,
+        assetSize: int = 200000,
+    ) -> None:
+        self.email = email
+        self.password = password
+        # Seconds added to every response and to the server clock respectively
+        self.latency = latency
+        self.clockSkew = clockSkew
+        # Bytes per stylesheet, image and font the pages pull in
+        self.assetSize = assetSize
+        self.sessions: set = set()
+        self.requestLog: list = list()
+        self.facilityData = json.loads(loadFixture("events.json"))
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.getHandlerClass())
+        self.serverThread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def baseURL(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self) -> "ApnaComplexStub":
+        self.serverThread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        return
+
+    def getWebConfig(self) -> dict:
+        return dict(
+            apnaComplexURL=f"{self.baseURL}/facilities/directory",
+            apnaComplexCreds=dict(email=self.email, password=self.password),
+            clockSync=dict(
+                enabled=True,
+                url=f"{self.baseURL}/",
+                timeEndpoint=None,
+                timeField="epoch",
+                samples=8,
+                sampleInterval=0.137,
+                timeout=5,
+            ),
+        )
+
+    def renderAsset(self, path: str) -> str:
+        # Filler of the right type and size; the stylesheet also pulls in a web font
+        if path.endswith(".css"):
+            fontFace = '@font-face { font-family: "Site"; src: url("/static/site.woff2"); }\n'
+            return fontFace + "body { font-family: 'Site'; }\n" + "/*" + "x" * self.assetSize + "*/"
+        return "x" * self.assetSize
+
+    def getServerTime(self) -> float:
+        return time.time() + self.clockSkew
+
+    def renderFacilities(self) -> str:
+        rowTemplate = loadFixture("facility_row.html")
+        facilityRows = "".join(
+            rowTemplate.replace("{facilityName}", facility["facilityName"]).replace(
+                "{facilityId}", str(facility["facilityId"])
+            )
+            for facility in self.facilityData["facilities"]
+        )
+        return loadFixture("facilities.html").replace("{facilityRows}", facilityRows)
+
+    def getEvents(self, facilityId: int) -> list:
+        today = datetime.date.today()
+        allEvents = list()
+        for event in self.facilityData["events"]:
+            if event["facilityId"] != facilityId:
+                continue
+            eventStart = datetime.datetime.combine(
+                today + datetime.timedelta(days=event["dayOffset"]),
+                datetime.time(hour=event["hour"]),
+            )
+            allEvents.append(
+                dict(title=event["title"], start=eventStart.isoformat(), allDay=False)
+            )
+        return allEvents
+
+    def resetEvents(self) -> None:
+        self.facilityData["events"] = json.loads(loadFixture("events.json"))["events"]
+        return
+
+    def addEvent(self, facilityName: str, title: str, dayOffset: int, hour: int) -> None:
+        # Bookings made while the stub runs show up on the next calendar read
+        facilityId = next(
+            facility["facilityId"]
+            for facility in self.facilityData["facilities"]
+            if facility["facilityName"] == facilityName
+        )
+        self.facilityData["events"].append(
+            dict(facilityId=facilityId, title=title, dayOffset=dayOffset, hour=hour)
+        )
+        return
+
+    def renderCalendar(self, facilityId: int) -> Optional[str]:
+        facility = next(
+            (
+                facility
+                for facility in self.facilityData["facilities"]
+                if facility["facilityId"] == facilityId
+            ),
+            None,
+        )
+        if facility is None:
+            return None
+        if facility.get("inlineEvents"):
+            # Render the same shape as the site's inline JS, not strict JSON
+            eventsSource = "[" + ", ".join(
+                f"{{title: '{event['title']}', start: '{event['start']}', allDay: false}}"
+                for event in self.getEvents(facilityId)
+            ) + "]"
+        else:
+            eventsSource = f'"/facilities/events/{facilityId}"'
+        return (
+            loadFixture("calendar.html")
+            .replace("{facilityName}", facility["facilityName"])
+            .replace("{eventsSource}", eventsSource)
+        )
+
+    def getHandlerClass(self):
+        stub = self
+
+        class StubHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args) -> None:
+                return
+
+            def sendBody(
+                self,
+                body: str,
+                status: int = 200,
+                contentType: str = "text/html",
+                headers: dict = dict(),
+            ) -> None:
+                if stub.latency > 0:
+                    time.sleep(stub.latency)
+                encodedBody = body.encode()
+                self.send_response_only(status)
+                self.send_header("Date", formatdate(stub.getServerTime(), usegmt=True))
+                self.send_header("Content-Type", contentType)
+                self.send_header("Content-Length", str(len(encodedBody)))
+                for headerName, headerValue in headers.items():
+                    self.send_header(headerName, headerValue)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(encodedBody)
+
+            def redirect(self, location: str, headers: dict = dict()) -> None:
+                self.sendBody("", status=302, headers=dict(Location=location, **headers))
+
+            def isLoggedIn(self) -> bool:
+                cookieHeader = self.headers.get("Cookie") or ""
+                allCookies = dict(
+                    cookie.strip().split("=", 1)
+                    for cookie in cookieHeader.split(";")
+                    if "=" in cookie
+                )
+                return allCookies.get("session") in stub.sessions
+
+            def do_HEAD(self) -> None:
+                self.do_GET()
+
+            def do_GET(self) -> None:
+                urlParts = urlsplit(self.path)
+                stub.requestLog.append((time.time(), self.command, urlParts.path))
+                if urlParts.path == "/time":
+                    self.sendBody(
+                        json.dumps(dict(epoch=stub.getServerTime())),
+                        contentType="application/json",
+                    )
+                elif urlParts.path.startswith(("/static/", "/images/")):
+                    contentTypes = dict(
+                        css="text/css", jpg="image/jpeg", png="image/png", woff2="font/woff2"
+                    )
+                    self.sendBody(
+                        stub.renderAsset(urlParts.path),
+                        contentType=contentTypes.get(
+                            urlParts.path.rsplit(".", 1)[-1], "application/octet-stream"
+                        ),
+                    )
+                elif urlParts.path == "/login":
+                    self.sendBody(loadFixture("login.html").replace("{csrfToken}", "stub-csrf"))
+                elif not urlParts.path.startswith("/facilities"):
+                    self.sendBody("<html><body>ApnaComplex</body></html>")
+                elif not self.isLoggedIn():
+                    self.redirect("/login")
+                elif urlParts.path == "/facilities/directory":
+                    self.sendBody(stub.renderFacilities())
+                elif urlParts.path.startswith("/facilities/calendar/"):
+                    calendarHtml = stub.renderCalendar(int(urlParts.path.split("/")[-1]))
+                    if calendarHtml is None:
+                        self.sendBody("Not found", status=404)
+                    else:
+                        self.sendBody(calendarHtml)
+                elif urlParts.path.startswith("/facilities/events/"):
+                    self.sendBody(
+                        json.dumps(stub.getEvents(int(urlParts.path.split("/")[-1]))),
+                        contentType="application/json",
+                    )
+                else:
+                    self.sendBody("Not found", status=404)
+
+            def do_POST(self) -> None:
+                urlParts = urlsplit(self.path)
+                stub.requestLog.append((time.time(), self.command, urlParts.path))
+                contentLength = int(self.headers.get("Content-Length") or 0)
+                formData = parse_qs(self.rfile.read(contentLength).decode())
+                isValid = (
+                    formData.get("login_email") == [stub.email]
+                    and formData.get("login_password") == [stub.password]
+                    and formData.get("csrf_token") == ["stub-csrf"]
+                )
+                if (urlParts.path != "/login") or (not isValid):
+                    self.sendBody(loadFixture("login.html"), status=401)
+                    return
+                sessionId = uuid.uuid4().hex
+                stub.sessions.add(sessionId)
+                self.redirect(
+                    formData.get("redirect", ["/facilities/directory"])[0],
+                    headers={"Set-Cookie": f"session={sessionId}; Path=/"},
+                )
+
+        return StubHandler
+
+
+if __name__ == "__main__":
+    stub = ApnaComplexStub().start()
+    print(f"ApnaComplex stand-in serving on {stub.baseURL}")
+    try:
+        stub.serverThread.join()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import tempfile
+import threading
+import statistics
+from typing import Optional
+
+sys.path.append(os.path.join(pathlib.Path(__file__).parent.parent, "src"))
+
+from apnacomplex_stub import ApnaComplexStub
+
+try:
+    import psutil
+except ImportError:
+    # Peak memory needs psutil, the times are reported without it
+    psutil = None
+
+
+class RssSampler:
+    # Peak resident memory of chromedriver and every browser process under it
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.allPids: list = list()
+        self.peakBytes = 0
+        self.isRunning = threading.Event()
+        self.samplerThread: Optional[threading.Thread] = None
+
+    def addProcess(self, pid: int) -> None:
+        self.allPids.append(pid)
+        return
+
+    def getTotalBytes(self) -> int:
+        totalBytes = 0
+        for pid in self.allPids:
+            try:
+                rootProcess = psutil.Process(pid)
+                for process in [rootProcess] + rootProcess.children(recursive=True):
+                    totalBytes += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return totalBytes
+
+    def run(self) -> None:
+        while self.isRunning.is_set():
+            self.peakBytes = max(self.peakBytes, self.getTotalBytes())
+            time.sleep(self.interval)
+        return
+
+    def start(self) -> "RssSampler":
+        if psutil is None:
+            return self
+        self.isRunning.set()
+        self.samplerThread = threading.Thread(target=self.run, daemon=True)
+        self.samplerThread.start()
+        return self
+
+    def stop(self) -> Optional[float]:
+        if self.samplerThread is None:
+            return None
+        self.isRunning.clear()
+        self.samplerThread.join()
+        return self.peakBytes / 2**20
+
+
+def getConfig(stub: ApnaComplexStub, profile: str, workDir: str) -> dict:
+    configFilePath = os.path.join(pathlib.Path(__file__).parent.parent, "config.json")
+    with open(configFilePath) as configJson:
+        config = json.load(configJson)
+    config["web"].update(stub.getWebConfig())
+    config["web"]["clockSync"]["enabled"] = False
+    config["web"]["sessionCache"]["enabled"] = False
+    config["web"]["linkCache"]["enabled"] = False
+    config["web"]["leanBrowser"]["enabled"] = profile == "lean"
+    # The lean profile directory is kept across runs, like it is between bookings
+    config["web"]["leanBrowser"]["profileDir"] = os.path.join(workDir, "chrome_profile")
+    return config
+
+
+def runOnce(config: dict, sampleInterval: float) -> dict:
+    from web_assistant import WebAssistant
+
+    webAssistant = WebAssistant(config=config)
+    rssSampler = RssSampler(interval=sampleInterval).start()
+    launchTimes = list()
+    launchDriver = webAssistant.launchDriver
+
+    def timedLaunch():
+        startTime = time.perf_counter()
+        driver = launchDriver()
+        launchTimes.append(time.perf_counter() - startTime)
+        rssSampler.addProcess(driver.service.process.pid)
+        return driver
+
+    webAssistant.launchDriver = timedLaunch  # type: ignore
+    startTime = time.perf_counter()
+    driver = webAssistant.getApnaComplexDriver()
+    try:
+        # Login and facilities page, then the table and one court's calendar
+        facilitiesTime = time.perf_counter() - startTime - launchTimes[0]
+        pageStart = time.perf_counter()
+        courtLinks = webAssistant.getCourtLinks(
+            driver=driver, delay=config["web"]["webDriverDelay"], courtNum=None
+        )
+        bookingCount = webAssistant.getActiveBookings(
+            driver=driver,
+            delay=config["web"]["webDriverDelay"],
+            viewingURL=courtLinks["viewing"]["Court1"],
+            apartmentName=config["apartmentName"],
+        )
+        calendarTime = time.perf_counter() - pageStart
+    finally:
+        driver.quit()
+        peakMb = rssSampler.stop()
+    return dict(
+        launchTime=launchTimes[0],
+        facilitiesTime=facilitiesTime,
+        calendarTime=calendarTime,
+        peakMb=peakMb,
+        bookingCount=bookingCount,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare Chrome launch time, page time and peak memory for the browser profiles."
+    )
+    parser.add_argument("--profiles", nargs="+", default=["normal", "lean"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--assetSize", type=int, default=200000, help="bytes per page asset")
+    parser.add_argument("--sampleInterval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    workDir = tempfile.mkdtemp(prefix="browser_profile_benchmark_")
+    stub = ApnaComplexStub(latency=args.latency, assetSize=args.assetSize).start()
+    if psutil is None:
+        print("psutil isn't installed, peak RSS is not measured")
+    print(f"{'profile':<10}{'launch ms':>12}{'facilities ms':>15}{'calendar ms':>13}{'peak MB':>10}")
+    try:
+        for profile in args.profiles:
+            config = getConfig(stub=stub, profile=profile, workDir=workDir)
+            try:
+                allResults = [
+                    runOnce(config=config, sampleInterval=args.sampleInterval)
+                    for _ in range(args.runs)
+                ]
+            except ImportError as ex:
+                print(f"{profile:<10} skipped ({ex})")
+                continue
+            # Medians, so the first cold start of the kept profile doesn't dominate
+            allPeaks = [result["peakMb"] for result in allResults if result["peakMb"] is not None]
+            peakText = f"{max(allPeaks):10.1f}" if allPeaks else f"{'n/a':>10}"
+            print(
+                f"{profile:<10}"
+                f"{statistics.median(result['launchTime'] for result in allResults) * 1000:12.1f}"
+                f"{statistics.median(result['facilitiesTime'] for result in allResults) * 1000:15.1f}"
+                f"{statistics.median(result['calendarTime'] for result in allResults) * 1000:13.1f}"
+                f"{peakText}"
+            )
+    finally:
+        stub.stop()
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+
+sys.path.append(os.path.join(pathlib.Path(__file__).parent.parent, "src"))
+
+from apnacomplex_stub import ApnaComplexStub
+from page_parsers import parseFacilityRows
+
+
+def countDriverCalls(driver) -> dict:
+    # Every WebDriver round trip goes through driver.execute
+    callCounter = dict(calls=0)
+    originalExecute = driver.execute
+
+    def countingExecute(driverCommand, params=None):
+        callCounter["calls"] += 1
+        return originalExecute(driverCommand, params)
+
+    driver.execute = countingExecute
+    return callCounter
+
+
+def getLegacyCourtLinks(driver) -> dict:
+    # Per-element extraction as getCourtLinks did it before the batched script
+    from selenium.webdriver.common.by import By
+
+    courtLinks: dict = dict(viewing=dict(), booking=dict())
+    facilitiesTable = driver.find_element(By.ID, "facilities")
+    for row in reversed(facilitiesTable.find_elements(By.XPATH, ".//tbody//tr")):
+        allCells = row.find_elements(By.XPATH, ".//td")
+        facilityName = allCells[0].text
+        if not facilityName.startswith("Tennis Court"):
+            continue
+        for currentLink in allCells[-1].find_elements(By.XPATH, ".//a"):
+            imageTitle = currentLink.find_elements(By.XPATH, ".//img")[0].get_attribute("title")
+            linkType = "viewing" if imageTitle.startswith("View") else "booking"
+            courtLinks[linkType][f"Court{facilityName.split(' ')[-1]}"] = currentLink.get_attribute("href")
+    return courtLinks
+
+
+def runOffline(stub: ApnaComplexStub) -> None:
+    # Fixture parse without a browser, for machines without Chrome
+    facilitiesHtml = stub.renderFacilities()
+    startTime = time.perf_counter()
+    allRows = parseFacilityRows(facilitiesHtml)
+    elapsed = time.perf_counter() - startTime
+    print(f"offline    parsed {len(allRows or [])} facility rows in {elapsed * 1000:.2f} ms")
+    return
+
+
+def runSelenium(stub: ApnaComplexStub, config: dict) -> None:
+    from web_assistant import WebAssistant
+
+    config["web"]["sessionCache"]["enabled"] = False
+    config["web"]["linkCache"]["enabled"] = False
+    webAssistant = WebAssistant(config=config)
+    driver = webAssistant.getApnaComplexDriver()
+    try:
+        callCounter = countDriverCalls(driver)
+        for label, extractFunc in [
+            ("before", lambda: getLegacyCourtLinks(driver)),
+            (
+                "after",
+                lambda: webAssistant.getCourtLinks(driver=driver, delay=5, courtNum=None),
+            ),
+        ]:
+            callCounter["calls"] = 0
+            startTime = time.perf_counter()
+            courtLinks = extractFunc()
+            elapsed = time.perf_counter() - startTime
+            print(
+                f"{label:<10} {callCounter['calls']:4d} WebDriver calls  "
+                f"{elapsed * 1000:8.1f} ms  {len(courtLinks['viewing'])} viewing links"
+            )
+    finally:
+        driver.quit()
+    return
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Count WebDriver round trips for facilities table extraction."
+    )
+    parser.parse_args()
+
+    configFilePath = os.path.join(pathlib.Path(__file__).parent.parent, "config.json")
+    with open(configFilePath) as configJson:
+        config = json.load(configJson)
+
+    stub = ApnaComplexStub().start()
+    config["web"].update(stub.getWebConfig())
+    config["web"]["clockSync"]["enabled"] = False
+    try:
+        runOffline(stub)
+        try:
+            runSelenium(stub, config)
+        except ImportError as ex:
+            print(f"selenium   skipped ({ex})")
+    finally:
+        stub.stop()
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+import os
+import sys
+import json
+import time
+import socket
+import pathlib
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.join(pathlib.Path(__file__).parent.parent, "src"))
+
+from apnacomplex_stub import ApnaComplexStub
+from fake_adb_server import FakeAdbServer
+from fake_emulator import FakeEmulator, installFakeModules
+
+PHASES = [
+    "getAllBookingArgs",
+    "getApnaComplexSession",
+    "loadAllApnaComplexApps",
+    "navigate",
+    "sleepTillOpeningTime",
+    "confirmBooking",
+    "verifyBookings",
+    "rebook",
+]
+
+
+def getFreePort() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def getConfig(stub: ApnaComplexStub, args: argparse.Namespace, workDir: str) -> dict:
+    configFilePath = os.path.join(pathlib.Path(__file__).parent.parent, "config.json")
+    with open(configFilePath) as configJson:
+        config = json.load(configJson)
+    config["slotHour"] = args.slotHour
+    config["batchPlanner"]["candidateHours"] = args.candidateHours
+    config["web"].update(stub.getWebConfig())
+    config["web"]["backend"] = "http"
+    # DPAPI isn't available off Windows, so sessions are never cached here
+    config["web"]["sessionCache"]["enabled"] = False
+    config["app"]["navigationMode"] = args.navigationMode
+    config["app"]["slotSeek"]["mode"] = args.slotSeekMode
+    config["app"]["confirmHedge"]["enabled"] = args.hedge
+    config["app"]["inputBackend"] = args.inputBackend
+    config["confirmLeadTime"] = args.confirmLead
+    config["verification"]["enabled"] = True
+    calibrationConfig = config["app"]["latencyCalibration"]
+    calibrationConfig["enabled"] = args.rehearsals > 0
+    calibrationConfig["probePorts"] = {
+        appTitle: getFreePort() for appTitle in config["app"]["appWindowNames"]
+    }
+    calibrationConfig["bookingHosts"] = ["127.0.0.1"]
+    # Shrink the fixed delays, the fake pages load on the scale of these too
+    for key, value in config["app"]["sleepDuration"].items():
+        config["app"]["sleepDuration"][key] = value * args.timeScale
+    config["app"]["waitEngine"]["pollInterval"] = 0.05
+    # State files resolve against the repo, so keep them in the scratch directory explicitly
+    for section, fileKey in [
+        (config["app"]["waitEngine"], "referenceFile"),
+        (config["app"]["waitEngine"], "historyFile"),
+        (config["app"]["confirmHedge"], "statsFile"),
+        (config["app"]["navigationMacro"], "file"),
+        (config["app"]["slotSeek"], "calibrationFile"),
+        (config["app"]["latencyCalibration"], "file"),
+        (config["web"]["linkCache"], "file"),
+        (config["web"]["sessionCache"], "file"),
+        (config["web"]["sessionCache"], "statsFile"),
+    ]:
+        section[fileKey] = os.path.join(workDir, section[fileKey])
+    config["tracing"]["enabled"] = True
+    config["tracing"]["dir"] = os.path.join(workDir, "traces")
+    return config
+
+
+def getBenchmarkAssistant(
+    config: dict, args: argparse.Namespace, emulator: FakeEmulator, stub: ApnaComplexStub
+):
+    # Imported only after the fake Windows modules are registered
+    from booking_assistant import BookingAssistant
+
+    class BenchmarkBookingAssistant(BookingAssistant):
+        def __init__(self, config: dict, testRun: bool) -> None:
+            super().__init__(config=config, testRun=testRun)
+            self.allFireDatetimes: Dict[datetime, datetime] = dict()
+
+        def getFireDatetime(self, bookingDatetime: datetime) -> datetime:
+            # Fire shortly after navigation ends instead of at tomorrow's real opening,
+            # spacing later opening hours by the same delay
+            if bookingDatetime not in self.allFireDatetimes:
+                fireDatetime = datetime.now() + timedelta(seconds=args.fireDelay)
+                self.allFireDatetimes[bookingDatetime] = fireDatetime
+                # The fake site opens confirmLeadTime after the fire time, and this far off it
+                # as if the clocks disagreed
+                emulator.allOpenEpochs.append(
+                    fireDatetime.timestamp() + args.confirmLead + args.openOffset / 1000
+                )
+                # Other residents get these slots as they open, after planning saw them free
+                openingHour = (bookingDatetime + timedelta(minutes=30)).hour
+                for courtNum, slotHour in args.takenSlots:
+                    if slotHour == openingHour:
+                        emulator.takenSlots.add((courtNum, slotHour))
+                        stub.addEvent(f"Tennis Court {courtNum}", "Lotus-C-304", 1, slotHour)
+            return self.allFireDatetimes[bookingDatetime]
+
+    return BenchmarkBookingAssistant(config=config, testRun=False)
+
+
+def getPhaseTimes(allSpans: List[dict]) -> Dict[str, float]:
+    # Wall time per phase; concurrent spans of one phase count from first start to last end
+    phaseBounds: Dict[str, list] = dict()
+    for span in allSpans[1:]:
+        phase = span["name"].split(".")[0]
+        bounds = phaseBounds.setdefault(phase, [span["start"], span["start"]])
+        bounds[0] = min(bounds[0], span["start"])
+        bounds[1] = max(bounds[1], span["start"] + span["duration"])
+    return {phase: bounds[1] - bounds[0] for phase, bounds in phaseBounds.items()}
+
+
+def getAdbStats(adbServer: FakeAdbServer) -> dict:
+    allCommandTimes = [
+        (command["appliedAt"] - command["receivedAt"]) * 1000
+        for command in adbServer.allCommands
+    ]
+    return dict(
+        numCommands=len(allCommandTimes),
+        numInstances=len({command["serial"] for command in adbServer.allCommands}),
+        maxConcurrent=adbServer.getMaxConcurrent(),
+        meanMs=sum(allCommandTimes) / max(len(allCommandTimes), 1),
+    )
+
+
+def rehearseOnce(
+    config: dict, args: argparse.Namespace, emulator: FakeEmulator, stub: ApnaComplexStub
+) -> dict:
+    from latency_probe import LatencyProfile
+
+    bookingAssistant = getBenchmarkAssistant(
+        config=config, args=args, emulator=emulator, stub=stub
+    )
+    # The probe holds back the confirm requests, the fake app books on the click regardless,
+    # so nothing of it carries over to the booking runs
+    emulator.allConfirms = list()
+    emulator.allOpenEpochs = list()
+    emulator.takenSlots = set()
+    emulator.onBooked = None
+    bookingAssistant.rehearse()
+    latencyProfile = LatencyProfile(config=config["app"])
+    return {
+        appTitle: dict(
+            numSamples=len(latencyProfile.allSamples.get(appTitle, list())),
+            lead=latencyProfile.getLead(appTitle),
+        )
+        for appTitle in config["app"]["appWindowNames"]
+    }
+
+
+def runOnce(
+    config: dict,
+    args: argparse.Namespace,
+    emulator: FakeEmulator,
+    stub: ApnaComplexStub,
+    adbServer: Optional[FakeAdbServer] = None,
+) -> dict:
+    from tracing import TraceReport
+
+    bookingAssistant = getBenchmarkAssistant(
+        config=config, args=args, emulator=emulator, stub=stub
+    )
+    emulator.allConfirms = list()
+    emulator.allOpenEpochs = list()
+    emulator.hangingBoots = {
+        config["app"]["appWindowNames"][instanceNum - 1]: 1 for instanceNum in args.hangInstances
+    }
+    if adbServer is not None:
+        adbServer.allCommands = list()
+    # Every run books the same day afresh, what the app gets shows up on the site
+    stub.resetEvents()
+    emulator.takenSlots = set()
+    emulator.onBooked = lambda courtNum, slotHour: stub.addEvent(
+        f"Tennis Court {courtNum}", config["apartmentName"], 1, slotHour
+    )
+    startTime = time.perf_counter()
+    bookingAssistant.makeBookings()
+    wallTime = time.perf_counter() - startTime
+
+    allSpans = TraceReport(config=config).loadRuns()[-1]
+    # Each click is measured against the closest fire time, groups are seconds apart
+    allFireEpochs = [
+        fireDatetime.timestamp() for fireDatetime in bookingAssistant.allFireDatetimes.values()
+    ]
+    confirmErrors = [
+        min(
+            ((confirm["clickEpoch"] - fireEpoch) * 1000 for fireEpoch in allFireEpochs),
+            key=abs,
+        )
+        for confirm in emulator.allConfirms
+        if allFireEpochs
+    ]
+    # Where the requests reached the site, against the opening they were aimed at
+    arrivalErrors = [
+        min(
+            ((confirm["arrivalEpoch"] - openEpoch) * 1000 for openEpoch in emulator.allOpenEpochs),
+            key=abs,
+        )
+        for confirm in emulator.allConfirms
+        if emulator.allOpenEpochs
+    ]
+    return dict(
+        adbStats=None if adbServer is None else getAdbStats(adbServer),
+        wallTime=wallTime,
+        phaseTimes=getPhaseTimes(allSpans),
+        skewMs=[span["skewMs"] for span in allSpans if "skewMs" in span],
+        confirmErrors=confirmErrors,
+        arrivalErrors=[error for error in arrivalErrors if abs(error) < 1000],
+        numAccepted=sum(confirm["isAccepted"] for confirm in emulator.allConfirms),
+        bookedSlots=sorted(
+            slot for slot in emulator.takenSlots if slot not in set(args.takenSlots)
+        ),
+    )
+
+
+def printRun(runIdx: int, runResult: dict, args: argparse.Namespace) -> None:
+    print(f"run {runIdx + 1}: {runResult['wallTime']:.2f} s wall time")
+    for phase in PHASES:
+        if phase in runResult["phaseTimes"]:
+            print(f"  {phase:<24} {runResult['phaseTimes'][phase]:8.3f} s")
+    adbStats = runResult["adbStats"]
+    if adbStats is not None:
+        print(
+            f"  {adbStats['numCommands']} ADB commands to {adbStats['numInstances']} instances, "
+            f"{adbStats['meanMs']:.1f} ms mean, up to {adbStats['maxConcurrent']} at once"
+        )
+    # Rebooks confirm seconds after the opening, they aren't landing errors
+    confirmErrors = [error for error in runResult["confirmErrors"] if abs(error) < 1000]
+    numRebooked = len(runResult["confirmErrors"]) - len(confirmErrors)
+    if numRebooked:
+        print(f"  {numRebooked} rebook clicks after verification")
+    if not confirmErrors:
+        print("  no confirm clicks landed")
+        return
+    print(
+        f"  confirm clicks landed {len(confirmErrors)}x, "
+        f"{min(confirmErrors):+.2f} .. {max(confirmErrors):+.2f} ms from fire time, "
+        f"spread {max(confirmErrors) - min(confirmErrors):.2f} ms, "
+        f"{runResult['numAccepted']} accepted"
+    )
+    if args.requestLatency:
+        arrivalErrors = runResult["arrivalErrors"]
+        print(
+            f"  requests reached the site {min(arrivalErrors):+.2f} .. "
+            f"{max(arrivalErrors):+.2f} ms from the opening"
+        )
+    allBooked = [f"court {court} at {hour}:00" for court, hour in runResult["bookedSlots"]]
+    print(f"  booked {', '.join(allBooked) or 'nothing'}")
+    return
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run makeBookings end to end against a fake emulator and booking site."
+    )
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--slotHour", type=int, default=10)
+    parser.add_argument("--candidateHours", type=int, nargs="*", default=[])
+    parser.add_argument("--timeScale", type=float, default=0.1)
+    parser.add_argument("--bootLatency", type=float, default=1.0)
+    parser.add_argument("--appLatency", type=float, default=1.5)
+    parser.add_argument("--pageLatency", type=float, default=0.3)
+    parser.add_argument("--webLatency", type=float, default=0.05)
+    parser.add_argument("--fireDelay", type=float, default=2.0)
+    parser.add_argument("--navigationMode", default="macro")
+    parser.add_argument("--slotSeekMode", default="calibrated")
+    parser.add_argument("--openOffset", type=float, default=0.0, help="ms after fire time")
+    parser.add_argument("--hedge", action="store_true")
+    parser.add_argument(
+        "--confirmLead", type=float, default=0.0, help="seconds the fire time is ahead of the opening"
+    )
+    parser.add_argument(
+        "--requestLatency",
+        type=float,
+        nargs="*",
+        default=[],
+        help="ms from a confirm click to its request leaving the app, per instance",
+    )
+    parser.add_argument(
+        "--rehearsals", type=int, default=0, help="latency rehearsals before the booking runs"
+    )
+    parser.add_argument(
+        "--hangInstances", type=int, nargs="*", default=[], help="instances whose first boot hangs"
+    )
+    parser.add_argument("--inputBackend", default="desktop", choices=["desktop", "adb"])
+    parser.add_argument("--adbLatency", type=float, default=30, help="ms per ADB input command")
+    parser.add_argument(
+        "--takenSlots",
+        type=lambda slot: tuple(int(part) for part in slot.split(":")),
+        nargs="*",
+        default=[],
+        help="court:hour slots someone else gets at the opening",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # Caches, references and traces land in a scratch directory, not the checkout
+    workDir = tempfile.mkdtemp(prefix="booking_benchmark_")
+    os.chdir(workDir)
+    logger = logging.getLogger("default")
+    logger.setLevel(logging.INFO)
+    logHandler = (
+        logging.StreamHandler(sys.stdout)
+        if args.verbose
+        else logging.FileHandler(os.path.join(workDir, "benchmark.log"))
+    )
+    logHandler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logger.addHandler(logHandler)
+
+    stub = ApnaComplexStub(latency=args.webLatency).start()
+    config = getConfig(stub=stub, args=args, workDir=workDir)
+    emulator = FakeEmulator(
+        appConfig=config["app"],
+        latencies=dict(
+            boot=args.bootLatency,
+            appLoad=args.appLatency,
+            pageLoad=args.pageLatency,
+            toggle=args.pageLatency / 2,
+            scroll=0.02,
+        ),
+    )
+    installFakeModules(emulator)
+    adbServer = None
+    if args.inputBackend == "adb":
+        adbServer = FakeAdbServer(
+            emulator=emulator, appConfig=config["app"], inputLatency=args.adbLatency / 1000
+        ).start()
+        config["app"]["adb"]["port"] = adbServer.port
+    for appTitle, requestLatency in zip(config["app"]["appWindowNames"], args.requestLatency):
+        emulator.requestDelays[appTitle] = requestLatency / 1000
+    if args.rehearsals > 0:
+        emulator.proxyPorts = config["app"]["latencyCalibration"]["probePorts"]
+        emulator.siteAddress = ("127.0.0.1", stub.server.server_port)
+    print(f"Scratch directory: {workDir}")
+    try:
+        for rehearsalIdx in range(args.rehearsals):
+            allLeads = rehearseOnce(config=config, args=args, emulator=emulator, stub=stub)
+            print(
+                f"rehearsal {rehearsalIdx + 1}: "
+                + ", ".join(
+                    f"{appTitle} {lead['numSamples']} samples, lead "
+                    + ("n/a" if lead["lead"] is None else f"{lead['lead'] * 1000:.1f} ms")
+                    for appTitle, lead in allLeads.items()
+                )
+            )
+        # The first run learns page references, later runs show the steady state
+        for runIdx in range(args.runs):
+            runResult = runOnce(
+                config=config, args=args, emulator=emulator, stub=stub, adbServer=adbServer
+            )
+            printRun(runIdx, runResult, args)
+    finally:
+        stub.stop()
+        if adbServer is not None:
+            adbServer.stop()
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import io
+import time
+import socket
+import threading
+import socketserver
+from typing import List, Optional, Tuple
+
+from fake_emulator import FakeAppWindow, FakeEmulator
+
+
+class FakeAdbServer:
+    # Stands in for the adb server: speaks its smart socket protocol, records and times every
+    # shell command, and plays input commands into the fake emulator's windows
+    def __init__(self, emulator: FakeEmulator, appConfig: dict, inputLatency: float) -> None:
+        self.emulator = emulator
+        self.config = appConfig["adb"]
+        # Seconds an input command takes on the device before the event is injected
+        self.inputLatency = inputLatency
+        self.allTitles = {serial: appTitle for appTitle, serial in self.config["serials"].items()}
+        self.connectedSerials: set = set()
+        self.allCommands: List[dict] = list()
+        self.lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self.getHandlerClass())
+        self.server.daemon_threads = True
+        self.serverThread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> "FakeAdbServer":
+        self.serverThread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        return
+
+    def toWindowCoords(self, deviceX: int, deviceY: int) -> Tuple[int, int]:
+        # Instances run at the default window size, so this undoes AdbInput.toDeviceCoords
+        viewport = self.config["viewport"]
+        screenSize = self.config["screenSize"]
+        viewportWidth = viewport["right"] - viewport["left"]
+        viewportHeight = viewport["bottom"] - viewport["top"]
+        return (
+            round(viewport["left"] + deviceX / screenSize["x"] * viewportWidth),
+            round(viewport["top"] + deviceY / screenSize["y"] * viewportHeight),
+        )
+
+    def getWindow(self, serial: str) -> Optional[FakeAppWindow]:
+        try:
+            window = self.emulator.findWindow(self.allTitles[serial])
+        except Exception:
+            return None
+        return window if isinstance(window, FakeAppWindow) else None
+
+    def applyInput(self, serial: str, command: str) -> None:
+        window = self.getWindow(serial)
+        allArgs = command.split()
+        if (window is None) or (allArgs[:1] != ["input"]):
+            return
+        with self.emulator.lock:
+            if allArgs[1] == "tap":
+                window.onClick(self.toWindowCoords(int(allArgs[2]), int(allArgs[3])))
+            elif allArgs[1] == "swipe":
+                startX, startY, stopX, stopY = (int(arg) for arg in allArgs[2:6])
+                # Vertical swipes scroll the page, horizontal ones drag the time slot strip
+                if abs(stopY - startY) > abs(stopX - startX):
+                    window.onScroll(round((stopY - startY) / self.config["scrollPixels"]))
+                else:
+                    window.onDrag(
+                        self.toWindowCoords(startX, startY), self.toWindowCoords(stopX, stopY)
+                    )
+            elif (allArgs[1] == "keyevent") and (allArgs[2] in ("4", "KEYCODE_BACK")):
+                window.onBack()
+        return
+
+    def screencap(self, serial: str) -> bytes:
+        # The window's page stands in for the device framebuffer, whatever is on top
+        window = self.getWindow(serial)
+        if window is None:
+            return b""
+        pngData = io.BytesIO()
+        window.capture_as_image().save(pngData, format="PNG")
+        return pngData.getvalue()
+
+    def runShell(self, serial: str, command: str) -> None:
+        receivedAt = time.perf_counter()
+        # Swipes hold the touch for their duration, like the device would
+        allArgs = command.split()
+        isSwipe = (allArgs[1:2] == ["swipe"]) and (len(allArgs) > 6)
+        swipeTime = int(allArgs[6]) / 1000 if isSwipe else 0
+        time.sleep(self.inputLatency + swipeTime)
+        self.applyInput(serial, command)
+        with self.lock:
+            self.allCommands.append(
+                dict(
+                    serial=serial,
+                    command=command,
+                    receivedAt=receivedAt,
+                    appliedAt=time.perf_counter(),
+                )
+            )
+        return
+
+    def getMaxConcurrent(self) -> int:
+        # Most commands in flight at once, across all instances
+        allEdges = sorted(
+            [(command["receivedAt"], 1) for command in self.allCommands]
+            + [(command["appliedAt"], -1) for command in self.allCommands]
+        )
+        inFlight, maxInFlight = 0, 0
+        for _, delta in allEdges:
+            inFlight += delta
+            maxInFlight = max(maxInFlight, inFlight)
+        return maxInFlight
+
+    def getHandlerClass(self) -> type:
+        adbServer = self
+
+        class AdbHandler(socketserver.BaseRequestHandler):
+            def readRequest(self) -> Optional[str]:
+                size = self.readExact(4)
+                if size is None:
+                    return None
+                payload = self.readExact(int(size, 16))
+                return None if payload is None else payload.decode()
+
+            def readExact(self, size: int) -> Optional[bytes]:
+                data = b""
+                while len(data) < size:
+                    chunk = self.request.recv(size - len(data))
+                    if not chunk:
+                        return None
+                    data += chunk
+                return data
+
+            def sendMessage(self, status: bytes, message: Optional[str] = None) -> None:
+                reply = status
+                if message is not None:
+                    reply += f"{len(message.encode()):04x}".encode() + message.encode()
+                self.request.sendall(reply)
+                return
+
+            def handle(self) -> None:
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                request = self.readRequest()
+                if request is None:
+                    return
+                if request.startswith("host:connect:"):
+                    serial = request[len("host:connect:") :]
+                    adbServer.connectedSerials.add(serial)
+                    self.sendMessage(b"OKAY", f"connected to {serial}")
+                    return
+                if not request.startswith("host:transport:"):
+                    self.sendMessage(b"FAIL", f"unsupported request {request}")
+                    return
+                serial = request[len("host:transport:") :]
+                if serial not in adbServer.connectedSerials:
+                    self.sendMessage(b"FAIL", f"device '{serial}' not found")
+                    return
+                self.sendMessage(b"OKAY")
+                # An armed transport waits here until the click sends its command
+                service = self.readRequest()
+                if service == "exec:screencap -p":
+                    self.sendMessage(b"OKAY")
+                    self.request.sendall(adbServer.screencap(serial))
+                    return
+                if (service is None) or (not service.startswith("shell:")):
+                    return
+                self.sendMessage(b"OKAY")
+                adbServer.runShell(serial, service[len("shell:") :])
+                return
+
+        return AdbHandler
@@ -0,0 +1,493 @@
+import sys
+import time
+import socket
+import types
+import random
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+SCREEN_SIZE = (1920, 1080)
+# Instances are tiled right of the screen centre, where minimizeAllWindows presses
+WINDOW_ORIGIN = (1000, 60)
+WINDOW_GAP = 10
+FACILITIES_SCROLL_LIMIT = 12
+LAST_SLOT_HOUR = 22
+
+
+class ElementNotFoundError(Exception):
+    pass
+
+
+class MatchError(Exception):
+    pass
+
+
+class FakeControl:
+    def __init__(self, onClick=None, toggleState: Optional[int] = None) -> None:
+        self.onClick = onClick
+        self.toggleState = toggleState
+        self.children: Dict[str, "FakeControl"] = dict()
+
+    def click_input(self, coords=None) -> None:
+        if self.onClick is not None:
+            self.onClick()
+
+    def get_toggle_state(self) -> int:
+        return self.toggleState or 0
+
+    def invoke(self) -> None:
+        self.toggleState = 0 if self.toggleState else 1
+
+    def child_window(self, title: str, control_type: Optional[str] = None) -> "FakeControl":
+        if title not in self.children:
+            raise MatchError(title)
+        return self.children[title]
+
+
+class FakeManagerWindow:
+    def __init__(self, emulator: "FakeEmulator", handle: int) -> None:
+        self.emulator = emulator
+        self.handle = handle
+        inputNames = emulator.inputElementNames
+        self.controls: Dict[str, FakeControl] = {
+            f"CheckBox{i + 2}": FakeControl(toggleState=0)
+            for i in range(len(emulator.appWindowNames))
+        }
+        self.controls[inputNames["startAllButton"]] = FakeControl(onClick=self.startAll)
+        for idx, appTitle in enumerate(emulator.appWindowNames):
+            self.controls[
+                inputNames["instanceStartButton"].format(instanceNum=idx + 1)
+            ] = FakeControl(
+                onClick=lambda idx=idx, appTitle=appTitle: emulator.bootInstance(idx, appTitle)
+            )
+        self.controls[inputNames["stopAllButton"]] = FakeControl()
+        closeDialog = FakeControl()
+        closeDialog.children[inputNames["closeAllButton"]] = FakeControl(
+            onClick=emulator.stopAllInstances
+        )
+        self.controls[inputNames["closeConfirmDialog"]] = closeDialog
+
+    def __getitem__(self, name: str) -> FakeControl:
+        if name not in self.controls:
+            raise MatchError(name)
+        return self.controls[name]
+
+    def startAll(self) -> None:
+        for idx, appTitle in enumerate(self.emulator.appWindowNames):
+            if self.controls[f"CheckBox{idx + 2}"].get_toggle_state():
+                self.emulator.bootInstance(idx=idx, appTitle=appTitle)
+        return
+
+    def click_input(self, coords=None) -> None:
+        return
+
+    def capture_as_image(self) -> Image.Image:
+        return self.emulator.renderPage("manager")
+
+    def close(self) -> None:
+        self.emulator.closeWindow(self.handle)
+        return
+
+
+class FakeAppWindow:
+    def __init__(self, emulator: "FakeEmulator", handle: int, appTitle: str, idx: int) -> None:
+        self.emulator = emulator
+        self.handle = handle
+        self.appTitle = appTitle
+        width, height = emulator.windowSize
+        left = WINDOW_ORIGIN[0] + idx * (width + WINDOW_GAP)
+        self.rect = (left, WINDOW_ORIGIN[1], left + width, WINDOW_ORIGIN[1] + height)
+        self.page = "androidHome"
+        self.pendingPage: Optional[str] = None
+        self.readyAt = 0.0
+        self.scrollOffset = 0
+        self.slotHour = emulator.initialSlotHour
+        self.courtNum: Optional[int] = None
+        self.stripOffset = 0
+        self.misclicks = 0
+
+    def getVisiblePage(self) -> str:
+        if (self.pendingPage is not None) and (time.perf_counter() >= self.readyAt):
+            self.page, self.pendingPage = self.pendingPage, None
+        return "loading" if self.pendingPage is not None else self.page
+
+    def loadPage(self, page: str, latencyKey: str, isFetched: bool = True) -> None:
+        if isFetched and (latencyKey in ("appLoad", "pageLoad")):
+            self.emulator.sendAppRequest(appTitle=self.appTitle, delay=0.0)
+        self.pendingPage = page
+        self.readyAt = time.perf_counter() + self.emulator.getLatency(latencyKey)
+        return
+
+    def onClick(self, coords: Tuple[int, int]) -> None:
+        page = self.getVisiblePage()
+        element = self.emulator.hitTest(coords)
+        if (page == "androidHome") and (element == "apnaComplexIcon"):
+            self.loadPage("apnaHome", "appLoad")
+        elif (page == "apnaHome") and (element == "facilitiesButton"):
+            self.scrollOffset = 0
+            self.loadPage("facilities", "pageLoad")
+        elif page.startswith("facilities") and (element == "facilitiesHeader"):
+            pass
+        elif (
+            (page == f"facilitiesScroll{FACILITIES_SCROLL_LIMIT}")
+            and (element is not None)
+            and element.startswith("tennisCourt")
+        ):
+            self.courtNum = int(element[len("tennisCourt") : -len("Button")])
+            self.loadPage(f"court{self.courtNum}", "pageLoad")
+        elif page.startswith("court") and (element == "slotBookingButton"):
+            self.loadPage("slotBooking", "pageLoad")
+        elif (page == "slotBooking") and (element == "tomorrowToggle"):
+            self.slotHour = self.emulator.initialSlotHour
+            self.stripOffset = 0
+            self.loadPage(f"timeSlot{self.slotHour}", "toggle")
+        elif page.startswith("timeSlot") and (element == "timeSlotButton"):
+            self.page = f"slotSelected{self.slotHour}"
+        elif page.startswith("slotSelected") and (element == "bookNowButton"):
+            self.loadPage("confirmDialog", "toggle")
+        elif (page == "confirmDialog") and (element == "confirmButton"):
+            # A click before the slot opens is turned away and the dialog stays up,
+            # after that the first click on a slot gets it and the rest are told it's gone
+            if self.emulator.recordConfirm(appTitle=self.appTitle):
+                isBooked = self.emulator.claimSlot(self.courtNum, self.slotHour)  # type: ignore
+                # The result comes back on the confirm request, not a request of its own
+                self.loadPage(
+                    "booked" if isBooked else "bookingFailed", "pageLoad", isFetched=False
+                )
+        else:
+            self.misclicks += 1
+        return
+
+    def onBack(self) -> None:
+        # Android back from anywhere in the app lands on its home page
+        if self.getVisiblePage() not in ("androidHome", "loading"):
+            self.loadPage("apnaHome", "toggle")
+        return
+
+    def onScroll(self, wheelDist: int) -> None:
+        page = self.getVisiblePage()
+        if not page.startswith("facilities"):
+            return
+        # The page stops at its bottom, extra ticks are harmless
+        self.scrollOffset = min(FACILITIES_SCROLL_LIMIT, self.scrollOffset - wheelDist)
+        self.loadPage(
+            f"facilitiesScroll{self.scrollOffset}" if self.scrollOffset else "facilities",
+            "scroll",
+        )
+        return
+
+    def onDrag(self, startCoords: Tuple[int, int], stopCoords: Tuple[int, int]) -> None:
+        page = self.getVisiblePage()
+        if not page.startswith("timeSlot"):
+            return
+        # The strip follows the pointer and snaps to the nearest slot, clamped at both ends
+        pixelsPerHour = self.emulator.getPixelsPerHour()
+        maxOffset = (LAST_SLOT_HOUR - self.emulator.initialSlotHour) * pixelsPerHour
+        self.stripOffset = max(
+            0, min(maxOffset, self.stripOffset + startCoords[0] - stopCoords[0])
+        )
+        self.slotHour = self.emulator.initialSlotHour + round(self.stripOffset / pixelsPerHour)
+        self.stripOffset = (self.slotHour - self.emulator.initialSlotHour) * pixelsPerHour
+        self.page = f"timeSlot{self.slotHour}"
+        return
+
+    def click_input(self, coords=None) -> None:
+        with self.emulator.lock:
+            self.onClick(coords)
+        return
+
+    def type_keys(self, keys: str) -> None:
+        if keys == "{ESC}":
+            with self.emulator.lock:
+                self.onBack()
+        return
+
+    def capture_as_image(self) -> Image.Image:
+        with self.emulator.lock:
+            return self.emulator.renderPage(self.getVisiblePage())
+
+    def close(self) -> None:
+        self.emulator.closeWindow(self.handle)
+        return
+
+
+class FakeEmulator:
+    def __init__(self, appConfig: dict, latencies: dict, jitter: float = 0.1) -> None:
+        self.appWindowNames: List[str] = appConfig["appWindowNames"]
+        self.managerName = appConfig["multiInstanceManager"]["windowName"]
+        self.inputElementNames = appConfig["inputElementNames"]
+        self.mousePosition = appConfig["mousePosition"]
+        self.initialSlotHour = appConfig["initialSlotHour"]
+        self.windowSize = (
+            appConfig["defaultAppWindowSize"]["x"],
+            appConfig["defaultAppWindowSize"]["y"],
+        )
+        # Seconds per transition kind: boot, appLoad, pageLoad, toggle, scroll
+        self.latencies = latencies
+        self.jitter = jitter
+        self.random = random.Random(0)
+        self.lock = threading.RLock()
+        self.windows: Dict[int, object] = dict()
+        self.nextHandle = 1
+        self.pendingBoots: List[Tuple[float, int, str]] = list()
+        self.allConfirms: List[dict] = list()
+        # Epochs at which the booking site opens slots, none means always open
+        self.allOpenEpochs: List[float] = list()
+        # Slots someone else already holds, and a hook told about every slot we get
+        self.takenSlots: set = set()
+        self.onBooked: Optional[Callable] = None
+        self.pressCoords: Optional[Tuple[int, int]] = None
+        # Boots left to hang per instance, whose window then never shows up
+        self.hangingBoots: Dict[str, int] = dict()
+        # Seconds from a confirm click to its request leaving the app, per instance, and
+        # the proxy port each instance's requests to the site go through
+        self.requestDelays: Dict[str, float] = dict()
+        self.proxyPorts: Dict[str, int] = dict()
+        self.siteAddress: Optional[Tuple[str, int]] = None
+        self.pageImages: Dict[str, Image.Image] = dict()
+
+    def getLatency(self, latencyKey: str) -> float:
+        latency = self.latencies[latencyKey]
+        return max(0.0, latency * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+    def getPixelsPerHour(self) -> int:
+        return (
+            self.mousePosition["timeSlotDragStart"]["x"]
+            - self.mousePosition["timeSlotDragStop"]["x"]
+        )
+
+    def hitTest(self, coords: Tuple[int, int], tolerance: int = 6) -> Optional[str]:
+        for element, position in self.mousePosition.items():
+            if abs(position["x"] - coords[0]) <= tolerance and abs(
+                position["y"] - coords[1]
+            ) <= tolerance:
+                return element
+        return None
+
+    def renderPage(self, page: str) -> Image.Image:
+        # Every page gets its own deterministic block pattern, so fingerprints differ
+        if page not in self.pageImages:
+            pageRandom = random.Random(page)
+            image = Image.new("L", (16, 16))
+            image.putdata([pageRandom.choice((30, 220)) for _ in range(16 * 16)])
+            self.pageImages[page] = image.resize(self.windowSize)
+        return self.pageImages[page].copy()
+
+    def addWindow(self, window) -> None:
+        self.windows[window.handle] = window
+        return
+
+    def getHandle(self) -> int:
+        self.nextHandle += 1
+        return self.nextHandle
+
+    def startManager(self) -> FakeManagerWindow:
+        with self.lock:
+            managerWindow = FakeManagerWindow(emulator=self, handle=self.getHandle())
+            self.addWindow(managerWindow)
+        return managerWindow
+
+    def bootInstance(self, idx: int, appTitle: str) -> None:
+        with self.lock:
+            if self.hangingBoots.get(appTitle, 0) > 0:
+                self.hangingBoots[appTitle] -= 1
+                return
+            bootAt = time.perf_counter() + self.getLatency("boot")
+            self.pendingBoots.append((bootAt, idx, appTitle))
+        return
+
+    def stopAllInstances(self) -> None:
+        with self.lock:
+            self.pendingBoots = list()
+            for handle, window in list(self.windows.items()):
+                if isinstance(window, FakeAppWindow):
+                    del self.windows[handle]
+        return
+
+    def closeWindow(self, handle: int) -> None:
+        with self.lock:
+            self.windows.pop(handle, None)
+        return
+
+    def findWindow(self, title: str):
+        with self.lock:
+            currentTime = time.perf_counter()
+            for bootAt, idx, appTitle in list(self.pendingBoots):
+                if bootAt <= currentTime:
+                    self.pendingBoots.remove((bootAt, idx, appTitle))
+                    self.addWindow(
+                        FakeAppWindow(emulator=self, handle=self.getHandle(), appTitle=appTitle, idx=idx)
+                    )
+            for window in self.windows.values():
+                windowTitle = (
+                    window.appTitle if isinstance(window, FakeAppWindow) else self.managerName
+                )
+                if windowTitle == title:
+                    return window
+        raise ElementNotFoundError(title)
+
+    def getWindowAt(self, coords: Tuple[int, int]) -> Optional[FakeAppWindow]:
+        for window in self.windows.values():
+            if not isinstance(window, FakeAppWindow):
+                continue
+            left, top, right, bottom = window.rect
+            if (left <= coords[0] < right) and (top <= coords[1] < bottom):
+                return window
+        return None
+
+    def toWindowCoords(self, window: FakeAppWindow, coords: Tuple[int, int]) -> Tuple[int, int]:
+        return coords[0] - window.rect[0], coords[1] - window.rect[1]
+
+    def claimSlot(self, courtNum: int, slotHour: int) -> bool:
+        with self.lock:
+            if (courtNum, slotHour) in self.takenSlots:
+                return False
+            self.takenSlots.add((courtNum, slotHour))
+        if self.onBooked is not None:
+            self.onBooked(courtNum, slotHour)
+        return True
+
+    def getRequestDelay(self, appTitle: str) -> float:
+        requestDelay = self.requestDelays.get(appTitle, 0.0)
+        return max(0.0, requestDelay * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+    def sendAppRequest(self, appTitle: str, delay: float) -> None:
+        # The app's request to the site, tunnelled through its proxy like HTTPS would be
+        if (appTitle not in self.proxyPorts) or (self.siteAddress is None):
+            return
+        proxyPort = self.proxyPorts[appTitle]
+        siteHost, sitePort = self.siteAddress
+
+        def sendRequest() -> None:
+            time.sleep(delay)
+            try:
+                with socket.create_connection(("127.0.0.1", proxyPort), timeout=2) as sock:
+                    sock.sendall(f"CONNECT {siteHost}:{sitePort} HTTP/1.1\r\n\r\n".encode())
+                    sock.recv(4096)
+                    sock.sendall(
+                        f"GET /app HTTP/1.1\r\nHost: {siteHost}\r\nConnection: close\r\n\r\n".encode()
+                    )
+                    while sock.recv(4096):
+                        pass
+            except OSError:
+                pass
+            return
+
+        threading.Thread(target=sendRequest, daemon=True).start()
+        return
+
+    def recordConfirm(self, appTitle: str) -> bool:
+        clickEpoch = time.time()
+        requestDelay = self.getRequestDelay(appTitle)
+        self.sendAppRequest(appTitle=appTitle, delay=requestDelay)
+        # The site judges the request when it arrives, against the nearest opening,
+        # groups are seconds apart
+        arrivalEpoch = clickEpoch + requestDelay
+        isAccepted = (not self.allOpenEpochs) or arrivalEpoch >= min(
+            self.allOpenEpochs, key=lambda openEpoch: abs(openEpoch - arrivalEpoch)
+        )
+        self.allConfirms.append(
+            dict(
+                appTitle=appTitle,
+                clickEpoch=clickEpoch,
+                arrivalEpoch=arrivalEpoch,
+                isAccepted=isAccepted,
+            )
+        )
+        return isAccepted
+
+    def getWindowRect(self, handle: int) -> tuple:
+        window = self.windows.get(handle)
+        if isinstance(window, FakeAppWindow):
+            return window.rect
+        return (0, 0, 600, 400)
+
+    # Mouse input arrives in absolute screen coordinates
+    def mouseClick(self, button: str = "left", coords=(0, 0)) -> None:
+        with self.lock:
+            window = self.getWindowAt(coords)
+            if window is not None:
+                window.onClick(self.toWindowCoords(window, coords))
+        return
+
+    def mousePress(self, button: str = "left", coords=(0, 0)) -> None:
+        with self.lock:
+            self.pressCoords = coords
+        return
+
+    def mouseRelease(self, button: str = "left", coords=(0, 0)) -> None:
+        with self.lock:
+            pressCoords, self.pressCoords = self.pressCoords, None
+            window = self.getWindowAt(pressCoords) if pressCoords is not None else None
+            if window is not None:
+                window.onDrag(
+                    self.toWindowCoords(window, pressCoords),  # type: ignore
+                    self.toWindowCoords(window, coords),
+                )
+        return
+
+    def mouseScroll(self, coords=(0, 0), wheel_dist: int = 1) -> None:
+        with self.lock:
+            window = self.getWindowAt(coords)
+            if window is not None:
+                window.onScroll(wheel_dist)
+        return
+
+
+def installFakeModules(emulator: FakeEmulator) -> None:
+    # Register stand-ins for the Windows-only modules before any src module imports them
+    class Application:
+        def __init__(self, backend: str = "uia") -> None:
+            self.backend = backend
+
+        def start(self, cmd_line: str) -> "Application":
+            emulator.startManager()
+            return self
+
+        def connect(self, title: str) -> "Application":
+            emulator.findWindow(title)
+            return self
+
+        def window(self, title: str):
+            return emulator.findWindow(title)
+
+    class Timings:
+        after_click_wait = 0.0
+        after_setcursorpos_wait = 0.0
+
+        @classmethod
+        def fast(cls) -> None:
+            return
+
+        @classmethod
+        def slow(cls) -> None:
+            return
+
+        @classmethod
+        def defaults(cls) -> None:
+            return
+
+    pywinauto = types.ModuleType("pywinauto")
+    pywinauto.application = types.SimpleNamespace(Application=Application)  # type: ignore
+    pywinauto.findwindows = types.SimpleNamespace(ElementNotFoundError=ElementNotFoundError)  # type: ignore
+    pywinauto.findbestmatch = types.SimpleNamespace(MatchError=MatchError)  # type: ignore
+    pywinauto.mouse = types.SimpleNamespace(  # type: ignore
+        click=emulator.mouseClick,
+        press=emulator.mousePress,
+        release=emulator.mouseRelease,
+        scroll=emulator.mouseScroll,
+        move=lambda coords=(0, 0): None,
+    )
+    pywinauto.keyboard = types.SimpleNamespace(send_keys=lambda keys: None)  # type: ignore
+    pywinauto.timings = types.SimpleNamespace(Timings=Timings)  # type: ignore
+
+    win32api = types.ModuleType("win32api")
+    win32api.GetSystemMetrics = lambda index: SCREEN_SIZE[index]  # type: ignore
+    win32gui = types.ModuleType("win32gui")
+    win32gui.GetWindowRect = emulator.getWindowRect  # type: ignore
+    win32gui.SetForegroundWindow = lambda handle: None  # type: ignore
+
+    sys.modules.update(pywinauto=pywinauto, win32api=win32api, win32gui=win32gui)
+    return
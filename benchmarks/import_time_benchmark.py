@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import pathlib
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = str(pathlib.Path(__file__).parent.parent)
+
+# Backends each mode loads on its way to doing useful work
+ALL_MODES = {
+    "waitReport": [],
+    "traceReport": [],
+    "onlyConfirm": [("APP_BACKENDS", "pywinauto")],
+    "makeBookings/http": [("WEB_BACKENDS", "http"), ("APP_BACKENDS", "pywinauto")],
+    "makeBookings/selenium": [("WEB_BACKENDS", "selenium"), ("APP_BACKENDS", "pywinauto")],
+    "eager": [
+        ("WEB_BACKENDS", "selenium"),
+        ("WEB_BACKENDS", "http"),
+        ("APP_BACKENDS", "pywinauto"),
+    ],
+}
+
+MODE_SCRIPT = """
+import sys, json, time
+startTime = time.perf_counter()
+sys.path.insert(0, {repoDir!r})
+import main
+import backends
+allMissing = list()
+for registryName, backendName in {allBackends!r}:
+    try:
+        backends.loadBackend(getattr(backends, registryName), backendName)
+    except ImportError as ex:
+        allMissing.append(ex.name)
+print(json.dumps(dict(
+    seconds=time.perf_counter() - startTime,
+    modules=len(sys.modules),
+    missing=sorted(set(allMissing)),
+)))
+"""
+
+
+def runMode(allBackends: list, runs: int) -> dict:
+    # Fresh interpreter per run, so nothing is already in sys.modules
+    allResults = list()
+    for _ in range(runs):
+        script = MODE_SCRIPT.format(repoDir=REPO_DIR, allBackends=allBackends)
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        allResults.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return dict(
+        seconds=statistics.median(result["seconds"] for result in allResults),
+        modules=allResults[-1]["modules"],
+        missing=allResults[-1]["missing"],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure startup import cost per run mode.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=list(ALL_MODES))
+    args = parser.parse_args()
+
+    print(f"{'mode':<24}{'median':>10}{'modules':>10}  missing")
+    for mode in args.modes:
+        modeResult = runMode(allBackends=ALL_MODES[mode], runs=args.runs)
+        print(
+            f"{mode:<24}{modeResult['seconds'] * 1000:8.1f} ms{modeResult['modules']:>10}  "
+            f"{', '.join(modeResult['missing']) or '-'}"
+        )
+    return
+
+
+if __name__ == "__main__":
+    main()
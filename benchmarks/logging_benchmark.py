@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import pathlib
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+import logging.handlers
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(pathlib.Path(__file__).parent.parent, "src"))
+
+from precise_scheduler import PreciseScheduler
+from queued_logging import QueuedLogging
+
+
+class SlowStream:
+    # Console stand-in: every write costs a little, and now and then one stalls on a flush
+    def __init__(self, writeLatency: float, stallEvery: int, stallTime: float) -> None:
+        self.writeLatency = writeLatency
+        self.stallEvery = stallEvery
+        self.stallTime = stallTime
+        self.numWrites = 0
+
+    def write(self, text: str) -> int:
+        self.numWrites += 1
+        isStall = (self.stallEvery > 0) and (self.numWrites % self.stallEvery == 0)
+        time.sleep(self.stallTime if isStall else self.writeLatency)
+        return len(text)
+
+    def flush(self) -> None:
+        return
+
+
+def getLogger(mode: str, args: argparse.Namespace, logDir: str) -> logging.Logger:
+    # Same shape as log_config.json: console, a rotating info file and a rotating error file
+    logger = logging.getLogger(f"benchmark-{mode}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    allHandlers = [
+        logging.StreamHandler(
+            SlowStream(
+                writeLatency=args.writeLatency / 1000,
+                stallEvery=args.stallEvery,
+                stallTime=args.stallMs / 1000,
+            )
+        ),
+        logging.handlers.RotatingFileHandler(
+            os.path.join(logDir, f"{mode}_info.log"), maxBytes=args.rotateBytes, backupCount=2
+        ),
+        logging.handlers.RotatingFileHandler(
+            os.path.join(logDir, f"{mode}_errors.log"), maxBytes=args.rotateBytes, backupCount=2
+        ),
+    ]
+    allHandlers[2].setLevel(logging.ERROR)
+    for handler in allHandlers:
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
+
+
+def runTrial(
+    logger: logging.Logger,
+    scheduler: PreciseScheduler,
+    queuedLogging: QueuedLogging,
+    args: argparse.Namespace,
+) -> dict:
+    # The armed main thread logs like sleepTillOpeningTime and confirmAllBookings do, while
+    # other threads keep logging in the background
+    fireDatetime = datetime.now() + timedelta(seconds=args.armLead / 1000 + 0.05)
+    deadline = scheduler.getDeadline(fireDatetime)
+    isChatting = threading.Event()
+    isChatting.set()
+
+    def chatter() -> None:
+        while isChatting.is_set():
+            logger.info("Background thread progress.")
+            time.sleep(args.chatterInterval / 1000)
+
+    chatterThread = threading.Thread(target=chatter, daemon=True)
+    chatterThread.start()
+    with queuedLogging.quietWindow(fireDatetime=fireDatetime):
+        scheduler.sleepUntil(deadline - args.armLead / 1000)
+        logStart = scheduler.clock()
+        logger.info(f"Woke up {0.0:+.3f} ms from target.")
+        logger.info("Confirming all bookings.")
+        logTime = scheduler.clock() - logStart
+        lateness = scheduler.sleepUntil(deadline)
+        isChatting.clear()
+        chatterThread.join()
+    return dict(latenessMs=lateness * 1000, logMs=logTime * 1000)
+
+
+def runMode(mode: str, args: argparse.Namespace, config: dict, logDir: str) -> dict:
+    logger = getLogger(mode=mode, args=args, logDir=logDir)
+    queuedLogging = QueuedLogging()
+    if mode != "sync":
+        queuedLogging.install(
+            config=dict(
+                queuedLogging=dict(
+                    enabled=True, quietWindow=(mode == "quiet"), quietLead=1, maxQuiet=30
+                )
+            ),
+            loggerName=logger.name,
+        )
+    scheduler = PreciseScheduler(config=config)
+    allResults = [
+        runTrial(logger=logger, scheduler=scheduler, queuedLogging=queuedLogging, args=args)
+        for _ in range(args.trials)
+    ]
+    queuedLogging.stop()
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+    return dict(
+        lateness=sorted(result["latenessMs"] for result in allResults),
+        logTime=sorted(result["logMs"] for result in allResults),
+    )
+
+
+def getSummary(allValues: list) -> str:
+    p95 = allValues[min(len(allValues) - 1, int(round(0.95 * (len(allValues) - 1))))]
+    return (
+        f"{statistics.median(allValues):8.3f} {p95:8.3f} {max(allValues):8.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure how much logging on the critical path delays the fire time."
+    )
+    parser.add_argument("--trials", type=int, default=40)
+    parser.add_argument("--modes", nargs="+", default=["sync", "queued", "quiet"])
+    parser.add_argument("--armLead", type=float, default=20, help="ms of slack after the logs")
+    parser.add_argument("--writeLatency", type=float, default=0.2, help="ms per console write")
+    parser.add_argument("--stallEvery", type=int, default=40, help="console writes per stall")
+    parser.add_argument("--stallMs", type=float, default=60)
+    parser.add_argument("--chatterInterval", type=float, default=2, help="ms between logs")
+    parser.add_argument("--rotateBytes", type=int, default=16384)
+    args = parser.parse_args()
+
+    configFilePath = os.path.join(pathlib.Path(__file__).parent.parent, "config.json")
+    with open(configFilePath) as configJson:
+        config = json.load(configJson)
+
+    logDir = tempfile.mkdtemp(prefix="logging_benchmark_")
+    print(f"{'':<8}{'fire lateness ms':^27}  {'log calls ms':^27}")
+    print(f"{'mode':<8}{'p50':>8} {'p95':>8} {'max':>8}  {'p50':>8} {'p95':>8} {'max':>8}")
+    for mode in args.modes:
+        modeResult = runMode(mode=mode, args=args, config=config, logDir=logDir)
+        print(f"{mode:<8}{getSummary(modeResult['lateness'])}  {getSummary(modeResult['logTime'])}")
+    return
+
+
+if __name__ == "__main__":
+    main()
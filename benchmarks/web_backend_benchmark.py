@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import statistics
+
+sys.path.append(os.path.join(pathlib.Path(__file__).parent.parent, "src"))
+
+from apnacomplex_stub import ApnaComplexStub
+
+
+def getConfig(stub: ApnaComplexStub) -> dict:
+    configFilePath = os.path.join(pathlib.Path(__file__).parent.parent, "config.json")
+    with open(configFilePath) as configJson:
+        config = json.load(configJson)
+    config["web"].update(stub.getWebConfig())
+    config["web"]["clockSync"]["enabled"] = False
+    config["web"]["sessionCache"]["enabled"] = False
+    config["web"]["linkCache"]["enabled"] = False
+    return config
+
+
+def getWebAssistant(backend: str, config: dict):
+    if backend == "http":
+        from http_web_assistant import HttpWebAssistant
+
+        return HttpWebAssistant(config=config)
+    from web_assistant import WebAssistant
+
+    return WebAssistant(config=config)
+
+
+def runBackend(backend: str, config: dict, runs: int) -> dict:
+    allTimes = list()
+    existingBookings = None
+    for _ in range(runs):
+        webAssistant = getWebAssistant(backend=backend, config=config)
+        startTime = time.perf_counter()
+        existingBookings, _ = webAssistant.getExistingBookings(
+            apartmentName=config["apartmentName"]
+        )
+        allTimes.append(time.perf_counter() - startTime)
+    return dict(
+        backend=backend,
+        runs=runs,
+        median=statistics.median(allTimes),
+        best=min(allTimes),
+        existingBookings=existingBookings,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare getExistingBookings latency across web backends."
+    )
+    parser.add_argument("--backends", nargs="+", default=["http", "selenium"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    stub = ApnaComplexStub(latency=args.latency).start()
+    config = getConfig(stub)
+    try:
+        for backend in args.backends:
+            try:
+                result = runBackend(backend=backend, config=config, runs=args.runs)
+            except ImportError as ex:
+                print(f"{backend:<10} skipped ({ex})")
+                continue
+            print(
+                f"{result['backend']:<10} median {result['median'] * 1000:8.1f} ms  "
+                f"best {result['best'] * 1000:8.1f} ms  bookings {result['existingBookings']}"
+            )
+    finally:
+        stub.stop()
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,15 @@ from typing import Any
 sys.path.append(os.path.join(pathlib.Path(__file__).parent, "src"))
 
 from booking_assistant import BookingAssistant
+from booking_daemon import BookingDaemon, sendDaemonCommand
+from wait_engine import WaitEngine
+from tracing import TraceReport
+from queued_logging import queuedLogging
 
 def getCmdLineArg(args: list, arg: str) -> Any:
     dateArgs = []
     intArgs = ["slotHour"]
-    strArgs = []
+    strArgs = ["daemonCommand"]
     argValue = None if arg in (dateArgs + intArgs) else False
     argVar = f"-{arg}"
     if (len(args) > 1) and (argVar in args):
@@ -49,12 +53,27 @@ def main():
     testRun = getCmdLineArg(sys.argv[1:], "testRun")
     onlyConfirm = getCmdLineArg(sys.argv[1:], "onlyConfirm")
     slotHour = getCmdLineArg(sys.argv[1:], "slotHour")
+    waitReport = getCmdLineArg(sys.argv[1:], "waitReport")
+    traceReport = getCmdLineArg(sys.argv[1:], "traceReport")
+    daemon = getCmdLineArg(sys.argv[1:], "daemon")
+    rehearse = getCmdLineArg(sys.argv[1:], "rehearse")
+    daemonCommand = getCmdLineArg(sys.argv[1:], "daemonCommand")
     
     # Load config
     configFilePath = os.path.join(pathlib.Path(__file__).parent, "config.json")
     with open(configFilePath) as configJson:
         config = json.load(configJson)
-        
+
+    if waitReport:
+        WaitEngine(config=config["app"]).printSavingsReport()
+        return
+    if traceReport:
+        TraceReport(config=config).printReport()
+        return
+    if daemonCommand:
+        print(json.dumps(sendDaemonCommand(config=config, command=daemonCommand), indent=4))
+        return
+
     credsFilePath = os.path.join(pathlib.Path(__file__).parent, config["web"]["credentialsFile"])
     with open(credsFilePath) as credsJson:
         config["web"]["apnaComplexCreds"] = json.load(credsJson)
@@ -64,13 +83,20 @@ def main():
     with open(logConfigPath) as logConfigJson:
         logConfig = json.load(logConfigJson)
     logging.config.dictConfig(logConfig)
+    queuedLogging.install(config=config)
 
     if slotHour is not None:
         config["slotHour"] = slotHour
     
+    if daemon:
+        BookingDaemon(config=config, testRun=testRun).run()
+        return
+
     bookingAssistant = BookingAssistant(config=config, testRun=testRun)
     
-    if onlyConfirm:
+    if rehearse:
+        bookingAssistant.rehearse()
+    elif onlyConfirm:
         bookingAssistant.onlyConfirm()
     else:
         bookingAssistant.makeBookings()
@@ -0,0 +1,220 @@
+import io
+import socket
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+
+class AdbError(Exception):
+    pass
+
+
+class AdbClient:
+    # Minimal client for the adb server's smart socket protocol: hex length-prefixed
+    # requests, answered with OKAY or FAIL plus a length-prefixed message
+    def __init__(self, host: str, port: int, timeout: float) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def openSocket(self) -> socket.socket:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def sendRequest(self, sock: socket.socket, request: str) -> None:
+        payload = request.encode()
+        sock.sendall(f"{len(payload):04x}".encode() + payload)
+        return
+
+    def readExact(self, sock: socket.socket, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise AdbError("ADB server closed the connection.")
+            data += chunk
+        return data
+
+    def readMessage(self, sock: socket.socket) -> str:
+        size = int(self.readExact(sock, 4), 16)
+        return self.readExact(sock, size).decode(errors="replace")
+
+    def readStatus(self, sock: socket.socket) -> None:
+        status = self.readExact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self.readMessage(sock))
+        raise AdbError(f"Unexpected ADB reply {status!r}.")
+
+    def connect(self, serial: str) -> str:
+        # Emulator instances listen on TCP ports the adb server has to be told about
+        with self.openSocket() as sock:
+            self.sendRequest(sock, f"host:connect:{serial}")
+            self.readStatus(sock)
+            return self.readMessage(sock)
+
+    def openTransport(self, serial: str) -> socket.socket:
+        # A socket switched to one device, ready for a single service request
+        sock = self.openSocket()
+        try:
+            self.sendRequest(sock, f"host:transport:{serial}")
+            self.readStatus(sock)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def runService(self, serial: str, service: str, sock: Optional[socket.socket] = None) -> bytes:
+        # Returns the service's whole output, once it has exited on the device
+        sock = sock if sock is not None else self.openTransport(serial)
+        with sock:
+            self.sendRequest(sock, service)
+            self.readStatus(sock)
+            allChunks = list()
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                allChunks.append(chunk)
+        return b"".join(allChunks)
+
+    def shell(self, serial: str, command: str, sock: Optional[socket.socket] = None) -> str:
+        return self.runService(serial, f"shell:{command}", sock=sock).decode(errors="replace")
+
+    def execOut(self, serial: str, command: str) -> bytes:
+        # Raw output without the shell's line ending translation, for binary data
+        return self.runService(serial, f"exec:{command}")
+
+
+class AdbInput:
+    # Every instance is its own Android device with its own input queue, so instances
+    # take input in parallel and nothing needs the foreground window
+    isExclusive = False
+
+    def __init__(self, config: dict) -> None:
+        self.config = config["adb"]
+        self.appConfig = config
+        self.logger = logging.getLogger("default")
+        self.client = AdbClient(
+            host=self.config["host"], port=self.config["port"], timeout=self.config["timeout"]
+        )
+        self.allApps: Dict[str, dict] = dict()
+        self.armedSockets: Dict[str, socket.socket] = dict()
+        self.lock = threading.Lock()
+
+    def registerApp(self, appTitle: str, appInfo: dict) -> None:
+        serial = self.config["serials"].get(appTitle)
+        if serial is None:
+            return
+        if appTitle not in self.allApps:
+            self.logger.info(f"ADB for {appTitle}: {self.client.connect(serial)}")
+        self.allApps[appTitle] = dict(serial=serial)
+        return
+
+    def toDeviceCoords(self, windowRect: tuple, coords: tuple) -> Tuple[int, int]:
+        # Positions are screen pixels over the window; the viewport is where the Android
+        # screen sits in a default-sized window
+        viewport = self.config["viewport"]
+        screenSize = self.config["screenSize"]
+        xSizeAdj = (windowRect[2] - windowRect[0]) / self.appConfig["defaultAppWindowSize"]["x"]
+        ySizeAdj = (windowRect[3] - windowRect[1]) / self.appConfig["defaultAppWindowSize"]["y"]
+        relX = (coords[0] - windowRect[0]) / xSizeAdj - viewport["left"]
+        relY = (coords[1] - windowRect[1]) / ySizeAdj - viewport["top"]
+        deviceX = round(relX / (viewport["right"] - viewport["left"]) * screenSize["x"])
+        deviceY = round(relY / (viewport["bottom"] - viewport["top"]) * screenSize["y"])
+        return (
+            min(max(deviceX, 0), screenSize["x"] - 1),
+            min(max(deviceY, 0), screenSize["y"] - 1),
+        )
+
+    def getSerial(self, appInfo: dict) -> str:
+        # By instance, windows can overlap or share a position on screen
+        app = self.allApps.get(appInfo["appTitle"])
+        if app is None:
+            raise AdbError(f"No ADB serial registered for {appInfo['appTitle']}.")
+        return app["serial"]
+
+    def runInput(self, serial: str, inputArgs: str) -> None:
+        with self.lock:
+            sock = self.armedSockets.pop(serial, None)
+        self.client.shell(serial, f"input {inputArgs}", sock=sock)
+        return
+
+    def focus(self, appInfo: dict) -> None:
+        return
+
+    def captureImage(self, appInfo: dict) -> Image.Image:
+        # The device's own framebuffer, right even when windows overlap or are covered
+        pngData = self.client.execOut(self.getSerial(appInfo), "screencap -p")
+        return Image.open(io.BytesIO(pngData))
+
+    def prepareClick(self, appInfo: dict, coords: tuple) -> None:
+        # Switch a socket to the device ahead of time, so the click only sends the command
+        serial = self.getSerial(appInfo)
+        try:
+            sock = self.client.openTransport(serial)
+        except (OSError, AdbError) as ex:
+            self.logger.error(f"Couldn't open an ADB transport to {serial} ahead of the click.")
+            self.logger.error(ex)
+            return
+        with self.lock:
+            staleSock = self.armedSockets.pop(serial, None)
+            self.armedSockets[serial] = sock
+        if staleSock is not None:
+            staleSock.close()
+        return
+
+    def click(self, appInfo: dict, coords: tuple) -> None:
+        deviceX, deviceY = self.toDeviceCoords(appInfo["windowRect"], coords)
+        self.runInput(self.getSerial(appInfo), f"tap {deviceX} {deviceY}")
+        return
+
+    def move(self, appInfo: dict, coords: tuple) -> None:
+        # Touch screens have no hover
+        return
+
+    def scroll(self, appInfo: dict, coords: tuple, wheelDist: int) -> None:
+        # Wheel ticks become slow vertical swipes through the middle of the screen, split so
+        # each swipe stays on it; slow enough not to fling past the page
+        serial = self.getSerial(appInfo)
+        deviceX, _ = self.toDeviceCoords(appInfo["windowRect"], coords)
+        screenHeight = self.config["screenSize"]["y"]
+        totalPixels = wheelDist * self.config["scrollPixels"]
+        maxPixels = screenHeight // 2
+        while totalPixels != 0:
+            swipePixels = max(-maxPixels, min(maxPixels, totalPixels))
+            startY = screenHeight // 2 - swipePixels // 2
+            self.runInput(
+                serial,
+                f"swipe {deviceX} {startY} {deviceX} {startY + swipePixels} "
+                f"{round(self.config['scrollTime'] * 1000)}",
+            )
+            totalPixels -= swipePixels
+        return
+
+    def drag(
+        self,
+        appInfo: dict,
+        startCoords: tuple,
+        stopCoords: tuple,
+        moveSteps: int = 0,
+        stepPause: float = 0.0,
+        holdTime: float = 0.0,
+    ) -> None:
+        # One swipe lasting as long as the mouse drag would have, hold included
+        startX, startY = self.toDeviceCoords(appInfo["windowRect"], startCoords)
+        stopX, stopY = self.toDeviceCoords(appInfo["windowRect"], stopCoords)
+        swipeTime = max(moveSteps * stepPause + holdTime, self.config["minSwipeTime"])
+        self.runInput(
+            self.getSerial(appInfo),
+            f"swipe {startX} {startY} {stopX} {stopY} {round(swipeTime * 1000)}",
+        )
+        return
+
+    def pressBack(self, appInfo: dict) -> None:
+        self.runInput(self.getSerial(appInfo), "keyevent KEYCODE_BACK")
+        return
@@ -1,12 +1,26 @@
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 import time
 import logging
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import pywinauto
 from pywinauto import keyboard, mouse, timings
 
 from win32api import GetSystemMetrics
-from win32gui import GetWindowRect, SetForegroundWindow
+from win32gui import GetWindowRect
+
+from backends import INPUT_BACKENDS, loadBackend
+from confirm_engine import ConfirmEngine
+from latency_probe import LatencyProbe, LatencyProfile
+from navigation_pipeline import NavigationPipeline
+from wait_engine import WaitEngine
+from slot_seeker import SlotSeeker
+from navigation_macro import NavigationMacro
+from tracing import tracer
+from precise_scheduler import PreciseScheduler
 
 
 class AppAssistant:
@@ -14,6 +28,21 @@ class AppAssistant:
         self.config = config["app"]
         self.logger = logging.getLogger("default")
         self.screenResolution = dict(x=GetSystemMetrics(0), y=GetSystemMetrics(1))  # type: ignore
+        self.inputDevice = loadBackend(INPUT_BACKENDS, self.config["inputBackend"])(
+            config=self.config
+        )
+        self.waitEngine = WaitEngine(
+            config=self.config, captureImage=self.inputDevice.captureImage
+        )
+        self.slotSeeker = SlotSeeker(
+            config=self.config, getCoordinates=self.getCoordinates, inputDevice=self.inputDevice
+        )
+        self.navigationMacro = NavigationMacro(config=self.config)
+        self.latencyProfile = LatencyProfile(config=self.config)
+        self.latencyProbe = LatencyProbe(config=self.config)
+        self.managerWindow = None
+        # Per-instance load state, by window title
+        self.allInstances: Dict[str, dict] = dict()
 
     def getAppInfoByName(
         self, appTitle: str, bringToFront: bool = True
@@ -22,12 +51,17 @@ class AppAssistant:
             app = pywinauto.application.Application(backend="uia")
             appConnection = app.connect(title=appTitle)
             appWindow = appConnection.window(title=appTitle)
-            if bringToFront:
-                SetForegroundWindow(appWindow.handle)  # type: ignore
         except pywinauto.findwindows.ElementNotFoundError:
             return None
 
-        appInfo = dict(appWindow=appWindow, windowRect=GetWindowRect(appWindow.handle))  # type: ignore
+        appInfo = dict(
+            appTitle=appTitle,
+            appWindow=appWindow,
+            windowRect=GetWindowRect(appWindow.handle),  # type: ignore
+        )
+        if bringToFront:
+            self.inputDevice.focus(appInfo)
+        self.inputDevice.registerApp(appTitle=appTitle, appInfo=appInfo)
         return appInfo
 
     def closeExistingApp(self, appTitle: str) -> None:
@@ -38,7 +72,7 @@ class AppAssistant:
         appWindow.close()
         return
 
-    def loadInstanceManager(self, allBookingArgs: list):
+    def loadInstanceManager(self, numApps: int):
         self.closeExistingApp(
             appTitle=self.config["multiInstanceManager"]["windowName"]
         )
@@ -49,177 +83,953 @@ class AppAssistant:
             title=self.config["multiInstanceManager"]["windowName"]
         )
         # Select app instances based on number of bookings
-        for i in range(len(allBookingArgs)):
+        for i in range(numApps):
             selectCheckbox = managerWindow[f"CheckBox{i + 2}"]
             if selectCheckbox.get_toggle_state() == 0:
                 selectCheckbox.invoke()
         time.sleep(self.config["sleepDuration"]["instanceLoad"])
         return managerWindow
 
-    def loadAllApnaComplexApps(self, allBookingArgs: list) -> Optional[list]:
+    @tracer.traced()
+    def loadAllApnaComplexApps(self, numApps: int) -> Optional[list]:
         self.logger.info("Initializing BlueStacks Multi Instance Manager.")
+        # Instances pointed at the probe have no network without it
+        if self.config["latencyCalibration"]["enabled"]:
+            self.latencyProbe.start()
         # Close existing Multi Instance Manager and open new window
-        managerWindow = self.loadInstanceManager(allBookingArgs=allBookingArgs)
+        self.managerWindow = self.loadInstanceManager(numApps=numApps)
+        if not self.startAllInstances():
+            return None
+
+        # Each instance is probed and restarted on its own, so one flaky instance neither
+        # holds back nor restarts the others
+        self.logger.info("Loading ApnaComplex app in all instances.")
+        self.allInstances = dict()
+        for appTitle in self.config["appWindowNames"][:numApps]:
+            self.allInstances[appTitle] = dict(
+                appTitle=appTitle,
+                appInfo=dict(appTitle=appTitle, appWindow=None, windowRect=None),
+                launchCount=1,
+            )
+            self.setInstanceStage(self.allInstances[appTitle], "appStart")
+        self.superviseInstances()
+        self.waitEngine.saveHistory()
+
+        # Restarted instances finish loading during navigation
+        allApps = [
+            instance["appInfo"]
+            for instance in self.allInstances.values()
+            if instance["stage"] != "failed"
+        ]
+        numReady = sum(instance["stage"] == "ready" for instance in self.allInstances.values())
+        self.logger.info(
+            f"{numReady} / {numApps} instances loaded, {len(allApps) - numReady} restarting."
+        )
+        return allApps or None
 
-        retries = 0
-        isSuccess = False
-        allApps = None
-        while not isSuccess and retries < self.config["maxRetries"]:
-            retries += 1
+    def startAllInstances(self) -> bool:
+        for retries in range(1, self.config["maxRetries"] + 1):
             try:
                 # Click Start to launch all app instances
-                managerWindow[
-                    self.config["inputElementNames"]["startAllButton"]
-                ].click_input()
-                time.sleep(self.config["sleepDuration"]["appLoad"])
-                # For each app instance, click the ApnaComplex icon to load
-                self.logger.info("Loading ApnaComplex app in all instances.")
-                allApps = list()
-                for idx in range(len(allBookingArgs)):
-                    appInfo = self.getAppInfoByName(
-                        appTitle=self.config["appWindowNames"][idx]
-                    )
-                    if appInfo is not None:
-                        appInfo["appWindow"].click_input(
-                            coords=self.getCoordinates(
-                                element="apnaComplexIcon",
-                                windowRect=appInfo["windowRect"],
-                            )
-                        )
-                        allApps.append(appInfo)
-                        isSuccess = True
-            except Exception:
+                startButton = self.config["inputElementNames"]["startAllButton"]
+                self.managerWindow[startButton].click_input()
+                return True
+            except Exception as ex:
                 self.logger.error(
-                    f"Couldn't load app instances on attempt {retries} / {self.config['maxRetries']}"
+                    f"Couldn't start app instances on attempt {retries} / {self.config['maxRetries']}"
                 )
-                isSuccess = False
+                self.logger.error(ex)
+        return False
+
+    def superviseInstances(self) -> None:
+        # Wait out every first launch; only restarts carry on alongside navigation
+        while any(
+            self.isInstancePending(instance) and instance["launchCount"] == 1
+            for instance in self.allInstances.values()
+        ):
+            for instance in self.allInstances.values():
+                if self.isInstancePending(instance):
+                    self.advanceInstance(instance)
+            time.sleep(self.config["waitEngine"]["pollInterval"])
+        return
 
-        if not isSuccess:
+    def isInstancePending(self, instance: dict) -> bool:
+        return instance["stage"] in ("appStart", "appLoad")
+
+    def setInstanceStage(self, instance: dict, stage: str) -> None:
+        stageStart = time.perf_counter()
+        instance.update(
+            stage=stage,
+            stageStart=stageStart,
+            deadline=stageStart + self.config["sleepDuration"]["appLoad"],
+        )
+        return
+
+    def probeInstance(self, instance: dict) -> Optional[dict]:
+        # Health probe: the window is up and shows the page of the current stage
+        appInfo = self.getAppInfoByName(appTitle=instance["appTitle"], bringToFront=False)
+        if appInfo is None:
+            return None
+        pageCheck = self.waitEngine.getPageCheck(stepName=instance["stage"], appInfo=appInfo)
+        if pageCheck is not None:
+            if pageCheck():
+                return appInfo
+            if time.perf_counter() >= instance["deadline"]:
+                self.waitEngine.recordTimeout(stepName=instance["stage"], appInfo=appInfo)
+            return None
+        # Nothing cached to check against yet, so take the window as loaded after the full
+        # wait and remember what it looks like once the instance navigates
+        if time.perf_counter() < instance["deadline"]:
             return None
-        time.sleep(self.config["sleepDuration"]["appLoad"])
+        self.waitEngine.learnReference(stepName=instance["stage"], appInfo=appInfo)
+        return appInfo
+
+    def advanceInstance(self, instance: dict) -> None:
+        stage = instance["stage"]
+        try:
+            appInfo = self.probeInstance(instance)
+            if appInfo is not None:
+                currentTime = time.perf_counter()
+                self.waitEngine.recordWait(
+                    stage,
+                    currentTime - instance["stageStart"],
+                    self.config["sleepDuration"]["appLoad"],
+                    isReady=currentTime < instance["deadline"],
+                )
+                # Keep the same dict, navigation steps may already hold it
+                instance["appInfo"].update(appInfo)
+                if stage == "appStart":
+                    # Click the ApnaComplex icon to load the app
+                    self.inputDevice.focus(appInfo)
+                    self.inputDevice.click(
+                        appInfo,
+                        self.getCoordinates(
+                            element="apnaComplexIcon",
+                            windowRect=appInfo["windowRect"],
+                            isAbsolute=True,
+                        )
+                    )
+                    self.setInstanceStage(instance, "appLoad")
+                else:
+                    instance["stage"] = "ready"
+                return
+            if time.perf_counter() < instance["deadline"]:
+                return
+            self.logger.error(f"{instance['appTitle']} didn't get past {stage} in time.")
+        except Exception as ex:
+            self.logger.error(f"{instance['appTitle']} failed during {stage}.")
+            self.logger.error(ex)
+        self.restartInstance(instance)
+        return
+
+    def restartInstance(self, instance: dict) -> None:
+        appTitle = instance["appTitle"]
+        if instance["launchCount"] >= self.config["maxRetries"]:
+            self.logger.error(f"Giving up on {appTitle} after {instance['launchCount']} launches.")
+            instance["stage"] = "failed"
+            return
+        instance["launchCount"] += 1
+        # Whatever it showed before failing isn't worth remembering
+        self.waitEngine.discardReferences(appTitle)
+        self.logger.info(
+            f"Restarting {appTitle}, launch {instance['launchCount']} / {self.config['maxRetries']}."
+        )
+        try:
+            # Closing the window stops the instance, its own Start button boots it again
+            self.closeExistingApp(appTitle=appTitle)
+            startButton = self.config["inputElementNames"]["instanceStartButton"].format(
+                instanceNum=self.config["appWindowNames"].index(appTitle) + 1
+            )
+            self.managerWindow[startButton].click_input()
+        except Exception as ex:
+            self.logger.error(f"Couldn't restart {appTitle}.")
+            self.logger.error(ex)
+            instance["stage"] = "failed"
+            return
+        self.setInstanceStage(instance, "appStart")
+        return
 
-        return allApps
+    def checkAllApps(self, allApps: list) -> int:
+        # Refresh every prepared instance and restart only the ones whose window went away;
+        # returns how many are still usable
+        numUsable = 0
+        for appInfo in allApps:
+            instance = self.allInstances[appInfo["appTitle"]]
+            if instance["stage"] == "ready":
+                freshInfo = self.getAppInfoByName(
+                    appTitle=instance["appTitle"], bringToFront=False
+                )
+                if freshInfo is not None:
+                    appInfo.update(freshInfo)
+                else:
+                    self.logger.error(f"{instance['appTitle']} went away.")
+                    self.restartInstance(instance)
+            elif self.isInstancePending(instance):
+                self.advanceInstance(instance)
+            numUsable += instance["stage"] != "failed"
+        return numUsable
+
+    def getRecoverySteps(self, bookingArgs: dict, instance: dict) -> list:
+        # A restarted instance finishes loading inside the pipeline, between the other
+        # instances' steps, and its navigation steps are built once its window is back
+        recoveryTimeout = (
+            2
+            * self.config["sleepDuration"]["appLoad"]
+            * (self.config["maxRetries"] - instance["launchCount"] + 1)
+        )
+        allSteps: List[dict] = list()
+
+        def addNavigationSteps() -> None:
+            if instance["stage"] != "ready":
+                raise RuntimeError(f"{instance['appTitle']} didn't come back after a restart.")
+            navigationSteps = self.getNavigationSteps(
+                bookingArgs=bookingArgs, appInfo=instance["appInfo"]
+            )
+            if navigationSteps is None:
+                raise RuntimeError(f"{instance['appTitle']} has no window to navigate.")
+            allSteps.extend(navigationSteps)
+            return
+
+        allSteps += [
+            dict(
+                name="recoverInstance",
+                kind="recovery",
+                action=lambda: None,
+                settle=recoveryTimeout,
+                readyCheck=lambda: (
+                    self.advanceInstance(instance) or (not self.isInstancePending(instance))
+                ),
+            ),
+            dict(
+                name="recoverNavigation",
+                kind="recovery",
+                action=addNavigationSteps,
+                settle=0,
+            ),
+        ]
+        return allSteps
 
     def navigateAllApps(self, allBookingArgs: list, allApps: list) -> list:
-        successApps = list()
+        allNavigationSteps = dict()
         for idx, bookingArgs in enumerate(allBookingArgs):
-            isSuccess = self.navigateToBooking(
-                bookingArgs=bookingArgs, appInfo=allApps[idx]
-            )
-            successApps.append(allApps[idx])
+            instance = self.allInstances.get(allApps[idx]["appTitle"]) if allApps[idx] else None
+            if (instance is not None) and self.isInstancePending(instance):
+                allSteps = self.getRecoverySteps(bookingArgs=bookingArgs, instance=instance)
+            else:
+                allSteps = self.getNavigationSteps(
+                    bookingArgs=bookingArgs, appInfo=allApps[idx]
+                )
+            if allSteps is None:
+                continue
+            self.logger.info(f"Starting navigation to booking page for {bookingArgs}.")
+            allNavigationSteps[idx] = allSteps
+
+        def focusApp(idx: int) -> None:
+            # A restarting instance has no window to focus until it's back
+            if allApps[idx]["appWindow"] is not None:
+                self.inputDevice.focus(allApps[idx])
+
+        if self.inputDevice.isExclusive:
+            # Interleave instances so one instance's page loads overlap the others' clicks
+            navigationPipeline = self.getNavigationPipeline(focusFunc=focusApp)
+            for idx, allSteps in allNavigationSteps.items():
+                navigationPipeline.addInstance(instanceIdx=idx, allSteps=allSteps)
+            allResults = navigationPipeline.run()
+        else:
+            allResults = self.runParallelNavigation(allNavigationSteps=allNavigationSteps)
+        for idx, isSuccess in allResults.items():
+            self.recordNavigationMacro(allSteps=allNavigationSteps[idx], isSuccess=isSuccess)
+            self.settleReferences(appTitle=allApps[idx]["appTitle"], isSuccess=isSuccess)
+        self.waitEngine.saveHistory()
+        self.navigationMacro.saveMacro()
+        successApps = [
+            allApps[idx] if allResults.get(idx) else None
+            for idx in range(len(allBookingArgs))
+        ]
         return successApps
 
+    def getNavigationPipeline(self, focusFunc: Callable) -> NavigationPipeline:
+        return NavigationPipeline(
+            focusFunc=focusFunc,
+            pollInterval=self.config["waitEngine"]["pollInterval"],
+            recordFunc=self.recordNavigationWait,
+        )
+
+    def runParallelNavigation(self, allNavigationSteps: Dict[int, list]) -> Dict[int, bool]:
+        # Instances take input independently, so each one walks its own steps on its own thread
+        def runInstance(instanceIdx: int) -> Dict[int, bool]:
+            navigationPipeline = self.getNavigationPipeline(focusFunc=lambda idx: None)
+            navigationPipeline.addInstance(
+                instanceIdx=instanceIdx, allSteps=allNavigationSteps[instanceIdx]
+            )
+            return navigationPipeline.run()
+
+        allResults: Dict[int, bool] = dict()
+        with ThreadPoolExecutor(max_workers=max(len(allNavigationSteps), 1)) as executor:
+            for instanceResults in executor.map(runInstance, allNavigationSteps):
+                allResults.update(instanceResults)
+        return allResults
+
     def navigateToBooking(self, bookingArgs: dict, appInfo: dict) -> bool:
-        appWindow = appInfo["appWindow"]
-        windowRect = appInfo["windowRect"]
-        if appWindow is None:
-            self.logger.error(f"Valid app window not found for {bookingArgs}")
+        allSteps = self.getNavigationSteps(bookingArgs=bookingArgs, appInfo=appInfo)
+        if allSteps is None:
             return False
         self.logger.info(f"Starting navigation to booking page for {bookingArgs}.")
 
         # Bring app to foreground
-        SetForegroundWindow(appWindow.handle)  # type: ignore
-        # Open facilities page
-        appWindow.click_input(
-            coords=self.getCoordinates(
-                element="facilitiesButton", windowRect=windowRect
+        self.inputDevice.focus(appInfo)
+        for step in allSteps:
+            with tracer.span(f"navigate.{step['name']}"):
+                self.runNavigationStep(step=step)
+        self.recordNavigationMacro(allSteps=allSteps, isSuccess=True)
+        self.settleReferences(appTitle=appInfo["appTitle"], isSuccess=True)
+        self.waitEngine.saveHistory()
+        self.navigationMacro.saveMacro()
+
+        return True
+
+    def runNavigationStep(self, step: dict) -> None:
+        step["action"]()
+        if step["settle"] <= 0:
+            return
+        elapsed = self.waitEngine.waitFor(
+            stepName=step["name"],
+            timeout=step["settle"],
+            readyCheck=step.get("readyCheck"),
+        )
+        isReady = elapsed < step["settle"]
+        extraWait = None
+        if (not isReady) and (step.get("onTimeout") is not None):
+            extraWait = step["onTimeout"]()
+        # Same as the pipeline: the handler is asked again after each extra wait that
+        # didn't verify, until it has nothing more to wait for
+        while extraWait:
+            extraElapsed = self.waitEngine.waitFor(
+                stepName=step["name"],
+                timeout=extraWait,
+                readyCheck=step.get("readyCheck"),
             )
+            elapsed += extraElapsed
+            if extraElapsed < extraWait:
+                break
+            extraWait = step["onTimeout"]()
+        self.navigationMacro.recordWait(
+            stepName=step["name"], elapsed=elapsed, isReady=isReady
         )
-        time.sleep(self.config["sleepDuration"]["pageLoad"])
+        return
 
-        # Click on page header before scrolling
-        appWindow.click_input(
-            coords=self.getCoordinates(
-                element="facilitiesHeader", windowRect=windowRect
+    def recordNavigationWait(
+        self, stepName: str, elapsed: float, timeout: float, isReady: bool
+    ) -> None:
+        self.waitEngine.recordWait(stepName, elapsed, timeout, isReady=isReady)
+        self.navigationMacro.recordWait(stepName=stepName, elapsed=elapsed, isReady=isReady)
+        return
+
+    def recordNavigationMacro(self, allSteps: list, isSuccess: bool) -> None:
+        # Successful hand-coded runs refresh the recorded macro sequence
+        isHandCoded = all(step.get("kind") != "macro" for step in allSteps)
+        if isSuccess and isHandCoded:
+            self.navigationMacro.recordSequence(allSteps=allSteps)
+        return
+
+    def settleReferences(self, appTitle: str, isSuccess: bool) -> None:
+        # Pages learned on the way only count once the instance made it to the end
+        if isSuccess:
+            self.waitEngine.confirmReferences(appTitle)
+        else:
+            self.waitEngine.discardReferences(appTitle)
+        return
+
+    def getNavigationSteps(self, bookingArgs: dict, appInfo: dict) -> Optional[list]:
+        appWindow = appInfo["appWindow"] if appInfo is not None else None
+        if appWindow is None:
+            self.logger.error(f"Valid app window not found for {bookingArgs}")
+            return None
+        if self.config["navigationMode"] == "macro":
+            macroSteps = self.getMacroSteps(bookingArgs=bookingArgs, appInfo=appInfo)
+            if macroSteps is not None:
+                return macroSteps
+        return self.getHandCodedSteps(bookingArgs=bookingArgs, appInfo=appInfo)
+
+    def getClickStep(
+        self,
+        name: str,
+        element: str,
+        settle: float,
+        bookingArgs: dict,
+        appInfo: dict,
+        isPageLoad: bool = False,
+    ) -> dict:
+        coords = self.getCoordinates(
+            element=element.format(**bookingArgs),
+            windowRect=appInfo["windowRect"],
+            isAbsolute=True,
+        )
+        step = dict(
+            name=name,
+            kind="click",
+            elementTemplate=element,
+            action=lambda: self.inputDevice.click(appInfo, coords),
+            settle=settle,
+        )
+        if isPageLoad:
+            # Poll for the landing page, falling back to the fixed delay as a timeout.
+            # Keyed by the clicked element, since each court lands on its own page
+            reference = element.format(**bookingArgs)
+            step["reference"] = element
+            step["readyCheck"] = self.waitEngine.getPageCheck(
+                stepName=reference, appInfo=appInfo
             )
+            step["onTimeout"] = lambda: self.waitEngine.learnReference(
+                stepName=reference, appInfo=appInfo
+            )
+        return step
+
+    def getScrollStep(
+        self, name: str, wheelDist: int, settle: float, appInfo: dict
+    ) -> dict:
+        coords = self.getCoordinates(
+            element="facilitiesHeader", windowRect=appInfo["windowRect"], isAbsolute=True
+        )
+        return dict(
+            name=name,
+            kind="scroll",
+            element="facilitiesHeader",
+            wheelDist=wheelDist,
+            action=lambda: self.inputDevice.scroll(
+                appInfo=appInfo, coords=coords, wheelDist=wheelDist
+            ),
+            settle=settle,
         )
 
-        # Scroll to the bottom of the facilities page
-        counter = 0
-        while counter < self.config["facilitiesScrollCount"]:
-            counter += 1
-            mouse.scroll(
-                coords=self.getCoordinates(
-                    element="facilitiesHeader", windowRect=windowRect, isAbsolute=True
-                ),
-                wheel_dist=-1,
+    def getTimeSlotSteps(self, slotHour: int, appInfo: dict) -> list:
+        totalDrags = slotHour - self.config["initialSlotHour"]
+        slotReference = self.waitEngine.getPageCheck(
+            stepName=f"timeSlot{slotHour}", appInfo=appInfo
+        )
+        isSeekable = (self.config["slotSeek"]["mode"] == "calibrated") and (
+            slotReference is not None
+        )
+        if isSeekable and self.slotSeeker.isTrusted(appInfo["windowRect"]):
+            return [
+                dict(
+                    name="timeSlotSeek",
+                    kind="timeSlot",
+                    action=lambda: self.seekTimeSlot(slotHour=slotHour, appInfo=appInfo),
+                    settle=0,
+                )
+            ]
+
+        isCalibrated = self.config["slotSeek"]["mode"] == "calibrated"
+        allSteps: List[dict] = list()
+        for i in range(totalDrags):
+            landedHour = self.config["initialSlotHour"] + i + 1
+            isLast = landedHour == slotHour
+            # Remember the landed slot so calibrated seeks can be verified against it, and
+            # the slots on the way so a seek that misses can tell which one it stopped on
+            if isLast:
+                isLearning = slotReference is None
+            else:
+                isLearning = isCalibrated and (
+                    self.waitEngine.getPageCheck(
+                        stepName=f"timeSlot{landedHour}", appInfo=appInfo
+                    )
+                    is None
+                )
+            allSteps.append(
+                dict(
+                    name=f"timeSlotDrag{i + 1}",
+                    kind="timeSlot",
+                    action=lambda: self.dragMouseOnApp(
+                        dragStart="timeSlotDragStart",
+                        dragStop="timeSlotDragStop",
+                        totalDrags=1,
+                        appInfo=appInfo,
+                    ),
+                    settle=(
+                        self.config["sleepDuration"]["smallPause"]
+                        if (isLast or isLearning)
+                        else 0
+                    ),
+                )
             )
-            time.sleep(self.config["sleepDuration"]["smallPause"])
+            if isLearning:
+                allSteps.append(
+                    dict(
+                        name="timeSlotLearn",
+                        kind="timeSlot",
+                        action=lambda stepName=f"timeSlot{landedHour}": (
+                            self.waitEngine.learnReference(stepName=stepName, appInfo=appInfo)
+                        ),
+                        settle=0,
+                    )
+                )
+        return allSteps
+
+    def getHandCodedSteps(self, bookingArgs: dict, appInfo: dict) -> list:
+        sleepDuration = self.config["sleepDuration"]
+        stepArgs = dict(bookingArgs=bookingArgs, appInfo=appInfo)
 
+        # Open facilities page
+        allSteps = [
+            self.getClickStep(
+                "facilitiesButton",
+                "facilitiesButton",
+                sleepDuration["pageLoad"],
+                isPageLoad=True,
+                **stepArgs,
+            )
+        ]
+        # Click on page header before scrolling
+        allSteps.append(
+            self.getClickStep("facilitiesHeader", "facilitiesHeader", 0, **stepArgs)
+        )
+        # Scroll to the bottom of the facilities page
+        allSteps += [
+            self.getScrollStep(
+                f"facilitiesScroll{i + 1}",
+                wheelDist=-1,
+                settle=sleepDuration["smallPause"],
+                appInfo=appInfo,
+            )
+            for i in range(self.config["facilitiesScrollCount"])
+        ]
+        # Remember the scrolled page so a batched macro scroll can be verified
+        allSteps[-1]["readyCheck"] = self.waitEngine.getPageCheck(
+            stepName="facilitiesScrolled", appInfo=appInfo
+        )
+        allSteps[-1]["onTimeout"] = lambda: self.waitEngine.learnReference(
+            stepName="facilitiesScrolled", appInfo=appInfo
+        )
         # Click the tennis court facility icon
-        courtNum = bookingArgs["courtNum"]
-        appWindow.click_input(
-            coords=self.getCoordinates(
-                element=f"tennisCourt{courtNum}Button", windowRect=windowRect
+        allSteps.append(
+            self.getClickStep(
+                "tennisCourtButton",
+                "tennisCourt{courtNum}Button",
+                sleepDuration["pageLoad"],
+                isPageLoad=True,
+                **stepArgs,
             )
         )
-        time.sleep(self.config["sleepDuration"]["pageLoad"])
-
         # Click slot booking button
-        appWindow.click_input(
-            coords=(
-                self.getCoordinates(element="slotBookingButton", windowRect=windowRect)
+        allSteps.append(
+            self.getClickStep(
+                "slotBookingButton",
+                "slotBookingButton",
+                sleepDuration["pageLoad"],
+                isPageLoad=True,
+                **stepArgs,
             )
         )
-        time.sleep(self.config["sleepDuration"]["pageLoad"])
         # Click tomorrow toggle
-        appWindow.click_input(
-            coords=(
-                self.getCoordinates(element="tomorrowToggle", windowRect=windowRect)
+        allSteps.append(
+            self.getClickStep(
+                "tomorrowToggle", "tomorrowToggle", sleepDuration["smallPause"] * 2, **stepArgs
             )
         )
-        time.sleep(self.config["sleepDuration"]["smallPause"])
-        time.sleep(self.config["sleepDuration"]["smallPause"])
-
-        # Drag  slots to bring the correct slot to starting position
-        self.dragMouseOnApp(
-            dragStart="timeSlotDragStart",
-            dragStop="timeSlotDragStop",
-            totalDrags=bookingArgs["slotHour"] - self.config["initialSlotHour"],
-            windowRect=windowRect,
-        )
-
+        # Drag slots to bring the correct slot to starting position
+        allSteps += self.getTimeSlotSteps(slotHour=bookingArgs["slotHour"], appInfo=appInfo)
         # Click the slot at the starting position
-        appWindow.click_input(
-            coords=self.getCoordinates(element="timeSlotButton", windowRect=windowRect)
-        )
+        allSteps.append(self.getClickStep("timeSlotButton", "timeSlotButton", 0, **stepArgs))
         # Click on book now button
-        appWindow.click_input(
-            coords=self.getCoordinates(element="bookNowButton", windowRect=windowRect)
-        )
+        allSteps.append(self.getClickStep("bookNowButton", "bookNowButton", 0, **stepArgs))
 
-        return True
+        return allSteps
+
+    def getMacroSteps(self, bookingArgs: dict, appInfo: dict) -> Optional[list]:
+        sequence = self.navigationMacro.getSequence()
+        if not sequence:
+            return None
+        # Every checkpoint needs a cached page to verify against before the macro can replay
+        for macroStep in sequence:
+            if (macroStep["reference"] is not None) and (
+                self.waitEngine.getPageCheck(
+                    stepName=macroStep["reference"].format(**bookingArgs), appInfo=appInfo
+                )
+                is None
+            ):
+                return None
+
+        allSteps: List[dict] = list()
+        fallbackState = dict(isSlowPath=False)
+        for macroStep in sequence:
+            if macroStep["kind"] == "timeSlot":
+                allSteps += self.getTimeSlotSteps(
+                    slotHour=bookingArgs["slotHour"], appInfo=appInfo
+                )
+                continue
+            if macroStep["kind"] == "scroll":
+                step = self.getScrollStep(
+                    macroStep["name"],
+                    wheelDist=macroStep["wheelDist"],
+                    settle=self.navigationMacro.getTunedSettle(macroStep),
+                    appInfo=appInfo,
+                )
+            else:
+                step = self.getClickStep(
+                    macroStep["name"],
+                    macroStep["element"],
+                    self.navigationMacro.getTunedSettle(macroStep),
+                    **dict(bookingArgs=bookingArgs, appInfo=appInfo),
+                )
+            step["kind"] = "macro"
+            step["slowSettle"] = macroStep["slowSettle"]
+            if macroStep["reference"] is not None:
+                step["readyCheck"] = self.waitEngine.getPageCheck(
+                    stepName=macroStep["reference"].format(**bookingArgs), appInfo=appInfo
+                )
+                step["onTimeout"] = self.getMacroFallback(
+                    step=step,
+                    macroStep=macroStep,
+                    reference=macroStep["reference"].format(**bookingArgs),
+                    allSteps=allSteps,
+                    fallbackState=fallbackState,
+                    appInfo=appInfo,
+                )
+            allSteps.append(step)
+        return allSteps
+
+    def getMacroFallback(
+        self,
+        step: dict,
+        macroStep: dict,
+        reference: str,
+        allSteps: list,
+        fallbackState: dict,
+        appInfo: dict,
+    ):
+        def scrollTick() -> Optional[float]:
+            # Redo the scroll one tick per call, handing the pause back to the caller so the
+            # pipeline drives other instances meanwhile; extra ticks stop at the page bottom
+            if step["scrollTicks"] >= self.config["facilitiesScrollCount"]:
+                return None
+            step["scrollTicks"] += 1
+            self.inputDevice.scroll(
+                appInfo=appInfo,
+                coords=self.getCoordinates(
+                    element="facilitiesHeader",
+                    windowRect=appInfo["windowRect"],
+                    isAbsolute=True,
+                ),
+                wheelDist=-1,
+            )
+            return self.config["sleepDuration"]["smallPause"]
+
+        def onMismatch() -> Optional[float]:
+            if "scrollTicks" in step:
+                return scrollTick()
+            if step.get("isTimedOut"):
+                return None
+            step["isTimedOut"] = True
+            self.waitEngine.recordTimeout(stepName=reference, appInfo=appInfo)
+            if fallbackState["isSlowPath"]:
+                return None
+            # Checkpoint didn't verify in time, finish this instance with slow-path timings
+            fallbackState["isSlowPath"] = True
+            self.logger.error(
+                f"Macro checkpoint {macroStep['name']} didn't verify, falling back to the slow path."
+            )
+            for laterStep in allSteps:
+                laterStep["settle"] = laterStep.get("slowSettle", laterStep["settle"])
+            if macroStep["kind"] == "scroll":
+                step["scrollTicks"] = 0
+                return scrollTick()
+            return max(0.0, macroStep["slowSettle"] - step["settle"])
+
+        return onMismatch
 
-    def confirmAllBookings(self, allApps: list, testRun: bool=False) -> list:
+    def confirmAllBookings(
+        self,
+        allApps: list,
+        fireDatetime: datetime,
+        scheduler: PreciseScheduler,
+        testRun: bool = False,
+        allBookingArgs: Optional[list] = None,
+        confirmLeadTime: float = 0.0,
+    ) -> list:
         timings.Timings.fast()
         timings.Timings.after_click_wait = 0.001
         timings.Timings.after_setcursorpos_wait = 0.001
         self.logger.info("Confirming all bookings.")
-        successList = list()
+        # Precompute absolute confirm coordinates and arm one worker per instance
+        allTargets = [
+            dict(
+                appIdx=idx,
+                coords=self.getCoordinates(
+                    element="confirmButton",
+                    windowRect=appInfo["windowRect"],
+                    isAbsolute=True,
+                ),
+                slotKey=self.getSlotKey(idx, allBookingArgs),
+            )
+            for idx, appInfo in enumerate(allApps)
+            if appInfo is not None
+        ]
+        hedgeConfig = self.config["confirmHedge"]
+        successFunc = None
+        if hedgeConfig["enabled"]:
+            self.assignHedgeOffsets(allTargets)
+            successFunc = self.getConfirmSuccessCheck(allApps)
+        isCalibrated = self.config["latencyCalibration"]["enabled"] and (not testRun)
+        if isCalibrated:
+            self.latencyProbe.start()
+            allTargets = self.getCalibratedTargets(
+                allTargets=allTargets, allApps=allApps, confirmLeadTime=confirmLeadTime
+            )
+        # Keyed by instance, two instances can share confirm coordinates on screen
+        allCoords = {target["appIdx"]: target["coords"] for target in allTargets}
+        if not testRun:
+            for target in allTargets:
+                self.inputDevice.prepareClick(allApps[target["appIdx"]], target["coords"])
+        # A shared cursor means the move+click pair must not interleave across instances
+        inputLock = threading.Lock() if self.inputDevice.isExclusive else nullcontext()
+
+        def clickFunc(appIdx: int) -> None:
+            with inputLock:
+                if isCalibrated:
+                    self.latencyProbe.markClick(allApps[appIdx]["appTitle"])
+                self.confirmBooking(
+                    appInfo=allApps[appIdx], coords=allCoords[appIdx], testRun=testRun
+                )
+
+        confirmEngine = ConfirmEngine(
+            clickFunc=clickFunc,
+            scheduler=scheduler,
+            successFunc=successFunc,
+            pollInterval=hedgeConfig["pollInterval"],
+            resultTimeout=hedgeConfig["resultTimeout"],
+            pollDelay=hedgeConfig["pollDelay"],
+        )
+        confirmEngine.arm(allTargets=allTargets, fireDatetime=fireDatetime)
+        allResults = confirmEngine.release()
+        for result in allResults:
+            for clickResult in result.get("allClicks", list()):
+                tracer.addSpan(
+                    "confirmBooking",
+                    clickResult["fireClock"],
+                    clickResult["doneClock"],
+                    instance=result["appIdx"] + 1,
+                    isSuccess=clickResult["isSuccess"],
+                    offsetMs=round(clickResult["offset"] * 1000, 3),
+                    fireDelayMs=round(clickResult["fireDelay"] * 1000, 3),
+                    skewMs=round(clickResult["skewMs"], 3),
+                    landedSkewMs=round(clickResult["landedSkewMs"], 3),
+                )
+        if (successFunc is not None) and (not testRun):
+            self.recordHedgeStats(confirmEngine.getOffsetStats())
+        if isCalibrated:
+            self.recordClickLatencies(
+                allTitles=[allApps[appIdx]["appTitle"] for appIdx in allCoords]
+            )
+        successList = [result for result in allResults if result.get("isSuccess")]
+        time.sleep(self.config["sleepDuration"]["pageLoad"])
+        return successList
+
+    def getCalibratedTargets(
+        self, allTargets: list, allApps: list, confirmLeadTime: float
+    ) -> list:
+        # The fire time is confirmLeadTime ahead of the opening; every instance instead fires
+        # its lead ahead of the opening, so its request reaches the site just after it. The
+        # click itself does go out before the opening, only the request may not.
+        # Unmeasured instances use a conservative default lead
+        calibrationConfig = self.config["latencyCalibration"]
+        maxLead = max(0.0, min(calibrationConfig["maxLead"], confirmLeadTime))
+        calibratedTargets = list()
+        for target in allTargets:
+            appTitle = allApps[target["appIdx"]]["appTitle"]
+            if self.latencyProbe.dropRequests:
+                if not self.latencyProbe.isRouted(appTitle):
+                    # Without the probe in the way, a rehearsal click would really book
+                    self.logger.error(
+                        f"{appTitle} isn't routed through the latency probe, skipping it."
+                    )
+                    continue
+                # Every instance clicks once, a hedge would hold back clicks on won slots.
+                # Requests never reach the site, so they all fire together to be measured
+                target.update(offsets=[0.0], slotKey=target["appIdx"])
+                calibratedTargets.append(target)
+                continue
+            lead = self.latencyProfile.getLead(appTitle)
+            if lead is None:
+                lead = calibrationConfig["defaultLead"]
+                self.logger.info(f"{appTitle} has no latency profile yet, using the default lead.")
+            clampedLead = min(max(lead, 0.0), maxLead)
+            if clampedLead != lead:
+                self.logger.info(
+                    f"{appTitle} lead of {lead * 1000:.1f} ms clamped to "
+                    f"{clampedLead * 1000:.1f} ms (maxLead or confirmLeadTime)."
+                )
+            # Hedge offsets move clicks around the fire time; the earliest one still has to
+            # land its request after the opening, so a negative offset holds the rest back
+            earliestOffset = min(min(target.get("offsets", [0.0])), 0.0)
+            target["fireDelay"] = confirmLeadTime - clampedLead - earliestOffset
+            self.logger.info(
+                f"{appTitle} first fires {(clampedLead + earliestOffset) * 1000:.1f} ms "
+                "before the opening."
+            )
+            calibratedTargets.append(target)
+        return calibratedTargets
+
+    def recordClickLatencies(self, allTitles: list) -> None:
+        # Time from each instance's first confirm click to its request reaching the probe
+        deadline = self.latencyProbe.clock() + self.config["latencyCalibration"]["requestTimeout"]
+        for appTitle in allTitles:
+            latency = self.latencyProbe.waitForLatency(appTitle=appTitle, deadline=deadline)
+            if latency is None:
+                self.logger.error(f"No request from {appTitle} reached the latency probe.")
+                continue
+            self.latencyProfile.addSample(appTitle=appTitle, latency=latency)
+            self.logger.info(
+                f"{appTitle} confirm request left {latency * 1000:.1f} ms after the click."
+            )
+        self.latencyProfile.saveSamples()
+        return
+
+    def getSlotKey(self, appIdx: int, allBookingArgs: Optional[list]):
+        # Instances on the same court and hour hedge for each other
+        if allBookingArgs is None:
+            return appIdx
+        bookingArgs = allBookingArgs[appIdx]
+        return (bookingArgs["courtNum"], bookingArgs["slotHour"])
+
+    def assignHedgeOffsets(self, allTargets: list) -> None:
+        # The k-th instance on a slot starts at the k-th offset, so spares stagger instead of
+        # firing together, then repeats at the later offsets until its slot is won
+        hedgeConfig = self.config["confirmHedge"]
+        allOffsets = sorted(hedgeConfig["offsets"])
+        slotCounts: Dict[object, int] = dict()
+        for target in allTargets:
+            slotIdx = slotCounts.get(target["slotKey"], 0)
+            slotCounts[target["slotKey"]] = slotIdx + 1
+            startIdx = slotIdx % len(allOffsets)
+            target["offsets"] = (
+                allOffsets[startIdx:] if hedgeConfig["repeatClicks"] else [allOffsets[startIdx]]
+            )
+        return
+
+    def getConfirmSuccessCheck(self, allApps: list) -> Optional[Callable]:
+        # A slot is won once the instance shows the booking-won screen learned from verified
+        # outcomes; a screen that merely changed could as well be an error or a spinner
+        allChecks = {
+            idx: self.waitEngine.getPageCheck(stepName="bookingWon", appInfo=appInfo)
+            for idx, appInfo in enumerate(allApps)
+            if appInfo is not None
+        }
+        if (not allChecks) or (None in allChecks.values()):
+            # Every hedged click fires, and no win rates are recorded without the check
+            self.logger.info("No booking-won screen learned yet, hedged clicks won't stop early.")
+            return None
+
+        def successFunc(appIdx: int) -> bool:
+            return allChecks[appIdx]()  # type: ignore
+
+        return successFunc
+
+    def recordHedgeStats(self, offsetStats: Dict[str, dict]) -> None:
+        statsFile = self.config["confirmHedge"]["statsFile"]
+        allStats = self.waitEngine.loadJson(statsFile, dict())
+        for offsetKey, stats in offsetStats.items():
+            totalStats = allStats.setdefault(offsetKey, dict(clicks=0, wins=0))
+            totalStats["clicks"] += stats["clicks"]
+            totalStats["wins"] += stats["wins"]
+        self.waitEngine.saveJson(statsFile, allStats)
+        self.logger.info(
+            "Slots seen won after each offset: "
+            + ", ".join(
+                f"{offsetKey} ms {stats['wins']}/{stats['clicks']}"
+                for offsetKey, stats in sorted(offsetStats.items(), key=lambda item: float(item[0]))
+            )
+        )
+        return
+
+    def readBookingOutcomes(self, allApps: list, timeout: float) -> List[Optional[bool]]:
+        # Match each result screen against the won and lost screens learned on earlier runs
+        allChecks = list()
         for appInfo in allApps:
             if appInfo is None:
+                allChecks.append(dict())
                 continue
-            isSuccess = self.confirmBooking(windowRect=appInfo["windowRect"], testRun=testRun)
-            if isSuccess:
-                successList.append(isSuccess)
-        time.sleep(self.config["sleepDuration"]["pageLoad"])
-        return successList
+            allChecks.append(
+                {
+                    isWon: pageCheck
+                    for isWon, pageCheck in (
+                        (True, self.waitEngine.getPageCheck("bookingWon", appInfo)),
+                        (False, self.waitEngine.getPageCheck("bookingLost", appInfo)),
+                    )
+                    if pageCheck is not None
+                }
+            )
+        allOutcomes: List[Optional[bool]] = [None] * len(allApps)
 
-    def confirmBooking(self, windowRect: tuple, testRun: bool = False) -> bool:
-        try:
-            confirmCoords = self.getCoordinates(
-                element="confirmButton", windowRect=windowRect, isAbsolute=True
+        def allOutcomesRead() -> bool:
+            for idx, pageChecks in enumerate(allChecks):
+                if allOutcomes[idx] is not None:
+                    continue
+                for isWon, pageCheck in pageChecks.items():
+                    if pageCheck():
+                        allOutcomes[idx] = isWon
+                        break
+            return all(
+                (outcome is not None) or (not pageChecks)
+                for outcome, pageChecks in zip(allOutcomes, allChecks)
             )
-            if testRun:
-                mouse.move(coords=confirmCoords)
-            else:
-                mouse.click(button="left", coords=confirmCoords)
-        except Exception as ex:
+
+        if any(allChecks):
+            self.waitEngine.waitFor(
+                stepName="bookingResult", timeout=timeout, readyCheck=allOutcomesRead
+            )
+        return allOutcomes
+
+    def waitForConfirmDialogs(self, allApps: list) -> None:
+        # Navigation ends on the Book Now click, which normally has the whole wait for the
+        # opening to settle; a rebook confirms straight away, so wait for the dialog itself
+        for appInfo in allApps:
+            if appInfo is not None:
+                self.waitEngine.waitForPage(
+                    stepName="confirmDialog",
+                    appInfo=appInfo,
+                    timeout=self.config["sleepDuration"]["pageLoad"],
+                )
+        return
+
+    def learnBookingOutcome(self, appInfo: dict, isWon: bool) -> None:
+        # Once the web check settles an outcome, remember what its result screen looks like.
+        # The outcome screens aren't waited on, so a mismatch doesn't count against them
+        stepName = "bookingWon" if isWon else "bookingLost"
+        if self.waitEngine.getPageCheck(stepName=stepName, appInfo=appInfo) is None:
+            self.waitEngine.learnReference(stepName=stepName, appInfo=appInfo)
+        # The site settled it, along with the confirm dialog the instance was on
+        self.waitEngine.confirmReferences(appInfo["appTitle"])
+        return
+
+    def returnToHome(self, appInfo: dict) -> bool:
+        # Android back until the app's home page shows again
+        homeCheck = self.waitEngine.getPageCheck(stepName="appLoad", appInfo=appInfo)
+        if homeCheck is None:
+            # Blind back presses could just as well leave the app, so don't try
+            self.logger.error("No home page reference to return to, can't rebook.")
             return False
-        return True
+        for _ in range(self.config["maxBackPresses"]):
+            self.inputDevice.pressBack(appInfo)
+            elapsed = self.waitEngine.waitFor(
+                stepName="returnToHome",
+                timeout=self.config["sleepDuration"]["pageLoad"],
+                readyCheck=homeCheck,
+            )
+            if elapsed < self.config["sleepDuration"]["pageLoad"]:
+                return True
+        return False
+
+    def confirmBooking(self, appInfo: dict, coords: tuple, testRun: bool = False) -> None:
+        if testRun:
+            self.inputDevice.move(appInfo, coords)
+        else:
+            self.inputDevice.click(appInfo, coords)
+        return
 
     def closeAllApnaComplexApps(self) -> None:
         self.logger.info("Closing all app instances and manager window.")
+        self.latencyProbe.stop()
         managerInfo = self.getAppInfoByName(
             appTitle=self.config["multiInstanceManager"]["windowName"]
         )
@@ -267,18 +1077,61 @@ class AppAssistant:
             windowY + int(self.config["mousePosition"][element]["y"] * ySizeAdj),
         )
 
+    def seekTimeSlot(self, slotHour: int, appInfo: dict) -> None:
+        totalHours = slotHour - self.config["initialSlotHour"]
+        windowRect = appInfo["windowRect"]
+        self.slotSeeker.seek(totalHours=totalHours, appInfo=appInfo)
+
+        # Check the landed slot against the one recorded by the per-hour drags
+        pageCheck = self.waitEngine.getPageCheck(
+            stepName=f"timeSlot{slotHour}", appInfo=appInfo
+        )
+        isMatch = None if pageCheck is None else pageCheck()
+        self.slotSeeker.recordVerification(
+            windowRect=windowRect,
+            totalHours=totalHours,
+            isMatch=isMatch,
+            landedHours=None if isMatch is not False else self.getLandedHours(appInfo),
+        )
+        if isMatch is not False:
+            return
+
+        self.logger.error(
+            f"Calibrated seek missed the {slotHour}:00 slot, falling back to per-hour drags."
+        )
+        self.slotSeeker.rewind(totalHours=totalHours, appInfo=appInfo)
+        self.dragMouseOnApp(
+            dragStart="timeSlotDragStart",
+            dragStop="timeSlotDragStop",
+            totalDrags=totalHours,
+            appInfo=appInfo,
+            sleepDuration=self.config["sleepDuration"]["smallPause"],
+        )
+        return
+
+    def getLandedHours(self, appInfo: dict) -> Optional[int]:
+        # The slot a missed seek stopped on, from the pages recorded for other hours
+        for slotHour in range(self.config["initialSlotHour"] + 1, 24):
+            pageCheck = self.waitEngine.getPageCheck(
+                stepName=f"timeSlot{slotHour}", appInfo=appInfo
+            )
+            if (pageCheck is not None) and pageCheck():
+                return slotHour - self.config["initialSlotHour"]
+        return None
+
     def dragMouseOnApp(
         self,
         totalDrags: int,
         dragStart: str,
         dragStop: str,
-        windowRect: tuple,
+        appInfo: dict,
         sleepDuration: int = 0,
     ):
-        timings.Timings.slow()
-        timings.Timings.after_click_wait = 1
-        timings.Timings.after_setcursorpos_wait = 1
+        # Paced per drag rather than through pywinauto's global Timings, which other
+        # instances' threads share
+        dragConfig = self.config["timeSlotDrag"]
         dragCounter = 0
+        windowRect = appInfo["windowRect"]
         startCoords = self.getCoordinates(
             element=dragStart, windowRect=windowRect, isAbsolute=True
         )
@@ -287,8 +1140,14 @@ class AppAssistant:
         )
         while dragCounter < totalDrags:
             dragCounter += 1
-            mouse.press(button="left", coords=startCoords)
-            mouse.release(button="left", coords=stopCoords)
+            self.inputDevice.drag(
+                appInfo=appInfo,
+                startCoords=startCoords,
+                stopCoords=stopCoords,
+                moveSteps=dragConfig["moveSteps"],
+                stepPause=dragConfig["stepPause"],
+                holdTime=dragConfig["holdTime"],
+            )
             if sleepDuration > 0:
                 time.sleep(sleepDuration)
         return
@@ -0,0 +1,33 @@
+import importlib
+import logging
+from typing import Dict, Tuple
+
+# Backend name -> (module, class); modules are only imported when a mode asks for them
+WEB_BACKENDS: Dict[str, Tuple[str, str]] = {
+    "selenium": ("web_assistant", "WebAssistant"),
+    "http": ("http_web_assistant", "HttpWebAssistant"),
+}
+APP_BACKENDS: Dict[str, Tuple[str, str]] = {
+    "pywinauto": ("app_assistant", "AppAssistant"),
+}
+INPUT_BACKENDS: Dict[str, Tuple[str, str]] = {
+    "desktop": ("desktop_input", "DesktopInput"),
+    "adb": ("adb_input", "AdbInput"),
+}
+
+
+def loadBackend(allBackends: Dict[str, Tuple[str, str]], backendName: str) -> type:
+    if backendName not in allBackends:
+        raise ValueError(
+            f"Unknown backend {backendName}, expected one of {', '.join(allBackends)}."
+        )
+    moduleName, className = allBackends[backendName]
+    try:
+        backendModule = importlib.import_module(moduleName)
+    except ImportError as ex:
+        # Platform modules missing here only matter to the mode that needs this backend
+        logging.getLogger("default").error(
+            f"The {backendName} backend needs {ex.name}, which couldn't be imported."
+        )
+        raise
+    return getattr(backendModule, className)
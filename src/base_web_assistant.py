@@ -0,0 +1,197 @@
+import re
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from clock_sync import ClockSync
+from link_cache import CourtLinkCache
+from session_store import SessionStore
+
+
+class BaseWebAssistant:
+    def __init__(self, config: dict) -> None:
+        self.config = config["web"]
+        self.config["maxSlots"] = config["maxSlots"]
+        self.logger = logging.getLogger("default")
+        self.sessionStore = SessionStore(config=self.config)
+        self.linkCache = CourtLinkCache(config=self.config)
+        self.isCachedLinks = False
+
+    def keepWarm(self) -> None:
+        # Backends that can hold a logged-in session between reads keep it alive here
+        return
+
+    def getAccountKey(self) -> str:
+        return f"{self.config['apnaComplexURL']}|{self.config['apnaComplexCreds']['email']}"
+
+    def getCourtNumber(self, facilityName: str, courtNum: Optional[int]) -> tuple:
+        isTennisCourt = facilityName.startswith("Tennis Court")
+        if not isTennisCourt:
+            return False, 0
+        currentCourtNum = int(facilityName.split(" ")[-1])
+        isValid = (courtNum is None) or (courtNum == currentCourtNum)
+        return isValid, currentCourtNum
+
+    def getCachedCourtLinks(self, loadFunc: Callable) -> dict:
+        # Court links practically never change, so only scan the facilities table on a cache miss
+        accountKey = self.getAccountKey()
+        courtLinks = self.linkCache.load(accountKey)
+        if courtLinks is not None:
+            self.isCachedLinks = True
+            return courtLinks
+        courtLinks = loadFunc()
+        if any(courtLinks["viewing"].values()):
+            self.linkCache.save(accountKey, courtLinks)
+        return courtLinks
+
+    def onLinkError(self, linkURL: str) -> None:
+        if not self.isCachedLinks:
+            return
+        self.logger.error(f"Cached court link {linkURL} failed, invalidating link cache.")
+        self.linkCache.invalidate(self.getAccountKey())
+        self.isCachedLinks = False
+        return
+
+    def parseCourtLinks(self, allRows: List[dict], courtNum: Optional[int]) -> dict:
+        # Same result as the Selenium table scan, from plain row data
+        courtLinks: Dict[str, Dict[str, Optional[str]]] = dict(
+            viewing=dict(Court1=None, Court2=None),
+            booking=dict(Court1=None, Court2=None),
+        )
+        linkTitles = dict(
+            viewing="View bookings for this facility",
+            booking="Make a booking for this facility",
+        )
+        for row in reversed(allRows):
+            if not row["cells"]:
+                continue
+            isValid, currentCourtNum = self.getCourtNumber(
+                facilityName=row["cells"][0], courtNum=courtNum
+            )
+            if not isValid:
+                continue
+            for currentLink in row["links"]:
+                if currentLink["title"] == linkTitles["viewing"]:
+                    courtLinks["viewing"][f"Court{currentCourtNum}"] = currentLink["href"]
+                elif currentLink["title"] == linkTitles["booking"]:
+                    courtLinks["booking"][f"Court{currentCourtNum}"] = currentLink["href"]
+        return courtLinks
+
+    def getAllActiveBookings(self, viewingLinks: dict, checkFunc: Callable) -> dict:
+        # Check every court at once so the wall time is bounded by the slowest court
+        existingBookings: Dict[str, Optional[int]] = {court: None for court in viewingLinks}
+        with ThreadPoolExecutor(max_workers=max(len(viewingLinks), 1)) as executor:
+            allFutures = {
+                court: executor.submit(checkFunc, court, viewingLinks[court])
+                for court in viewingLinks
+            }
+            for court, future in allFutures.items():
+                try:
+                    existingBookings[court] = future.result()
+                except Exception as ex:
+                    self.logger.error(f"Booking failed while checking exising bookings for {court}.")
+                    self.logger.error(ex)
+        return existingBookings
+
+    def parseSlotHour(self, slotText: str) -> Optional[int]:
+        # FullCalendar renders times like "7p", "7:00p" or "19:00 - 20:00"
+        slotMatch = re.search(r"(\d{1,2})(?::\d{2})?\s*([ap])?", slotText.lower())
+        if slotMatch is None:
+            return None
+        slotHour = int(slotMatch.group(1)) % 12 if slotMatch.group(2) else int(slotMatch.group(1))
+        if slotMatch.group(2) == "p":
+            slotHour += 12
+        return slotHour
+
+    def countViewBookings(
+        self, allEvents: List[dict], apartmentName: str, checkExpired: bool
+    ) -> int:
+        # Count bookings in one rendered calendar view
+        bookingCount = 0
+        for bookingEvent in allEvents:
+            slotHour = self.parseSlotHour(bookingEvent["time"])
+            if checkExpired and (slotHour is not None) and slotHour < datetime.datetime.now().hour:
+                continue
+            if apartmentName in bookingEvent["title"]:
+                bookingCount += 1
+        return bookingCount
+
+    def parseEventStart(self, eventStart) -> datetime.datetime:
+        if isinstance(eventStart, (int, float)):
+            return datetime.datetime.fromtimestamp(eventStart)
+        if isinstance(eventStart, list):
+            # JS Date arguments use zero-based months
+            dateArgs = list(eventStart) + [0] * (5 - len(eventStart))
+            return datetime.datetime(
+                dateArgs[0], dateArgs[1] + 1, dateArgs[2], dateArgs[3], dateArgs[4]
+            )
+        return datetime.datetime.fromisoformat(str(eventStart).replace("Z", ""))
+
+    def countEventBookings(self, allEvents: List[dict], apartmentName: str) -> int:
+        # Count unexpired bookings for today and all bookings for tomorrow
+        currentTime = datetime.datetime.now()
+        tomorrow = currentTime.date() + datetime.timedelta(days=1)
+        bookingCount = 0
+        for bookingEvent in allEvents:
+            if apartmentName not in str(bookingEvent.get("title", "")):
+                continue
+            eventStart = self.parseEventStart(bookingEvent["start"])
+            if eventStart.date() == currentTime.date():
+                if eventStart.hour >= currentTime.hour:
+                    bookingCount += 1
+            elif eventStart.date() == tomorrow:
+                bookingCount += 1
+        return bookingCount
+
+    def getHourOwners(
+        self, allEvents: List[dict], apartmentName: str, bookingDate: datetime.date
+    ) -> Dict[int, str]:
+        # Who holds each booked hour of the booking day, us or someone else
+        hourOwners = dict()
+        for bookingEvent in allEvents:
+            eventStart = self.parseEventStart(bookingEvent["start"])
+            if eventStart.date() != bookingDate:
+                continue
+            isOurs = apartmentName in str(bookingEvent.get("title", ""))
+            hourOwners[eventStart.hour] = "ours" if isOurs else "taken"
+        return hourOwners
+
+    def splitSlotBookings(self, courtSlots: dict) -> tuple:
+        # Per court (count, hourOwners) pairs into the existing booking counts and the owners
+        existingBookings = {
+            court: None if slots is None else slots[0] for court, slots in courtSlots.items()
+        }
+        slotOwners = {
+            court: None if slots is None else slots[1] for court, slots in courtSlots.items()
+        }
+        return existingBookings, slotOwners
+
+    def getBookingTimeSlot(self, slotHour: int, nextHourCutoff: int) -> tuple:
+        if slotHour is None:
+            slotHour = int(datetime.datetime.now().strftime("%H"))
+            currentMin = int(datetime.datetime.now().strftime("%M"))
+            if currentMin > nextHourCutoff:
+                slotHour += 1
+
+        bookingDatetime = datetime.datetime.now() + datetime.timedelta(days=1)
+        bookingDatetime = bookingDatetime.replace(
+            hour=slotHour, minute=0, second=0, microsecond=1
+        )
+        # Shift the opening time from server clock to local clock
+        if self.config["clockSync"]["enabled"]:
+            bookingDatetime -= datetime.timedelta(seconds=self.getServerClockOffset())
+        return slotHour, bookingDatetime
+
+    def getServerClockOffset(self) -> float:
+        try:
+            clockEstimate = ClockSync(config=self.config).estimateOffset()
+        except Exception as ex:
+            self.logger.error("Couldn't sync with the booking server clock.")
+            self.logger.error(ex)
+            return 0.0
+        self.logger.info(
+            f"Server clock offset is {clockEstimate['offset'] * 1000:+.1f} ms "
+            f"(+/- {clockEstimate['error'] * 1000:.1f} ms, delay {clockEstimate['delay'] * 1000:.1f} ms)."
+        )
+        return clockEstimate["offset"]
@@ -0,0 +1,95 @@
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class BatchPlanner:
+    def __init__(self, config: dict) -> None:
+        self.config = config["batchPlanner"]
+        self.maxSlots = config["maxSlots"]
+        self.logger = logging.getLogger("default")
+
+    def getCandidateHours(self, slotHour: int) -> List[int]:
+        # Ranked preferences that haven't opened yet, or just the run's own hour
+        allHours = [
+            hour for hour in self.config["candidateHours"] if slotHour <= hour < 24
+        ]
+        return allHours or [slotHour]
+
+    def getHourWeight(self, hourRank: int) -> float:
+        hourWeights = self.config["hourWeights"]
+        return hourWeights[min(hourRank, len(hourWeights) - 1)]
+
+    def getCourtCapacity(self, existingBookings: Optional[dict]) -> Tuple[Dict[int, int], int]:
+        # Slots each court can still take, and what's left of the apartment quota
+        courtCapacity = dict()
+        usedSlots = 0
+        for courtNum in self.config["courts"]:
+            if existingBookings is None:
+                courtCapacity[courtNum] = self.config["perCourtCap"]
+                continue
+            courtBookings = existingBookings.get(f"Court{courtNum}")
+            if courtBookings is None:
+                self.logger.error(f"No booking count for Court{courtNum}, leaving it out.")
+                courtCapacity[courtNum] = 0
+                continue
+            courtCapacity[courtNum] = max(0, self.config["perCourtCap"] - courtBookings)
+            usedSlots += courtBookings
+        if existingBookings is not None:
+            # Courts outside the plan still count against the apartment quota
+            usedSlots += sum(
+                count or 0
+                for court, count in existingBookings.items()
+                if int(court[len("Court") :]) not in self.config["courts"]
+            )
+        return courtCapacity, max(0, self.maxSlots - usedSlots)
+
+    def planAllocation(
+        self,
+        numInstances: int,
+        allHours: List[int],
+        existingBookings: Optional[dict],
+        takenSlots: Optional[Set[Tuple[int, int]]] = None,
+    ) -> List[dict]:
+        # Greedy on marginal expected wins: a slot targeted by k instances is won with
+        # probability 1 - (1 - p)^k, so each extra instance on it is worth less than the last
+        winProbability = self.config["winProbability"]
+        courtCapacity, quota = self.getCourtCapacity(existingBookings)
+        slotInstances: Dict[Tuple[int, int], int] = dict()
+        allBookingArgs = list()
+        for _ in range(numInstances):
+            bestSlot, bestGain = None, 0.0
+            for hourRank, slotHour in enumerate(allHours):
+                for courtNum in self.config["courts"]:
+                    if (takenSlots is not None) and ((courtNum, slotHour) in takenSlots):
+                        continue
+                    numTargeting = slotInstances.get((courtNum, slotHour), 0)
+                    isNewSlot = numTargeting == 0
+                    if isNewSlot and ((quota <= 0) or (courtCapacity[courtNum] <= 0)):
+                        continue
+                    gain = (
+                        self.getHourWeight(hourRank)
+                        * winProbability
+                        * (1 - winProbability) ** numTargeting
+                    )
+                    if gain > bestGain:
+                        bestSlot, bestGain = (courtNum, slotHour), gain
+            if bestSlot is None:
+                break
+            if bestSlot not in slotInstances:
+                quota -= 1
+                courtCapacity[bestSlot[0]] -= 1
+            slotInstances[bestSlot] = slotInstances.get(bestSlot, 0) + 1
+            allBookingArgs.append(dict(courtNum=bestSlot[0], slotHour=bestSlot[1]))
+        self.logger.info(
+            f"Planned {len(allBookingArgs)} instances over {len(slotInstances)} slots, "
+            f"{self.getExpectedWins(slotInstances, allHours):.2f} expected wins."
+        )
+        return allBookingArgs
+
+    def getExpectedWins(self, slotInstances: dict, allHours: List[int]) -> float:
+        winProbability = self.config["winProbability"]
+        return sum(
+            self.getHourWeight(allHours.index(slotHour))
+            * (1 - (1 - winProbability) ** numTargeting)
+            for (_, slotHour), numTargeting in slotInstances.items()
+        )
@@ -1,11 +1,18 @@
-import time
-import random
 from datetime import datetime, timedelta
 
 import logging
-from typing import Tuple
-from web_assistant import WebAssistant
-from app_assistant import AppAssistant
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from backends import APP_BACKENDS, WEB_BACKENDS, loadBackend
+from base_web_assistant import BaseWebAssistant
+from batch_planner import BatchPlanner
+from booking_verifier import BookingVerifier
+from precise_scheduler import PreciseScheduler
+from queued_logging import queuedLogging
+from tracing import tracer
+
+if TYPE_CHECKING:
+    from app_assistant import AppAssistant
 
 
 class BookingAssistant:
@@ -13,104 +20,313 @@ class BookingAssistant:
         self.config = config
         self.logger = logging.getLogger("default")
         self.testRun = testRun
+        self.scheduler = PreciseScheduler(config=config)
+        self.batchPlanner = BatchPlanner(config=config)
+        self.bookingVerifier = BookingVerifier(config=config, batchPlanner=self.batchPlanner)
+        self.verifyWebAssistant: Optional[BaseWebAssistant] = None
+
+    def getWebAssistant(self) -> BaseWebAssistant:
+        webAssistantClass = loadBackend(WEB_BACKENDS, self.config["web"]["backend"])
+        return webAssistantClass(config=self.config)
+
+    def getVerifyWebAssistant(self) -> BaseWebAssistant:
+        # One kept assistant, so each verification round reuses the warm session
+        if self.verifyWebAssistant is None:
+            webAssistantClass = loadBackend(
+                WEB_BACKENDS, self.config["verification"]["webBackend"]
+            )
+            self.verifyWebAssistant = webAssistantClass(config=self.config)
+        return self.verifyWebAssistant
+
+    def keepWebWarm(self) -> None:
+        # Only verification reads the site after the fire time
+        if (not self.config["verification"]["enabled"]) or self.testRun:
+            return
+        try:
+            self.getVerifyWebAssistant().keepWarm()
+        except Exception as ex:
+            self.logger.error("Couldn't keep the ApnaComplex session warm.")
+            self.logger.error(ex)
+        return
+
+    def getAppAssistant(self) -> "AppAssistant":
+        appAssistantClass = loadBackend(APP_BACKENDS, self.config["app"]["backend"])
+        return appAssistantClass(config=self.config)
 
+    @tracer.traced()
     def getAllBookingArgs(self) -> Tuple[list, int, datetime]:
         self.logger.info(f"Checking existing bookings.")
 
-        webAssistant = WebAssistant(config=self.config)
+        # Use dummy data for test run; its slot opens on the local clock, so there's no
+        # server clock to sync with
+        if self.testRun:
+            allBookingArgs, slotHour, bookingDatetime = self.getDummyBookingArgs()
+            return self.setBookingDatetimes(allBookingArgs, slotHour, bookingDatetime)
+
+        webAssistant = self.getWebAssistant()
         # Get existing booking counts for each court
         slotHour, bookingDatetime = webAssistant.getBookingTimeSlot(
             slotHour=self.config["slotHour"],
             nextHourCutoff=self.config["nextHourCutoff"],
         )
-
-        # Use dummy data for test run
-        if self.testRun:
-            return self.getDummyBookingArgs()
-        elif self.config["numSlots"] > self.config["maxSlots"]:
-            return self.getMaxBookingArgs(
+        if self.config["numSlots"] > self.config["maxSlots"]:
+            allBookingArgs, slotHour, bookingDatetime = self.getMaxBookingArgs(
                 slotHour=slotHour, bookingDatetime=bookingDatetime
             )
+        else:
+            existingBookings, _ = webAssistant.getExistingBookings(
+                apartmentName=self.config["apartmentName"]
+            )
+            # Spread the instances over the free (court, hour) slots
+            allBookingArgs = self.batchPlanner.planAllocation(
+                numInstances=self.config["numSlots"],
+                allHours=self.batchPlanner.getCandidateHours(slotHour),
+                existingBookings=existingBookings,
+            )
+            if not allBookingArgs:
+                self.logger.error("Too many active bookings found. Can't book any more.")
+                return list(), slotHour, bookingDatetime
+        return self.setBookingDatetimes(allBookingArgs, slotHour, bookingDatetime)
 
-        existingBookings, _ = webAssistant.getExistingBookings(
-            apartmentName=self.config["apartmentName"]
-        )
-        # Get list of available courts
-        courtNumList = webAssistant.selectCourtNum(
-            existingBookings=existingBookings,
-            numSlots=self.config["numSlots"],
-        )
-        if courtNumList is None:
-            self.logger.error("Too many active bookings found. Can't book any more.")
-            return list(), slotHour, bookingDatetime
+    def setBookingDatetimes(
+        self, allBookingArgs: list, slotHour: int, bookingDatetime: datetime
+    ) -> Tuple[list, int, datetime]:
+        # Each hour opens on its own, an hour after the previous one
+        for bookingArgs in allBookingArgs:
+            bookingArgs["bookingDatetime"] = bookingDatetime + timedelta(
+                hours=bookingArgs["slotHour"] - slotHour
+            )
+        return allBookingArgs, slotHour, bookingDatetime
 
-        # Create booking arguments for each court booking
-        allBookingArgs = [
-            dict(courtNum=courtNum, slotHour=slotHour) for courtNum in courtNumList
-        ]
-        evenArgs = [
-            allBookingArgs[i] for i in range(len(allBookingArgs)) if (i % 2 == 0)
-        ]
-        oddArgs = [
-            allBookingArgs[i] for i in range(len(allBookingArgs)) if (i % 2 == 1)
-        ]
-        reorderedArgs = evenArgs + oddArgs
-        return reorderedArgs, slotHour, bookingDatetime
+    def getFireDatetime(self, bookingDatetime: datetime) -> datetime:
+        # Slots open a day ahead; fire slightly before the opening instant
+        return bookingDatetime - timedelta(
+            days=1, seconds=self.config["confirmLeadTime"]
+        )
 
+    @tracer.traced()
     def sleepTillOpeningTime(self, bookingDatetime: datetime):
         self.logger.info("Sleeping till booking time arrives.")
-        timeRemaining = bookingDatetime - datetime.now()
-        sleepTime = self.config["sleepDuration"]["long"]
-        while timeRemaining >= timedelta(hours=24, minutes=00, seconds=1):
-            time.sleep(sleepTime)
-            timeRemaining = bookingDatetime - datetime.now()
-            if timeRemaining < timedelta(
-                hours=24, minutes=0, seconds=(self.config["sleepDuration"]["long"] * 2)
-            ):
-                sleepTime = self.config["sleepDuration"]["short"]
+        # Wake up early enough to arm the confirm workers before the fire time
+        wakeDatetime = self.getFireDatetime(bookingDatetime) - timedelta(
+            seconds=self.config["sleepDuration"]["arm"]
+        )
+        wakeError = self.scheduler.sleepUntilDatetime(targetDatetime=wakeDatetime)
+        self.logger.info(f"Woke up {wakeError * 1000:+.3f} ms from target.")
 
         return
 
     def makeBookings(self) -> None:
-        appAssistant = AppAssistant(config=self.config)
+        tracer.startRun(config=self.config, runName="makeBookings")
+        try:
+            self.bookAllSlots()
+        finally:
+            tracer.finishRun()
+        return
+
+    def bookAllSlots(self) -> None:
+        appAssistant = self.getAppAssistant()
 
         # Minimize all open windows
         appAssistant.minimizeAllWindows()
 
-        # Get booking arguments based on existing bookings
-        allBookingArgs, slotHour, bookingDatetime = self.getAllBookingArgs()
-        if allBookingArgs is None:
+        preparedBooking = self.prepareBooking(appAssistant=appAssistant)
+        if preparedBooking is None:
             return
+        self.completeBooking(appAssistant=appAssistant, preparedBooking=preparedBooking)
+        return
+
+    def prepareBooking(self, appAssistant: "AppAssistant") -> Optional[dict]:
+        # Check existing bookings on the web while the emulator instances boot
+        numApps = min(self.config["numSlots"], len(self.config["app"]["appWindowNames"]))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            bookingArgsFuture = executor.submit(self.getAllBookingArgs)
+            allApps = appAssistant.loadAllApnaComplexApps(numApps=numApps)
+            try:
+                allBookingArgs, slotHour, bookingDatetime = bookingArgsFuture.result()
+            except Exception as ex:
+                self.logger.error("Couldn't check existing bookings.")
+                self.logger.error(ex)
+                allBookingArgs = None
+
+        if not allBookingArgs or not allApps:
+            if allApps and not self.testRun:
+                appAssistant.closeAllApnaComplexApps()
+            return None
 
         # Book courts using the app assistant
+        allHours = sorted(set(bookingArgs["slotHour"] for bookingArgs in allBookingArgs))
         self.logger.info(
-            f"Booking {len(allBookingArgs)} slots for {slotHour}:00 hours."
+            f"Booking {len(allBookingArgs)} slots for "
+            f"{', '.join(f'{hour}:00' for hour in allHours)} hours."
+        )
+        # Only the instances matching bookable courts go on to navigation
+        allBookingArgs = allBookingArgs[: len(allApps)]
+        allApps = allApps[: len(allBookingArgs)]
+        return dict(
+            allBookingArgs=allBookingArgs,
+            allApps=allApps,
+            slotHour=slotHour,
+            bookingDatetime=bookingDatetime,
         )
 
-        # allBookingArgs, _, bookingDatetime = self.getDummyBookingArgs()
-        allApps = appAssistant.loadAllApnaComplexApps(allBookingArgs=allBookingArgs)
-        if not allApps:
-            return
-
+    def completeBooking(self, appAssistant: "AppAssistant", preparedBooking: dict) -> None:
+        allBookingArgs = preparedBooking["allBookingArgs"]
         allApps = appAssistant.navigateAllApps(
-            allBookingArgs=allBookingArgs, allApps=allApps
+            allBookingArgs=allBookingArgs, allApps=preparedBooking["allApps"]
         )
         if not allApps:
             return
 
-        self.sleepTillOpeningTime(bookingDatetime=bookingDatetime)
-        successList = appAssistant.confirmAllBookings(
-            allApps=allApps, testRun=self.testRun
-        )
+        # Confirm in one group per opening time; later groups wait on their confirm page
+        for bookingDatetime in sorted(
+            set(bookingArgs["bookingDatetime"] for bookingArgs in allBookingArgs)
+        ):
+            groupApps, groupBookingArgs = list(), list()
+            for appInfo, bookingArgs in zip(allApps, allBookingArgs):
+                if bookingArgs["bookingDatetime"] == bookingDatetime:
+                    groupApps.append(appInfo)
+                    groupBookingArgs.append(bookingArgs)
+            if not any(groupApps):
+                continue
+            fireDatetime = self.getFireDatetime(bookingDatetime)
+            with queuedLogging.quietWindow(fireDatetime=fireDatetime):
+                self.sleepTillOpeningTime(bookingDatetime=bookingDatetime)
+                appAssistant.confirmAllBookings(
+                    allApps=groupApps,
+                    fireDatetime=fireDatetime,
+                    scheduler=self.scheduler,
+                    testRun=self.testRun,
+                    allBookingArgs=groupBookingArgs,
+                    confirmLeadTime=self.config["confirmLeadTime"],
+                )
+            if self.config["verification"]["enabled"] and not self.testRun:
+                # Lost instances may only move to hours that have opened by now
+                groupHour = groupBookingArgs[0]["slotHour"]
+                self.verifyBookings(
+                    appAssistant=appAssistant,
+                    allApps=groupApps,
+                    allBookingArgs=groupBookingArgs,
+                    openedHours=[
+                        hour
+                        for hour in self.batchPlanner.getCandidateHours(preparedBooking["slotHour"])
+                        if hour <= groupHour
+                    ],
+                )
 
         if not self.testRun:
             appAssistant.closeAllApnaComplexApps()
 
         return
 
+    @tracer.traced()
+    def verifyBookings(
+        self,
+        appAssistant: "AppAssistant",
+        allApps: list,
+        allBookingArgs: list,
+        openedHours: List[int],
+    ) -> None:
+        verifyConfig = self.config["verification"]
+        for roundIdx in range(verifyConfig["maxRounds"] + 1):
+            # Every slot in a group opens at once, so they share the day; rounded to the
+            # hour, since the clock offset can move the opening just before midnight
+            bookingDate = (allBookingArgs[0]["bookingDatetime"] + timedelta(minutes=30)).date()
+            # Court calendars and result screens are read at the same time
+            webAssistant = self.getVerifyWebAssistant()
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                slotFuture = executor.submit(
+                    webAssistant.getSlotBookings,
+                    apartmentName=self.config["apartmentName"],
+                    bookingDate=bookingDate,
+                )
+                screenOutcomes = appAssistant.readBookingOutcomes(
+                    allApps=allApps, timeout=verifyConfig["screenTimeout"]
+                )
+                try:
+                    existingBookings, slotOwners = slotFuture.result()
+                except Exception as ex:
+                    self.logger.error("Couldn't check the court calendars after confirming.")
+                    self.logger.error(ex)
+                    existingBookings, slotOwners = None, None
+
+            calendarOutcomes = self.bookingVerifier.getCalendarOutcomes(
+                allBookingArgs=allBookingArgs, slotOwners=slotOwners
+            )
+            allOutcomes = self.bookingVerifier.getOutcomes(
+                calendarOutcomes=calendarOutcomes, screenOutcomes=screenOutcomes
+            )
+            self.bookingVerifier.logOutcomes(allBookingArgs=allBookingArgs, allOutcomes=allOutcomes)
+            allSlots = [(args["courtNum"], args["slotHour"]) for args in allBookingArgs]
+            for appInfo, calendarOutcome, screenOutcome, slot in zip(
+                allApps, calendarOutcomes, screenOutcomes, allSlots
+            ):
+                # The calendar can't tell which of several instances on one slot won it
+                if (appInfo is None) or (calendarOutcome is None) or (allSlots.count(slot) > 1):
+                    continue
+                # Only a screen the calendar doesn't contradict is worth remembering
+                if screenOutcome not in (None, calendarOutcome):
+                    self.logger.error(
+                        f"{appInfo['appTitle']} shows a {'won' if screenOutcome else 'lost'} "
+                        f"screen, but the calendar says otherwise."
+                    )
+                    continue
+                appAssistant.learnBookingOutcome(appInfo=appInfo, isWon=calendarOutcome)
+
+            lostIdxs = [
+                idx
+                for idx, (appInfo, isWon) in enumerate(zip(allApps, allOutcomes))
+                if (appInfo is not None) and (isWon is False)
+            ]
+            if (not lostIdxs) or (slotOwners is None) or (roundIdx == verifyConfig["maxRounds"]):
+                return
+            allRebookingArgs = self.bookingVerifier.planRebooking(
+                numLost=len(lostIdxs),
+                openedHours=openedHours,
+                existingBookings=existingBookings,  # type: ignore
+                slotOwners=slotOwners,
+            )
+            if not allRebookingArgs:
+                self.logger.info("No free slots left to rebook.")
+                return
+
+            # Back to the app's home page, then straight through to the confirm click
+            rebookApps, rebookArgs = list(), list()
+            for idx, bookingArgs in zip(lostIdxs, allRebookingArgs):
+                if not appAssistant.returnToHome(appInfo=allApps[idx]):
+                    continue
+                bookingArgs["bookingDatetime"] = allBookingArgs[idx]["bookingDatetime"]
+                rebookApps.append(allApps[idx])
+                rebookArgs.append(bookingArgs)
+            if not rebookApps:
+                return
+            self.logger.info(f"Rebooking {len(rebookApps)} lost instances on {rebookArgs}.")
+            with tracer.span("rebook", numInstances=len(rebookApps)):
+                allApps = appAssistant.navigateAllApps(
+                    allBookingArgs=rebookArgs, allApps=rebookApps
+                )
+                appAssistant.waitForConfirmDialogs(allApps=allApps)
+                appAssistant.confirmAllBookings(
+                    allApps=allApps,
+                    fireDatetime=datetime.now(),
+                    scheduler=self.scheduler,
+                    allBookingArgs=rebookArgs,
+                )
+            allBookingArgs = rebookArgs
+        return
+
     def onlyConfirm(self) -> None:
-        appAssistant = AppAssistant(config=self.config)
-        webAssistant = WebAssistant(config=self.config)
+        tracer.startRun(config=self.config, runName="onlyConfirm")
+        try:
+            self.confirmOpenApps()
+        finally:
+            tracer.finishRun()
+        return
+
+    def confirmOpenApps(self) -> None:
+        appAssistant = self.getAppAssistant()
+        # Only the opening time is needed, so no site backend gets loaded
+        webAssistant = BaseWebAssistant(config=self.config)
         # Get existing booking counts for each court
         _, bookingDatetime = webAssistant.getBookingTimeSlot(
             slotHour=self.config["slotHour"],
@@ -126,19 +342,79 @@ class BookingAssistant:
 
         print(allApps)
 
-        self.sleepTillOpeningTime(bookingDatetime=bookingDatetime)
-        successList = appAssistant.confirmAllBookings(allApps=allApps)
+        fireDatetime = self.getFireDatetime(bookingDatetime)
+        with queuedLogging.quietWindow(fireDatetime=fireDatetime):
+            self.sleepTillOpeningTime(bookingDatetime=bookingDatetime)
+            successList = appAssistant.confirmAllBookings(
+                allApps=allApps,
+                fireDatetime=fireDatetime,
+                scheduler=self.scheduler,
+                confirmLeadTime=self.config["confirmLeadTime"],
+            )
         appAssistant.closeAllApnaComplexApps()
 
         return
 
+    def rehearse(self) -> None:
+        tracer.startRun(config=self.config, runName="rehearse")
+        try:
+            self.rehearseConfirms()
+        finally:
+            tracer.finishRun()
+        return
+
+    def rehearseConfirms(self) -> None:
+        calibrationConfig = self.config["app"]["latencyCalibration"]
+        if not calibrationConfig["enabled"]:
+            self.logger.error("Latency calibration is disabled, there's nothing to rehearse.")
+            return
+        appAssistant = self.getAppAssistant()
+        # The probe swallows the confirm requests, so the clicks are real but nothing is booked
+        appAssistant.latencyProbe.dropRequests = True
+        appAssistant.minimizeAllWindows()
+        preparedBooking = self.prepareBooking(appAssistant=appAssistant)
+        if preparedBooking is None:
+            return
+        allApps = preparedBooking["allApps"]
+        allBookingArgs = preparedBooking["allBookingArgs"]
+        # Each round goes back home and through to the confirm page again for another sample
+        for roundIdx in range(calibrationConfig["rehearsalRounds"]):
+            self.logger.info(
+                f"Rehearsal round {roundIdx + 1} / {calibrationConfig['rehearsalRounds']}."
+            )
+            if roundIdx > 0:
+                allPairs = [
+                    (appInfo, bookingArgs)
+                    for appInfo, bookingArgs in zip(allApps, allBookingArgs)
+                    if (appInfo is not None) and appAssistant.returnToHome(appInfo=appInfo)
+                ]
+                # Back home, the apps need the site again to navigate
+                for appInfo, _ in allPairs:
+                    appAssistant.latencyProbe.unblock(appInfo["appTitle"])
+                allApps = [appInfo for appInfo, _ in allPairs]
+                allBookingArgs = [bookingArgs for _, bookingArgs in allPairs]
+            allApps = appAssistant.navigateAllApps(allBookingArgs=allBookingArgs, allApps=allApps)
+            if not any(allApps):
+                break
+            appAssistant.waitForConfirmDialogs(allApps=allApps)
+            appAssistant.confirmAllBookings(
+                allApps=allApps,
+                fireDatetime=datetime.now(),
+                scheduler=self.scheduler,
+                allBookingArgs=allBookingArgs,
+            )
+        appAssistant.closeAllApnaComplexApps()
+        return
+
     def getMaxBookingArgs(
         self, slotHour: int, bookingDatetime: datetime
     ) -> Tuple[list, int, datetime]:
-        bookingArgs = list()
-        for i in range(self.config["numSlots"] // 2):
-            bookingArgs.append(dict(courtNum=1, slotHour=slotHour))
-            bookingArgs.append(dict(courtNum=2, slotHour=slotHour))
+        # Skip the web check and plan as if no court had any bookings yet
+        bookingArgs = self.batchPlanner.planAllocation(
+            numInstances=self.config["numSlots"],
+            allHours=self.batchPlanner.getCandidateHours(slotHour),
+            existingBookings=None,
+        )
         return bookingArgs, slotHour, bookingDatetime
 
     def getDummyBookingArgs(self) -> Tuple[list, int, datetime]:
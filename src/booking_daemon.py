@@ -0,0 +1,271 @@
+import os
+import hmac
+import json
+import queue
+import socket
+import logging
+import pathlib
+import secrets
+import threading
+import socketserver
+from datetime import datetime, timedelta
+from typing import Optional
+
+from booking_assistant import BookingAssistant
+from tracing import tracer
+
+REPO_DIR = pathlib.Path(__file__).parent.parent
+
+
+def getTokenPath(config: dict) -> str:
+    return os.path.join(REPO_DIR, config["daemon"]["tokenFile"])
+
+
+def loadDaemonToken(config: dict) -> str:
+    # Shared secret every command has to carry; made on the daemon's first start and only
+    # readable by the user running it
+    tokenPath = getTokenPath(config)
+    if not os.path.exists(tokenPath):
+        tokenFd = os.open(tokenPath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(tokenFd, "w") as tokenFile:
+            tokenFile.write(secrets.token_hex(32))
+    with open(tokenPath) as tokenFile:
+        return tokenFile.read().strip()
+
+
+class BookingDaemon:
+    def __init__(self, config: dict, testRun: bool) -> None:
+        self.config = config
+        self.daemonConfig = config["daemon"]
+        self.logger = logging.getLogger("default")
+        self.bookingAssistant = BookingAssistant(config=config, testRun=testRun)
+        self.appAssistant = None
+        self.preparedBooking: Optional[dict] = None
+        self.bookingAt: Optional[datetime] = None
+        self.prewarmRetryAt: Optional[datetime] = None
+        self.nextHealthCheck: Optional[datetime] = None
+        self.defaultSlotHour = config["slotHour"]
+        # Jobs run on the main thread, UI automation doesn't like being driven from others
+        self.commandQueue: queue.Queue = queue.Queue()
+        self.server: Optional[socketserver.ThreadingTCPServer] = None
+        self.status = dict(state="idle", lastRun=None, lastHealthCheck=None)
+        self.isStopping = False
+        self.token = loadDaemonToken(config)
+
+    def getNextBookingDatetime(self) -> datetime:
+        # Earliest scheduled opening that still leaves time to navigate; slots open on the hour
+        currentTime = datetime.now()
+        navigationLead = timedelta(seconds=self.daemonConfig["navigationLead"])
+        allBookingTimes = list()
+        for dayOffset in range(2):
+            for bookingHour in self.daemonConfig["bookingHours"]:
+                bookingAt = (currentTime + timedelta(days=dayOffset)).replace(
+                    hour=bookingHour, minute=0, second=0, microsecond=0
+                )
+                if bookingAt - navigationLead > currentTime:
+                    allBookingTimes.append(bookingAt)
+        return min(allBookingTimes)
+
+    def getNextEvent(self) -> tuple:
+        if self.preparedBooking is None:
+            prewarmAt = self.getNextBookingDatetime() - timedelta(
+                seconds=self.daemonConfig["prewarmLead"]
+            )
+            if (self.prewarmRetryAt is not None) and (self.prewarmRetryAt > prewarmAt):
+                prewarmAt = self.prewarmRetryAt
+            return "prewarm", prewarmAt
+        navigateAt = self.bookingAt - timedelta(  # type: ignore
+            seconds=self.daemonConfig["navigationLead"]
+        )
+        if self.nextHealthCheck < navigateAt:  # type: ignore
+            return "healthCheck", self.nextHealthCheck
+        return "book", navigateAt
+
+    def run(self) -> None:
+        self.startServer()
+        self.logger.info(
+            f"Booking daemon listening on {self.daemonConfig['host']}:{self.daemonConfig['port']}."
+        )
+        try:
+            while not self.isStopping:
+                eventName, eventAt = self.getNextEvent()
+                self.status["nextEvent"] = f"{eventName} at {eventAt:%Y-%m-%d %H:%M:%S}"
+                waitTime = (eventAt - datetime.now()).total_seconds()
+                if waitTime > 0:
+                    # Idle on the command queue until the next scheduled event
+                    try:
+                        command = self.commandQueue.get(timeout=waitTime)
+                    except queue.Empty:
+                        continue
+                    self.runCommand(command)
+                    continue
+                self.runEvent(eventName)
+        finally:
+            self.releasePrepared()
+            self.server.shutdown()  # type: ignore
+            self.server.server_close()  # type: ignore
+        return
+
+    def runEvent(self, eventName: str) -> None:
+        if eventName == "prewarm":
+            self.prewarm()
+        elif eventName == "healthCheck":
+            self.checkHealth()
+        elif eventName == "book":
+            self.book()
+        return
+
+    def prewarm(self) -> None:
+        bookingAt = self.getNextBookingDatetime()
+        self.logger.info(f"Pre-warming for the {bookingAt:%H:%M} booking.")
+        self.status["state"] = "prewarming"
+        tracer.startRun(config=self.config, runName="daemon")
+        # Pin the slot hour, so the booking doesn't depend on when pre-warm ran
+        self.config["slotHour"] = bookingAt.hour
+        self.appAssistant = self.bookingAssistant.getAppAssistant()
+        try:
+            self.appAssistant.minimizeAllWindows()
+            self.preparedBooking = self.bookingAssistant.prepareBooking(
+                appAssistant=self.appAssistant
+            )
+        except Exception as ex:
+            self.logger.error(ex)
+            self.preparedBooking = None
+        finally:
+            self.config["slotHour"] = self.defaultSlotHour
+        if self.preparedBooking is None:
+            # Nothing to book or startup failed; retry while there's still time before navigation
+            self.logger.error("Pre-warm didn't produce a bookable run.")
+            tracer.finishRun()
+            self.appAssistant = None
+            self.prewarmRetryAt = datetime.now() + timedelta(
+                seconds=self.daemonConfig["healthInterval"]
+            )
+            self.status["state"] = "idle"
+            return
+        # Log the web session in now and keep it warm, so verifying after the fire time
+        # doesn't start with a login
+        self.bookingAssistant.keepWebWarm()
+        self.bookingAt = bookingAt
+        self.prewarmRetryAt = None
+        self.nextHealthCheck = datetime.now() + timedelta(
+            seconds=self.daemonConfig["healthInterval"]
+        )
+        self.status["state"] = "prewarmed"
+        return
+
+    def checkHealth(self) -> None:
+        # Instances whose window went away are restarted on their own; only when none is
+        # left are they all booted again
+        self.nextHealthCheck = datetime.now() + timedelta(
+            seconds=self.daemonConfig["healthInterval"]
+        )
+        self.status["lastHealthCheck"] = f"{datetime.now():%Y-%m-%d %H:%M:%S}"
+        self.bookingAssistant.keepWebWarm()
+        numUsable = self.appAssistant.checkAllApps(  # type: ignore
+            allApps=self.preparedBooking["allApps"]  # type: ignore
+        )
+        if numUsable > 0:
+            return
+        self.logger.error("No pre-warmed instance is left, starting them again.")
+        self.releasePrepared()
+        self.prewarm()
+        return
+
+    def book(self) -> None:
+        self.status["state"] = "booking"
+        try:
+            self.bookingAssistant.completeBooking(
+                appAssistant=self.appAssistant,  # type: ignore
+                preparedBooking=self.preparedBooking,  # type: ignore
+            )
+            self.status["lastRun"] = f"{datetime.now():%Y-%m-%d %H:%M:%S} scheduled booking"
+        except Exception as ex:
+            self.logger.error("Scheduled booking failed.")
+            self.logger.error(ex)
+        finally:
+            tracer.finishRun()
+            # completeBooking closes the instances, so the daemon idles until the next pre-warm
+            self.preparedBooking = None
+            self.appAssistant = None
+            self.bookingAt = None
+            self.status["state"] = "idle"
+        return
+
+    def releasePrepared(self) -> None:
+        if self.preparedBooking is None:
+            return
+        self.appAssistant.closeAllApnaComplexApps()  # type: ignore
+        tracer.finishRun()
+        self.preparedBooking = None
+        self.appAssistant = None
+        self.bookingAt = None
+        self.status["state"] = "idle"
+        return
+
+    def runCommand(self, command: str) -> None:
+        self.logger.info(f"Running ad-hoc {command} command.")
+        if command == "stop":
+            self.isStopping = True
+            return
+        # An ad-hoc run starts the instance manager afresh, so drop any pre-warmed state
+        self.releasePrepared()
+        self.status["state"] = command
+        try:
+            if command == "book":
+                self.bookingAssistant.makeBookings()
+            elif command == "confirm":
+                self.bookingAssistant.onlyConfirm()
+            self.status["lastRun"] = f"{datetime.now():%Y-%m-%d %H:%M:%S} ad-hoc {command}"
+        except Exception as ex:
+            self.logger.error(f"Ad-hoc {command} failed.")
+            self.logger.error(ex)
+        finally:
+            self.status["state"] = "idle"
+        return
+
+    def handleRequest(self, request: str) -> dict:
+        # Called from the server thread; anything that touches the apps goes through the queue
+        token, _, command = request.partition(" ")
+        if not hmac.compare_digest(token.encode(), self.token.encode()):
+            self.logger.error("Rejected a daemon command without a valid token.")
+            return dict(isSuccess=False, error="Invalid token.")
+        if command == "status":
+            return dict(isSuccess=True, **self.status)
+        if command not in ("book", "confirm", "stop"):
+            return dict(isSuccess=False, error=f"Unknown command {command}.")
+        if (command != "stop") and (self.status["state"] not in ("idle", "prewarmed")):
+            return dict(isSuccess=False, error=f"Busy: {self.status['state']}.")
+        self.commandQueue.put(command)
+        return dict(isSuccess=True, queued=command)
+
+    def startServer(self) -> None:
+        daemon = self
+
+        class CommandHandler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                request = self.rfile.readline().decode().strip()
+                response = daemon.handleRequest(request)
+                self.wfile.write((json.dumps(response) + "\n").encode())
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        # Bound to the configured local address only, and every command needs the token
+        self.server = socketserver.ThreadingTCPServer(
+            (self.daemonConfig["host"], self.daemonConfig["port"]), CommandHandler
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return
+
+
+def sendDaemonCommand(config: dict, command: str) -> dict:
+    daemonConfig = config["daemon"]
+    if not os.path.exists(getTokenPath(config)):
+        return dict(isSuccess=False, error="No daemon token yet, start the daemon first.")
+    with open(getTokenPath(config)) as tokenFile:
+        token = tokenFile.read().strip()
+    with socket.create_connection(
+        (daemonConfig["host"], daemonConfig["port"]), timeout=daemonConfig["timeout"]
+    ) as connection:
+        connection.sendall(f"{token} {command}\n".encode())
+        response = connection.makefile().readline()
+    return json.loads(response)
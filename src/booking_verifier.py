@@ -0,0 +1,70 @@
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from batch_planner import BatchPlanner
+
+
+class BookingVerifier:
+    def __init__(self, config: dict, batchPlanner: BatchPlanner) -> None:
+        self.config = config["verification"]
+        self.batchPlanner = batchPlanner
+        self.logger = logging.getLogger("default")
+
+    def getCalendarOutcomes(
+        self, allBookingArgs: List[dict], slotOwners: Optional[dict]
+    ) -> List[Optional[bool]]:
+        # Won or lost only when the calendar shows someone on the hour; a court that
+        # couldn't be read or an hour nobody holds yet leaves it unverified
+        ownerOutcomes = dict(ours=True, taken=False)
+        allOutcomes: List[Optional[bool]] = list()
+        for bookingArgs in allBookingArgs:
+            hourOwners = (slotOwners or dict()).get(f"Court{bookingArgs['courtNum']}")
+            slotOwner = None if hourOwners is None else hourOwners.get(bookingArgs["slotHour"])
+            allOutcomes.append(ownerOutcomes.get(slotOwner))  # type: ignore
+        return allOutcomes
+
+    def getOutcomes(
+        self,
+        calendarOutcomes: List[Optional[bool]],
+        screenOutcomes: List[Optional[bool]],
+    ) -> List[Optional[bool]]:
+        # The court calendar is the ground truth; the result screen only fills in where
+        # the calendar couldn't tell
+        return [
+            screenOutcome if calendarOutcome is None else calendarOutcome
+            for calendarOutcome, screenOutcome in zip(calendarOutcomes, screenOutcomes)
+        ]
+
+    def getTakenSlots(self, slotOwners: dict) -> Set[Tuple[int, int]]:
+        # Booked by anyone, or on a court whose calendar couldn't be read
+        takenSlots = set()
+        for courtNum in self.batchPlanner.config["courts"]:
+            hourOwners = slotOwners.get(f"Court{courtNum}")
+            for slotHour in range(24):
+                if (hourOwners is None) or (slotHour in hourOwners):
+                    takenSlots.add((courtNum, slotHour))
+        return takenSlots
+
+    def planRebooking(
+        self,
+        numLost: int,
+        openedHours: List[int],
+        existingBookings: Dict[str, Optional[int]],
+        slotOwners: dict,
+    ) -> List[dict]:
+        # Next-best free slots among the hours that have already opened, within what's
+        # left of the quota after this round's wins
+        return self.batchPlanner.planAllocation(
+            numInstances=numLost,
+            allHours=openedHours,
+            existingBookings=existingBookings,
+            takenSlots=self.getTakenSlots(slotOwners),
+        )
+
+    def logOutcomes(self, allBookingArgs: List[dict], allOutcomes: List[Optional[bool]]) -> None:
+        for bookingArgs, isWon in zip(allBookingArgs, allOutcomes):
+            outcome = "unverified" if isWon is None else ("won" if isWon else "lost")
+            self.logger.info(
+                f"Court {bookingArgs['courtNum']} at {bookingArgs['slotHour']}:00 {outcome}."
+            )
+        return
@@ -0,0 +1,118 @@
+import json
+import math
+import time
+import logging
+import http.client
+from email.utils import parsedate_to_datetime
+from typing import List, Tuple
+from urllib.parse import urlsplit
+
+
+class ClockSync:
+    def __init__(self, config: dict) -> None:
+        self.config = config["clockSync"]
+        self.logger = logging.getLogger("default")
+        # Local wall time derived from the monotonic clock, so a clock step mid-sync can't skew samples
+        self.anchorEpoch = time.time()
+        self.anchorCounter = time.perf_counter()
+
+    def localTime(self) -> float:
+        return self.anchorEpoch + (time.perf_counter() - self.anchorCounter)
+
+    def getConnection(self, url: str) -> http.client.HTTPConnection:
+        urlParts = urlsplit(url)
+        connectionClass = (
+            http.client.HTTPSConnection
+            if urlParts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        return connectionClass(urlParts.netloc, timeout=self.config["timeout"])
+
+    def requestServerTime(
+        self, connection: http.client.HTTPConnection, path: str, useEndpoint: bool
+    ) -> Tuple[float, float, float, float]:
+        # Returns server time, its resolution and the local send/receive times
+        method = "GET" if useEndpoint else "HEAD"
+        sendTime = self.localTime()
+        connection.request(method, path, headers={"Cache-Control": "no-cache"})
+        response = connection.getresponse()
+        receiveTime = self.localTime()
+        body = response.read()
+        if useEndpoint:
+            try:
+                serverTime = float(body)
+            except ValueError:
+                serverTime = float(json.loads(body)[self.config["timeField"]])
+            return serverTime, 0.0, sendTime, receiveTime
+
+        dateHeader = response.getheader("Date")
+        if dateHeader is None:
+            raise ValueError("Server response has no Date header.")
+        serverTime = parsedate_to_datetime(dateHeader).timestamp()
+        return serverTime, 1.0, sendTime, receiveTime
+
+    def collectSamples(self) -> List[dict]:
+        useEndpoint = bool(self.config["timeEndpoint"])
+        url = self.config["timeEndpoint"] if useEndpoint else self.config["url"]
+        path = urlsplit(url).path or "/"
+        if urlsplit(url).query:
+            path += f"?{urlsplit(url).query}"
+
+        allSamples: List[dict] = list()
+        connection = self.getConnection(url)
+        try:
+            # Warm up the connection so TLS and TCP setup don't count as delay
+            self.requestServerTime(connection, path, useEndpoint)
+            for _ in range(self.config["samples"]):
+                serverTime, resolution, sendTime, receiveTime = self.requestServerTime(
+                    connection, path, useEndpoint
+                )
+                # Server stamped somewhere within [sendTime, receiveTime] with value in [serverTime, serverTime + resolution)
+                allSamples.append(
+                    dict(
+                        lower=serverTime - receiveTime,
+                        upper=serverTime + resolution - sendTime,
+                        delay=receiveTime - sendTime,
+                        resolution=resolution,
+                    )
+                )
+                self.waitForNextSample(allSamples)
+        finally:
+            connection.close()
+        return allSamples
+
+    def waitForNextSample(self, allSamples: List[dict]) -> None:
+        if allSamples[-1]["resolution"] == 0:
+            time.sleep(self.config["sampleInterval"])
+            return
+        # Centre the next request on the predicted server second boundary to bisect the offset
+        lower = max(sample["lower"] for sample in allSamples)
+        upper = min(sample["upper"] for sample in allSamples)
+        if lower > upper:
+            time.sleep(self.config["sampleInterval"])
+            return
+        offsetGuess = (lower + upper) / 2
+        halfDelay = min(sample["delay"] for sample in allSamples) / 2
+        serverNow = self.localTime() + offsetGuess
+        nextBoundary = math.ceil(serverNow + halfDelay) - offsetGuess - halfDelay
+        time.sleep(max(0.0, nextBoundary - self.localTime()))
+        return
+
+    def estimateOffset(self) -> dict:
+        allSamples = self.collectSamples()
+        lower = max(sample["lower"] for sample in allSamples)
+        upper = min(sample["upper"] for sample in allSamples)
+        bestSample = min(allSamples, key=lambda sample: sample["delay"])
+        if lower <= upper:
+            offset = (lower + upper) / 2
+            error = (upper - lower) / 2
+        else:
+            # Inconsistent bounds, fall back to the lowest-delay sample NTP-style
+            offset = (bestSample["lower"] + bestSample["upper"]) / 2
+            error = (bestSample["upper"] - bestSample["lower"]) / 2
+        return dict(
+            offset=offset,
+            error=error,
+            delay=bestSample["delay"],
+            samples=len(allSamples),
+        )
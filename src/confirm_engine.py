@@ -0,0 +1,205 @@
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from precise_scheduler import PreciseScheduler
+
+
+class ConfirmEngine:
+    def __init__(
+        self,
+        clickFunc: Callable,
+        scheduler: PreciseScheduler,
+        armTimeout: float = 5,
+        successFunc: Optional[Callable] = None,
+        pollInterval: float = 0.01,
+        resultTimeout: float = 0.5,
+        pollDelay: float = 0.0,
+    ) -> None:
+        self.clickFunc = clickFunc
+        self.scheduler = scheduler
+        self.armTimeout = armTimeout
+        # Optional check that an instance's booking went through, used to stop hedged clicks
+        self.successFunc = successFunc
+        self.pollInterval = pollInterval
+        self.resultTimeout = resultTimeout
+        # Checks capture the screen, so they hold off until the wave's clicks are all out
+        self.pollDelay = pollDelay
+        self.logger = logging.getLogger("default")
+        self.workers: List[threading.Thread] = list()
+        self.results: List[dict] = list()
+        self.barriers: Dict[float, threading.Barrier] = dict()
+        self.wonSlots: Dict[object, float] = dict()
+        self.wonLock = threading.Lock()
+        self.fireDatetime: Optional[datetime] = None
+        self.fireDeadline: Optional[float] = None
+        self.wakeError: Optional[float] = None
+
+    def arm(self, allTargets: list, fireDatetime: datetime) -> None:
+        # One worker per instance, parked on a barrier per fire offset
+        self.fireDatetime = fireDatetime
+        self.fireDeadline = self.scheduler.getDeadline(fireDatetime)
+        allOffsets = sorted(
+            set(offset for target in allTargets for offset in self.getFireOffsets(target))
+        )
+        self.barriers = {
+            offset: threading.Barrier(
+                sum(offset in self.getFireOffsets(target) for target in allTargets) + 1
+            )
+            for offset in allOffsets
+        }
+        self.wonSlots = dict()
+        self.results = [dict() for _ in allTargets]
+        self.workers = list()
+        for idx, target in enumerate(allTargets):
+            worker = threading.Thread(
+                target=self.fireWorker,
+                args=(idx, target),
+                name=f"confirm-{idx}",
+                daemon=True,
+            )
+            worker.start()
+            self.workers.append(worker)
+        return
+
+    def getFireOffsets(self, target: dict) -> List[float]:
+        # Hedge offsets, moved by the instance's own delay from the shared fire time
+        fireDelay = target.get("fireDelay", 0.0)
+        return [fireDelay + offset for offset in target.get("offsets", [0.0])]
+
+    def fireWorker(self, idx: int, target: dict) -> None:
+        result = self.results[idx]
+        result.update(appIdx=target["appIdx"], coords=target["coords"], allClicks=list())
+        allOffsets = sorted(target.get("offsets", [0.0]))
+        fireDelay = target.get("fireDelay", 0.0)
+        slotKey = target.get("slotKey", target["appIdx"])
+        for offsetIdx, offset in enumerate(allOffsets):
+            try:
+                self.barriers[fireDelay + offset].wait(timeout=None)
+            except threading.BrokenBarrierError:
+                result.setdefault("isSuccess", False)
+                result.setdefault("error", "Barrier broken before release")
+                return
+            # Once the slot is won, keep joining the remaining waves without clicking
+            if slotKey in self.wonSlots:
+                continue
+
+            clickResult = self.fireClick(
+                appIdx=target["appIdx"], offset=offset, fireDelay=fireDelay
+            )
+            result["allClicks"].append(clickResult)
+            if len(result["allClicks"]) == 1:
+                result.update(clickResult)
+            result["isSuccess"] = result.get("isSuccess") or clickResult["isSuccess"]
+
+            nextOffset = (
+                fireDelay + allOffsets[offsetIdx + 1] if offsetIdx + 1 < len(allOffsets) else None
+            )
+            if self.waitForSuccess(appIdx=target["appIdx"], nextOffset=nextOffset):
+                with self.wonLock:
+                    self.wonSlots.setdefault(slotKey, offset)
+                result["wonOffset"] = offset
+        return
+
+    def fireClick(self, appIdx: int, offset: float, fireDelay: float = 0.0) -> dict:
+        # Skews are measured against this click's own offset from the fire time
+        deadline = self.fireDeadline + fireDelay + offset  # type: ignore
+        fireTime = self.scheduler.clock()
+        fireEpoch = time.time()
+        try:
+            self.clickFunc(appIdx)
+            isSuccess, error = True, None
+        except Exception as ex:
+            isSuccess, error = False, str(ex)
+        doneTime = self.scheduler.clock()
+        return dict(
+            offset=offset,
+            fireDelay=fireDelay,
+            isSuccess=isSuccess,
+            error=error,
+            fireTime=fireEpoch,
+            fireClock=fireTime,
+            doneClock=doneTime,
+            skewMs=(fireTime - deadline) * 1000,
+            clickMs=(doneTime - fireTime) * 1000,
+            landedSkewMs=(doneTime - deadline) * 1000,
+        )
+
+    def waitForSuccess(self, appIdx: int, nextOffset: Optional[float]) -> bool:
+        # Poll for success until shortly before this worker's next click is due,
+        # or for a while after its last one, so the winning offset is still recorded
+        if self.successFunc is None:
+            return False
+        if nextOffset is None:
+            pollUntil = self.scheduler.clock() + self.resultTimeout
+        else:
+            pollUntil = self.fireDeadline + nextOffset - self.pollInterval  # type: ignore
+        if self.scheduler.clock() + self.pollDelay + self.pollInterval >= pollUntil:
+            return False
+        time.sleep(self.pollDelay)
+        while True:
+            checkStart = self.scheduler.clock()
+            try:
+                if self.successFunc(appIdx):
+                    return True
+            except Exception:
+                return False
+            checkEnd = self.scheduler.clock()
+            # Stop while there's still room to park on the next wave's barrier, a late
+            # worker holds back every click of that wave
+            if checkEnd + self.pollInterval + 2 * (checkEnd - checkStart) >= pollUntil:
+                return False
+            time.sleep(self.pollInterval)
+
+    def release(self) -> list:
+        if not self.barriers:
+            return list()
+        self.wakeError = None
+        for offset, barrier in sorted(self.barriers.items()):
+            wakeError = self.scheduler.sleepUntil(deadline=self.fireDeadline + offset)  # type: ignore
+            if self.wakeError is None:
+                self.wakeError = wakeError
+            try:
+                barrier.wait(timeout=self.armTimeout)
+            except threading.BrokenBarrierError:
+                self.logger.error(
+                    f"Not all confirm workers were armed for the {offset * 1000:+.0f} ms wave."
+                )
+        for worker in self.workers:
+            worker.join(timeout=self.armTimeout)
+        self.logSpread()
+        return self.results
+
+    def getOffsetStats(self) -> Dict[str, dict]:
+        # Clicks fired and slots won per offset, for tuning the hedge offsets
+        offsetStats: Dict[str, dict] = dict()
+        for result in self.results:
+            for clickResult in result.get("allClicks", list()):
+                stats = offsetStats.setdefault(
+                    f"{clickResult['offset'] * 1000:+.0f}", dict(clicks=0, wins=0)
+                )
+                stats["clicks"] += 1
+        # A slot counts once, for the wave after whose click the won screen first showed;
+        # with a slow result page that can be a later wave than the one that took
+        for offset in self.wonSlots.values():
+            offsetStats.setdefault(f"{offset * 1000:+.0f}", dict(clicks=0, wins=0))["wins"] += 1
+        return offsetStats
+
+    def logSpread(self) -> None:
+        allSkews = [result["skewMs"] for result in self.results if "skewMs" in result]
+        if not allSkews:
+            return
+        for result in self.results:
+            if "skewMs" in result:
+                self.logger.info(
+                    f"Instance {result['appIdx'] + 1} fired at {result['skewMs']:+.2f} ms "
+                    f"(click landed at {result['landedSkewMs']:+.2f} ms)."
+                )
+        self.logger.info(f"Release woke {self.wakeError * 1000:+.3f} ms from target.")  # type: ignore
+        self.logger.info(
+            f"Confirm spread across {len(allSkews)} instances: "
+            f"{max(allSkews) - min(allSkews):.2f} ms."
+        )
+        return
@@ -0,0 +1,68 @@
+import time
+
+from pywinauto import mouse
+
+from win32gui import SetForegroundWindow
+
+
+class DesktopInput:
+    # All instances share the desktop cursor and keyboard focus, so only one instance
+    # can take input at a time
+    isExclusive = True
+
+    def __init__(self, config: dict) -> None:
+        self.config = config
+
+    def registerApp(self, appTitle: str, appInfo: dict) -> None:
+        return
+
+    def focus(self, appInfo: dict) -> None:
+        SetForegroundWindow(appInfo["appWindow"].handle)  # type: ignore
+        return
+
+    def captureImage(self, appInfo: dict):
+        # What's on screen over the window, so it has to be on top
+        return appInfo["appWindow"].capture_as_image()
+
+    def prepareClick(self, appInfo: dict, coords: tuple) -> None:
+        return
+
+    def click(self, appInfo: dict, coords: tuple) -> None:
+        mouse.click(button="left", coords=coords)
+        return
+
+    def move(self, appInfo: dict, coords: tuple) -> None:
+        mouse.move(coords=coords)
+        return
+
+    def scroll(self, appInfo: dict, coords: tuple, wheelDist: int) -> None:
+        mouse.scroll(coords=coords, wheel_dist=wheelDist)
+        return
+
+    def drag(
+        self,
+        appInfo: dict,
+        startCoords: tuple,
+        stopCoords: tuple,
+        moveSteps: int = 0,
+        stepPause: float = 0.0,
+        holdTime: float = 0.0,
+    ) -> None:
+        mouse.press(button="left", coords=startCoords)
+        for step in range(1, moveSteps + 1):
+            mouse.move(
+                coords=(
+                    startCoords[0] + round((stopCoords[0] - startCoords[0]) * step / moveSteps),
+                    startCoords[1] + round((stopCoords[1] - startCoords[1]) * step / moveSteps),
+                )
+            )
+            time.sleep(stepPause)
+        if holdTime > 0:
+            time.sleep(holdTime)
+        mouse.release(button="left", coords=stopCoords)
+        return
+
+    def pressBack(self, appInfo: dict) -> None:
+        # Esc is the emulator's Android back key
+        appInfo["appWindow"].type_keys("{ESC}")
+        return
@@ -0,0 +1,202 @@
+import time
+import datetime
+from typing import Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from base_web_assistant import BaseWebAssistant
+from tracing import tracer
+from page_parsers import parseCalendarEvents, parseFacilityRows, parseLoginForm
+
+
+class HttpWebAssistant(BaseWebAssistant):
+    def __init__(self, config: dict) -> None:
+        super().__init__(config=config)
+        # Logged-in session and its facilities page, kept between reads once keepWarm runs
+        self.warmSession: Optional[Tuple[requests.Session, str]] = None
+
+    def keepWarm(self) -> None:
+        # Log in once, then refresh the facilities page so neither the session nor the
+        # pooled connection goes stale before the next read
+        if self.warmSession is not None:
+            session = self.warmSession[0]
+            try:
+                response = session.get(
+                    self.config["apnaComplexURL"], timeout=self.config["webDriverDelay"]
+                )
+                response.raise_for_status()
+                if parseFacilityRows(response.text) is not None:
+                    self.warmSession = (session, response.text)
+                    return
+            except requests.RequestException as ex:
+                self.logger.error("Warm ApnaComplex session failed, logging in again.")
+                self.logger.error(ex)
+            session.close()
+            self.warmSession = None
+        self.warmSession = self.getApnaComplexSession()
+        return
+
+    def openSession(self) -> Tuple[requests.Session, str]:
+        return self.warmSession or self.getApnaComplexSession()
+
+    def closeSession(self, session: requests.Session) -> None:
+        if (self.warmSession is None) or (session is not self.warmSession[0]):
+            session.close()
+        return
+
+    @tracer.traced()
+    def getApnaComplexSession(self) -> Tuple[requests.Session, str]:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_maxsize=self.config["httpPoolSize"]))
+        session.mount("http://", HTTPAdapter(pool_maxsize=self.config["httpPoolSize"]))
+
+        # Reuse the cached session cookies when there are any
+        accountKey = self.getAccountKey()
+        cachedCookies = self.sessionStore.load(accountKey)
+        for cookie in cachedCookies or list():
+            session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+            )
+
+        # Navigate to facilities page url, which redirects to the login form when logged out
+        response = session.get(
+            self.config["apnaComplexURL"], timeout=self.config["webDriverDelay"]
+        )
+        response.raise_for_status()
+        isValidSession = parseFacilityRows(response.text) is not None
+        self.sessionStore.recordResult(isHit=isValidSession)
+        if isValidSession:
+            return session, response.text
+
+        loginForm = parseLoginForm(response.text)
+        if loginForm is None:
+            raise RuntimeError("Login form not found on the ApnaComplex page.")
+        formData = {
+            formInput["name"]: formInput["value"]
+            for formInput in loginForm["inputs"]
+            if formInput["name"]
+        }
+        for formInput in loginForm["inputs"]:
+            if formInput["id"] in ("email", "password") and formInput["name"]:
+                formData[formInput["name"]] = self.config["apnaComplexCreds"][formInput["id"]]
+
+        # Submit login form
+        response = session.request(
+            loginForm["method"],
+            urljoin(response.url, loginForm["action"]),
+            data=formData,
+            timeout=self.config["webDriverDelay"],
+        )
+        response.raise_for_status()
+        if parseFacilityRows(response.text) is None:
+            response = session.get(
+                self.config["apnaComplexURL"], timeout=self.config["webDriverDelay"]
+            )
+            response.raise_for_status()
+        if parseFacilityRows(response.text) is None:
+            raise RuntimeError("Facilities table not found after logging in.")
+        self.sessionStore.save(
+            accountKey,
+            [
+                dict(name=cookie.name, value=cookie.value, domain=cookie.domain, path=cookie.path)
+                for cookie in session.cookies
+            ],
+        )
+        return session, response.text
+
+    def getCourtLinks(
+        self, facilitiesHtml: str, facilitiesURL: str, courtNum: Optional[int]
+    ) -> dict:
+        allRows = parseFacilityRows(facilitiesHtml) or list()
+        courtLinks = self.parseCourtLinks(allRows=allRows, courtNum=courtNum)
+        for linkType in courtLinks:
+            for court, linkURL in courtLinks[linkType].items():
+                if linkURL is not None:
+                    courtLinks[linkType][court] = urljoin(facilitiesURL, linkURL)
+        return courtLinks
+
+    def getCalendarEvents(self, session: requests.Session, viewingURL: str) -> list:
+        response = session.get(viewingURL, timeout=self.config["webDriverDelay"])
+        response.raise_for_status()
+        calendarData = parseCalendarEvents(response.text)
+        if calendarData["feedURL"] is None:
+            return calendarData["allEvents"]
+        # FullCalendar fetches its events feed for the visible range in unix seconds
+        today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        rangeStart = int(time.mktime(today.timetuple()))
+        rangeEnd = int(time.mktime((today + datetime.timedelta(days=2)).timetuple()))
+        feedResponse = session.get(
+            urljoin(response.url, calendarData["feedURL"]),
+            params=dict(start=rangeStart, end=rangeEnd),
+            timeout=self.config["webDriverDelay"],
+        )
+        feedResponse.raise_for_status()
+        return feedResponse.json()
+
+    def getActiveBookings(
+        self, session: requests.Session, viewingURL: str, apartmentName: str
+    ) -> int:
+        bookingCount = 0
+        try:
+            allEvents = self.getCalendarEvents(session=session, viewingURL=viewingURL)
+            bookingCount = self.countEventBookings(
+                allEvents=allEvents, apartmentName=apartmentName
+            )
+        except Exception as ex:
+            self.logger.error("Unknown error occured during active booking checks.")
+            self.logger.error(ex)
+            self.onLinkError(linkURL=viewingURL)
+
+        return bookingCount
+
+    def getExistingBookings(self, apartmentName: str) -> tuple:
+        # Log in and fetch the facilities page over a pooled HTTP session
+        session, facilitiesHtml = self.openSession()
+        # Get the court booking and viewing links from the facilities table
+        courtLinks = self.getCachedCourtLinks(
+            loadFunc=lambda: self.getCourtLinks(
+                facilitiesHtml=facilitiesHtml,
+                facilitiesURL=self.config["apnaComplexURL"],
+                courtNum=None,
+            )
+        )
+        existingBookings = self.getAllActiveBookings(
+            viewingLinks=courtLinks["viewing"],
+            checkFunc=lambda court, viewingURL: self.getActiveBookings(
+                session=session, viewingURL=viewingURL, apartmentName=apartmentName
+            ),
+        )
+
+        self.closeSession(session)
+        return existingBookings, courtLinks
+
+    def getSlotBookings(self, apartmentName: str, bookingDate: datetime.date) -> tuple:
+        # Existing booking counts and hour owners per court from one read of each calendar
+        session, facilitiesHtml = self.openSession()
+        courtLinks = self.getCachedCourtLinks(
+            loadFunc=lambda: self.getCourtLinks(
+                facilitiesHtml=facilitiesHtml,
+                facilitiesURL=self.config["apnaComplexURL"],
+                courtNum=None,
+            )
+        )
+
+        def checkCourt(court: str, viewingURL: str) -> tuple:
+            allEvents = self.getCalendarEvents(session=session, viewingURL=viewingURL)
+            return (
+                self.countEventBookings(allEvents=allEvents, apartmentName=apartmentName),
+                self.getHourOwners(
+                    allEvents=allEvents, apartmentName=apartmentName, bookingDate=bookingDate
+                ),
+            )
+
+        courtSlots = self.getAllActiveBookings(
+            viewingLinks=courtLinks["viewing"], checkFunc=checkCourt
+        )
+        self.closeSession(session)
+        return self.splitSlotBookings(courtSlots)
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import socket
+import logging
+import pathlib
+import threading
+import socketserver
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+REPO_DIR = pathlib.Path(__file__).parent.parent
+
+
+class LatencyProfile:
+    def __init__(self, config: dict) -> None:
+        self.config = config["latencyCalibration"]
+        self.logger = logging.getLogger("default")
+        self.allSamples = self.loadSamples()
+
+    def getPath(self, filePath: str) -> str:
+        # Relative to the repo, not to wherever the assistant was started from
+        return os.path.join(REPO_DIR, filePath)
+
+    def loadSamples(self) -> Dict[str, List[float]]:
+        if not os.path.exists(self.getPath(self.config["file"])):
+            return dict()
+        try:
+            with open(self.getPath(self.config["file"])) as profileJson:
+                return json.load(profileJson)
+        except (OSError, ValueError):
+            self.logger.error("Couldn't read the latency profile, measuring afresh.")
+            return dict()
+
+    def saveSamples(self) -> None:
+        with open(self.getPath(self.config["file"]), "w") as profileJson:
+            json.dump(self.allSamples, profileJson, indent=4)
+        return
+
+    def addSample(self, appTitle: str, latency: float) -> None:
+        # Rolling window, so a changed emulator or network setup ages out
+        appSamples = self.allSamples.setdefault(appTitle, list())
+        appSamples.append(round(latency, 4))
+        del appSamples[: -self.config["sampleLength"]]
+        return
+
+    def getLead(self, appTitle: str) -> Optional[float]:
+        # A low percentile less a margin, so even a quick request doesn't reach the site
+        # before the opening; clamping is left to the caller, which knows the fire time
+        appSamples = sorted(self.allSamples.get(appTitle, list()))
+        if len(appSamples) < self.config["minSamples"]:
+            return None
+        sampleIdx = int(self.config["leadPercentile"] * (len(appSamples) - 1))
+        return appSamples[sampleIdx] - self.config["safetyMargin"]
+
+
+class ProbeServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LatencyProbe:
+    # HTTP proxy each instance is pointed at, one port per instance: it relays the app's
+    # traffic and times the first request to the site after a confirm click
+    def __init__(self, config: dict) -> None:
+        self.config = config["latencyCalibration"]
+        self.logger = logging.getLogger("default")
+        # Rehearsals swallow everything sent to the site after the click, so nothing is booked
+        self.dropRequests = False
+        self.allServers: Dict[str, ProbeServer] = dict()
+        self.allStates: Dict[str, dict] = dict()
+        self.lock = threading.Lock()
+        self.clock = time.perf_counter
+
+    def start(self) -> None:
+        if self.allServers:
+            return
+        for appTitle, port in self.config["probePorts"].items():
+            self.allStates[appTitle] = dict(
+                isRouted=False,
+                isBlocked=False,
+                clickClock=None,
+                latency=None,
+                isArrived=threading.Event(),
+            )
+            try:
+                server = ProbeServer((self.config["host"], port), self.getHandlerClass(appTitle))
+            except OSError as ex:
+                self.logger.error(f"Couldn't start the latency probe for {appTitle} on {port}.")
+                self.logger.error(ex)
+                continue
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.allServers[appTitle] = server
+        return
+
+    def stop(self) -> None:
+        for server in self.allServers.values():
+            server.shutdown()
+            server.server_close()
+        self.allServers = dict()
+        return
+
+    def isRouted(self, appTitle: str) -> bool:
+        # The app's earlier page loads came through the probe, so its requests will too
+        state = self.allStates.get(appTitle)
+        return (state is not None) and state["isRouted"]
+
+    def markClick(self, appTitle: str) -> None:
+        state = self.allStates.get(appTitle)
+        if state is None:
+            return
+        with self.lock:
+            # Hedged repeat clicks don't restart the measurement
+            if state["clickClock"] is None:
+                state["clickClock"] = self.clock()
+                state["latency"] = None
+                state["isArrived"].clear()
+            state["isBlocked"] = state["isBlocked"] or self.dropRequests
+        return
+
+    def unblock(self, appTitle: str) -> None:
+        # Only once the app has left the confirm page, so a retried request can't get through
+        state = self.allStates.get(appTitle)
+        if state is not None:
+            state["isBlocked"] = False
+        return
+
+    def onUpstreamData(self, appTitle: str, host: str) -> bool:
+        # Returns whether the data may go on to the site
+        if host not in self.config["bookingHosts"]:
+            return True
+        state = self.allStates[appTitle]
+        with self.lock:
+            state["isRouted"] = True
+            if (state["clickClock"] is not None) and (state["latency"] is None):
+                state["latency"] = self.clock() - state["clickClock"]
+                state["isArrived"].set()
+            return not state["isBlocked"]
+
+    def waitForLatency(self, appTitle: str, deadline: float) -> Optional[float]:
+        state = self.allStates.get(appTitle)
+        if (state is None) or (state["clickClock"] is None):
+            return None
+        state["isArrived"].wait(timeout=max(0.0, deadline - self.clock()))
+        with self.lock:
+            latency = state["latency"]
+            state["clickClock"] = None
+            state["latency"] = None
+        return latency
+
+    def getHandlerClass(self, appTitle: str) -> type:
+        latencyProbe = self
+
+        class ProbeHandler(socketserver.BaseRequestHandler):
+            def readHead(self) -> Optional[bytes]:
+                head = b""
+                while b"\r\n\r\n" not in head:
+                    chunk = self.request.recv(4096)
+                    if (not chunk) or (len(head) > 65536):
+                        return None
+                    head += chunk
+                return head
+
+            def relay(self, source: socket.socket, target: socket.socket) -> None:
+                try:
+                    while True:
+                        chunk = source.recv(65536)
+                        if not chunk:
+                            break
+                        target.sendall(chunk)
+                except OSError:
+                    pass
+                try:
+                    target.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+                return
+
+            def handle(self) -> None:
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                head = self.readHead()
+                if head is None:
+                    return
+                requestLine = head.split(b"\r\n", 1)[0].decode(errors="replace").split()
+                if len(requestLine) < 2:
+                    return
+                method, target = requestLine[0], requestLine[1]
+                if method == "CONNECT":
+                    # HTTPS goes through as an opaque tunnel, only its timing is visible
+                    host, _, port = target.rpartition(":")
+                    port = int(port or 443)
+                    pending = head.split(b"\r\n\r\n", 1)[1]
+                else:
+                    # Plain HTTP goes on as it came, the site takes the absolute URI
+                    targetParts = urlsplit(target)
+                    host, port = targetParts.hostname or "", targetParts.port or 80
+                    pending = head
+                if pending and (not latencyProbe.onUpstreamData(appTitle, host)):
+                    return
+                try:
+                    upstream = socket.create_connection(
+                        (host, port), timeout=latencyProbe.config["timeout"]
+                    )
+                except OSError:
+                    self.request.sendall(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+                    return
+                with upstream:
+                    upstream.settimeout(None)
+                    upstream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    if method == "CONNECT":
+                        self.request.sendall(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+                    if pending:
+                        upstream.sendall(pending)
+                    downstreamThread = threading.Thread(
+                        target=self.relay, args=(upstream, self.request), daemon=True
+                    )
+                    downstreamThread.start()
+                    # Checked chunk by chunk, a kept-alive connection can carry the confirm too
+                    try:
+                        while True:
+                            chunk = self.request.recv(65536)
+                            if (not chunk) or (not latencyProbe.onUpstreamData(appTitle, host)):
+                                break
+                            upstream.sendall(chunk)
+                    except OSError:
+                        pass
+                    try:
+                        upstream.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                    downstreamThread.join(timeout=latencyProbe.config["timeout"])
+                return
+
+        return ProbeHandler
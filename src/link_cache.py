@@ -0,0 +1,60 @@
+import os
+import json
+import time
+import logging
+import pathlib
+from typing import Optional
+
+REPO_DIR = pathlib.Path(__file__).parent.parent
+
+
+class CourtLinkCache:
+    def __init__(self, config: dict) -> None:
+        self.config = config["linkCache"]
+        self.logger = logging.getLogger("default")
+
+    def getPath(self, filePath: str) -> str:
+        # Relative to the repo, not to wherever the assistant was started from
+        return os.path.join(REPO_DIR, filePath)
+
+    def loadAll(self) -> dict:
+        if not os.path.exists(self.getPath(self.config["file"])):
+            return dict()
+        try:
+            with open(self.getPath(self.config["file"])) as cacheJson:
+                return json.load(cacheJson)
+        except (OSError, ValueError):
+            self.logger.error("Couldn't read the court link cache, discarding it.")
+            return dict()
+
+    def saveAll(self, allLinks: dict) -> None:
+        with open(self.getPath(self.config["file"]), "w") as cacheJson:
+            json.dump(allLinks, cacheJson, indent=4)
+        return
+
+    def load(self, accountKey: str) -> Optional[dict]:
+        if not self.config["enabled"]:
+            return None
+        cachedLinks = self.loadAll().get(accountKey)
+        if cachedLinks is None:
+            return None
+        if time.time() - cachedLinks["savedAt"] > self.config["ttl"]:
+            self.logger.info("Cached court links have expired.")
+            return None
+        return cachedLinks["courtLinks"]
+
+    def save(self, accountKey: str, courtLinks: dict) -> None:
+        if not self.config["enabled"]:
+            return
+        allLinks = self.loadAll()
+        allLinks[accountKey] = dict(savedAt=time.time(), courtLinks=courtLinks)
+        self.saveAll(allLinks)
+        return
+
+    def invalidate(self, accountKey: str) -> None:
+        if not self.config["enabled"]:
+            return
+        allLinks = self.loadAll()
+        if allLinks.pop(accountKey, None) is not None:
+            self.saveAll(allLinks)
+        return
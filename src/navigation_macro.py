@@ -0,0 +1,90 @@
+import os
+import json
+import logging
+import pathlib
+from typing import List, Optional
+
+REPO_DIR = pathlib.Path(__file__).parent.parent
+
+
+class NavigationMacro:
+    def __init__(self, config: dict) -> None:
+        self.config = config["navigationMacro"]
+        self.logger = logging.getLogger("default")
+        self.macro = self.loadMacro()
+
+    def getPath(self, filePath: str) -> str:
+        # Relative to the repo, not to wherever the assistant was started from
+        return os.path.join(REPO_DIR, filePath)
+
+    def loadMacro(self) -> dict:
+        macro: dict = dict(sequence=None, samples=dict())
+        if not os.path.exists(self.getPath(self.config["file"])):
+            return macro
+        try:
+            with open(self.getPath(self.config["file"])) as macroJson:
+                macro.update(json.load(macroJson))
+        except (OSError, ValueError):
+            self.logger.error("Couldn't read the navigation macro, recording afresh.")
+        return macro
+
+    def saveMacro(self) -> None:
+        with open(self.getPath(self.config["file"]), "w") as macroJson:
+            json.dump(self.macro, macroJson, indent=4)
+        return
+
+    def recordSequence(self, allSteps: list) -> None:
+        # Condense a known-good hand-coded run into replayable macro steps
+        sequence: List[dict] = list()
+        for step in allSteps:
+            kind = step.get("kind")
+            if kind == "scroll" and sequence and sequence[-1]["kind"] == "scroll":
+                # Consecutive wheel ticks replay as one batched scroll
+                sequence[-1]["wheelDist"] += step["wheelDist"]
+                sequence[-1]["slowSettle"] += step["settle"]
+            elif kind == "scroll":
+                sequence.append(
+                    dict(
+                        name="facilitiesScroll",
+                        kind=kind,
+                        element=step["element"],
+                        wheelDist=step["wheelDist"],
+                        slowSettle=step["settle"],
+                        reference="facilitiesScrolled",
+                    )
+                )
+            elif kind == "timeSlot":
+                if not (sequence and sequence[-1]["kind"] == "timeSlot"):
+                    sequence.append(dict(name="timeSlot", kind=kind, slowSettle=0, reference=None))
+            elif kind == "click":
+                sequence.append(
+                    dict(
+                        name=step["name"],
+                        kind=kind,
+                        element=step["elementTemplate"],
+                        slowSettle=step["settle"],
+                        reference=step.get("reference"),
+                    )
+                )
+        self.macro["sequence"] = sequence
+        self.saveMacro()
+        return
+
+    def recordWait(self, stepName: str, elapsed: float, isReady: bool) -> None:
+        # Only waits that ended on a verified page measure the real settle time
+        if not isReady:
+            return
+        stepSamples = self.macro["samples"].setdefault(stepName, list())
+        stepSamples.append(round(elapsed, 3))
+        del stepSamples[: -self.config["sampleLength"]]
+        return
+
+    def getSequence(self) -> Optional[list]:
+        return self.macro["sequence"]
+
+    def getTunedSettle(self, macroStep: dict) -> float:
+        stepSamples = self.macro["samples"].get(macroStep["name"], list())
+        if len(stepSamples) < self.config["minSamples"]:
+            return macroStep["slowSettle"]
+        tunedSettle = max(stepSamples) * self.config["safetyFactor"]
+        return min(macroStep["slowSettle"], max(tunedSettle, self.config["minSettle"]))
@@ -0,0 +1,146 @@
+import time
+import logging
+from typing import Callable, Dict, Optional
+
+from tracing import tracer
+
+
+class NavigationPipeline:
+    def __init__(
+        self,
+        focusFunc: Callable,
+        pollInterval: float = 0.25,
+        recordFunc: Optional[Callable] = None,
+    ) -> None:
+        self.focusFunc = focusFunc
+        self.pollInterval = pollInterval
+        self.recordFunc = recordFunc
+        self.logger = logging.getLogger("default")
+        self.clock = time.perf_counter
+        self.allSteps: Dict[int, list] = dict()
+        self.stepIdx: Dict[int, int] = dict()
+        self.readyAt: Dict[int, float] = dict()
+        self.actionStart: Dict[int, float] = dict()
+        self.waitStart: Dict[int, float] = dict()
+        self.nextPollAt: Dict[int, float] = dict()
+        self.isCheckPassed: Dict[int, bool] = dict()
+        self.results: Dict[int, bool] = dict()
+
+    def addInstance(self, instanceIdx: int, allSteps: list) -> None:
+        # Each step is a dict with name, action, settle time and an optional readyCheck
+        self.allSteps[instanceIdx] = allSteps
+        self.stepIdx[instanceIdx] = 0
+        self.readyAt[instanceIdx] = self.clock()
+        return
+
+    def getPreviousStep(self, instanceIdx: int) -> Optional[dict]:
+        if self.stepIdx[instanceIdx] == 0:
+            return None
+        return self.allSteps[instanceIdx][self.stepIdx[instanceIdx] - 1]
+
+    def isReady(self, instanceIdx: int) -> bool:
+        currentTime = self.clock()
+        if currentTime >= self.readyAt[instanceIdx]:
+            return True
+        previousStep = self.getPreviousStep(instanceIdx)
+        readyCheck = previousStep.get("readyCheck") if previousStep else None
+        if (readyCheck is None) or (currentTime < self.nextPollAt[instanceIdx]):
+            return False
+        try:
+            isReady = readyCheck()
+        except Exception:
+            isReady = False
+        if isReady:
+            # Page is ready early, pull the deadline in
+            self.readyAt[instanceIdx] = currentTime
+            self.isCheckPassed[instanceIdx] = True
+        else:
+            self.nextPollAt[instanceIdx] = self.clock() + self.pollInterval
+        return isReady
+
+    def getNextInstance(self, focusedIdx: Optional[int]) -> Optional[int]:
+        pendingIdx = [idx for idx in self.allSteps if idx not in self.results]
+        if not pendingIdx:
+            return None
+        while True:
+            # Keep driving the focused instance while it is ready to avoid extra focus switches
+            if (focusedIdx in pendingIdx) and self.isReady(focusedIdx):  # type: ignore
+                return focusedIdx
+            readyIdx = [idx for idx in pendingIdx if self.isReady(idx)]
+            if readyIdx:
+                return min(readyIdx, key=lambda idx: self.readyAt[idx])
+            nextWakeUp = min(
+                min(self.readyAt[idx], self.nextPollAt.get(idx, self.readyAt[idx]))
+                for idx in pendingIdx
+            )
+            time.sleep(max(0.0, nextWakeUp - self.clock()))
+
+    def settleStep(self, instanceIdx: int) -> bool:
+        # Returns False when the step's timeout handler asked for a longer wait
+        previousStep = self.getPreviousStep(instanceIdx)
+        if previousStep is None:
+            return True
+        if previousStep["settle"] <= 0:
+            self.traceStep(instanceIdx, previousStep)
+            return True
+        isReady = self.isCheckPassed.get(instanceIdx, False)
+        if (not isReady) and (previousStep.get("onTimeout") is not None):
+            extraWait = previousStep["onTimeout"]()
+            if extraWait:
+                self.readyAt[instanceIdx] = self.clock() + extraWait
+                self.nextPollAt[instanceIdx] = self.clock() + self.pollInterval
+                return False
+        elapsed = self.readyAt[instanceIdx] - self.waitStart[instanceIdx]
+        if self.recordFunc is not None:
+            self.recordFunc(previousStep["name"], elapsed, previousStep["settle"], isReady)
+        self.traceStep(instanceIdx, previousStep)
+        return True
+
+    def traceStep(self, instanceIdx: int, step: dict) -> None:
+        # Span covers the action and its settle, not the time spent driving other instances
+        tracer.addSpan(
+            f"navigate.{step['name']}",
+            self.actionStart[instanceIdx],
+            self.readyAt[instanceIdx],
+            instance=instanceIdx + 1,
+        )
+        return
+
+    def run(self) -> Dict[int, bool]:
+        startTime = self.clock()
+        focusedIdx = None
+        while True:
+            instanceIdx = self.getNextInstance(focusedIdx=focusedIdx)
+            if instanceIdx is None:
+                break
+            step = self.allSteps[instanceIdx][self.stepIdx[instanceIdx]]
+            try:
+                if instanceIdx != focusedIdx:
+                    self.focusFunc(instanceIdx)
+                    focusedIdx = instanceIdx
+                if not self.settleStep(instanceIdx):
+                    continue
+                self.actionStart[instanceIdx] = self.clock()
+                step["action"]()
+            except Exception as ex:
+                self.logger.error(
+                    f"Navigation step {step['name']} failed for instance {instanceIdx + 1}."
+                )
+                self.logger.error(ex)
+                self.results[instanceIdx] = False
+                continue
+
+            self.stepIdx[instanceIdx] += 1
+            self.waitStart[instanceIdx] = self.clock()
+            self.readyAt[instanceIdx] = self.waitStart[instanceIdx] + step["settle"]
+            self.nextPollAt[instanceIdx] = self.waitStart[instanceIdx] + self.pollInterval
+            self.isCheckPassed[instanceIdx] = False
+            if self.stepIdx[instanceIdx] >= len(self.allSteps[instanceIdx]):
+                self.readyAt[instanceIdx] = self.waitStart[instanceIdx]
+                self.traceStep(instanceIdx, step)
+                self.results[instanceIdx] = True
+
+        self.logger.info(
+            f"Navigated {len(self.results)} instances in {self.clock() - startTime:.1f} s."
+        )
+        return self.results
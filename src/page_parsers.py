@@ -0,0 +1,159 @@
+import re
+import json
+from html.parser import HTMLParser
+from typing import List, Optional
+
+
+class LoginFormParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.allForms: List[dict] = list()
+        self.currentForm: Optional[dict] = None
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attrs = dict(attrs)
+        if tag == "form":
+            self.currentForm = dict(
+                action=attrs.get("action") or "",
+                method=(attrs.get("method") or "get").lower(),
+                inputs=list(),
+            )
+            self.allForms.append(self.currentForm)
+        elif (tag == "input") and (self.currentForm is not None):
+            self.currentForm["inputs"].append(
+                dict(
+                    id=attrs.get("id"),
+                    name=attrs.get("name"),
+                    value=attrs.get("value") or "",
+                )
+            )
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "form":
+            self.currentForm = None
+
+
+class FacilitiesTableParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.allRows: List[dict] = list()
+        self.tableDepth = 0
+        self.inBody = False
+        self.currentRow: Optional[dict] = None
+        self.currentCell: Optional[list] = None
+        self.currentLink: Optional[dict] = None
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attrs = dict(attrs)
+        if tag == "table":
+            if self.tableDepth or attrs.get("id") == "facilities":
+                self.tableDepth += 1
+            return
+        if not self.tableDepth:
+            return
+        if tag == "tbody":
+            self.inBody = True
+        elif (tag == "tr") and self.inBody:
+            self.currentRow = dict(cells=list(), links=list())
+        elif (tag == "td") and (self.currentRow is not None):
+            self.currentCell = list()
+            # Only the links in the last cell are kept, matching the Selenium backend
+            self.currentRow["links"] = list()
+        elif (tag == "a") and (self.currentCell is not None):
+            self.currentLink = dict(href=attrs.get("href"), title=None)
+            self.currentRow["links"].append(self.currentLink)  # type: ignore
+        elif (tag == "img") and (self.currentLink is not None):
+            if self.currentLink["title"] is None:
+                self.currentLink["title"] = attrs.get("title")
+
+    def handle_endtag(self, tag: str) -> None:
+        if not self.tableDepth:
+            return
+        if tag == "table":
+            self.tableDepth -= 1
+        elif tag == "tbody":
+            self.inBody = False
+        elif tag == "a":
+            self.currentLink = None
+        elif (tag == "td") and (self.currentCell is not None):
+            self.currentRow["cells"].append(" ".join("".join(self.currentCell).split()))  # type: ignore
+            self.currentCell = None
+        elif (tag == "tr") and (self.currentRow is not None):
+            self.allRows.append(self.currentRow)
+            self.currentRow = None
+
+    def handle_data(self, data: str) -> None:
+        if self.currentCell is not None:
+            self.currentCell.append(data)
+
+
+def parseLoginForm(html: str) -> Optional[dict]:
+    formParser = LoginFormParser()
+    formParser.feed(html)
+    for form in formParser.allForms:
+        if any(formInput["id"] == "password" for formInput in form["inputs"]):
+            return form
+    return None
+
+
+def parseFacilityRows(html: str) -> Optional[List[dict]]:
+    if 'id="facilities"' not in html and "id='facilities'" not in html:
+        return None
+    tableParser = FacilitiesTableParser()
+    tableParser.feed(html)
+    return tableParser.allRows
+
+
+def extractBracketed(text: str, startIdx: int) -> str:
+    # Balanced [...] slice starting at startIdx, skipping brackets inside strings
+    depth, quoteChar, isEscaped = 0, None, False
+    for idx in range(startIdx, len(text)):
+        char = text[idx]
+        if quoteChar is not None:
+            if isEscaped:
+                isEscaped = False
+            elif char == "\\":
+                isEscaped = True
+            elif char == quoteChar:
+                quoteChar = None
+        elif char in "'\"":
+            quoteChar = char
+        elif char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+            if depth == 0:
+                return text[startIdx : idx + 1]
+    raise ValueError("Unterminated events array in calendar page.")
+
+
+def parseJsEventArray(jsArray: str) -> List[dict]:
+    # FullCalendar pages inline a JS object literal; normalise it to JSON outside of strings
+    allTokens = re.split(r"(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')", jsArray)
+    jsonTokens = list()
+    for idx, token in enumerate(allTokens):
+        if idx % 2 == 1:
+            jsonTokens.append(json.dumps(token[1:-1]) if token[0] == "'" else token)
+            continue
+        token = re.sub(r"([{,]\s*)([A-Za-z_]\w*)\s*:", r'\1"\2":', token)
+        token = re.sub(r",\s*([}\]])", r"\1", token)
+        token = re.sub(r"\bnew Date\(([^)]*)\)", r"[\1]", token)
+        jsonTokens.append(token)
+    return json.loads("".join(jsonTokens))
+
+
+def parseCalendarEvents(html: str) -> dict:
+    # Returns either an events feed URL or the inline events of the calendar page
+    eventsMatch = re.search(r"\bevents\s*:\s*", html)
+    if eventsMatch is None:
+        return dict(feedURL=None, allEvents=list())
+    valueIdx = eventsMatch.end()
+    if html[valueIdx] in "'\"":
+        quoteChar = html[valueIdx]
+        feedURL = html[valueIdx + 1 : html.index(quoteChar, valueIdx + 1)]
+        return dict(feedURL=feedURL, allEvents=list())
+    if html[valueIdx] == "[":
+        return dict(
+            feedURL=None, allEvents=parseJsEventArray(extractBracketed(html, valueIdx))
+        )
+    return dict(feedURL=None, allEvents=list())
@@ -0,0 +1,42 @@
+import time
+import logging
+from datetime import datetime
+
+
+class PreciseScheduler:
+    def __init__(self, config: dict) -> None:
+        self.config = config["scheduler"]
+        self.logger = logging.getLogger("default")
+        # perf_counter is monotonic and, unlike time.monotonic on Windows, not tied to the 15.6ms tick
+        self.clock = time.perf_counter
+
+    def getDeadline(self, targetDatetime: datetime) -> float:
+        # Anchor the wall-clock target to the monotonic clock once, so later clock jumps don't move it
+        timeRemaining = targetDatetime.timestamp() - time.time()
+        return self.clock() + timeRemaining
+
+    def sleepUntil(self, deadline: float) -> float:
+        # Coarse sleep until shortly before the deadline
+        timeRemaining = deadline - self.clock()
+        while timeRemaining > self.config["coarseMargin"]:
+            time.sleep(
+                min(
+                    self.config["coarseSleep"],
+                    timeRemaining - self.config["coarseMargin"],
+                )
+            )
+            timeRemaining = deadline - self.clock()
+
+        # Fine-grained sleeps until the spin margin
+        while timeRemaining > self.config["spinMargin"]:
+            time.sleep(self.config["fineSleep"])
+            timeRemaining = deadline - self.clock()
+
+        # Busy-wait the final stretch
+        while self.clock() < deadline:
+            pass
+
+        return self.clock() - deadline
+
+    def sleepUntilDatetime(self, targetDatetime: datetime) -> float:
+        return self.sleepUntil(deadline=self.getDeadline(targetDatetime))
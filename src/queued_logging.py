@@ -0,0 +1,97 @@
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Optional
+
+
+class RawQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Queue the record as logged; the stock prepare() formats it on the caller's thread
+        # Messages here are already f-strings, so nothing left in record.args can change
+        return record
+
+
+class QuietQueueListener(logging.handlers.QueueListener):
+    def __init__(self, logQueue: queue.Queue, *handlers: logging.Handler) -> None:
+        super().__init__(logQueue, *handlers, respect_handler_level=True)
+        self.isOpen = threading.Event()
+        self.isOpen.set()
+        self.quietFrom: Optional[float] = None
+        self.maxQuiet = 0.0
+
+    def startQuiet(self, quietFrom: float, maxQuiet: float) -> None:
+        self.maxQuiet = maxQuiet
+        self.quietFrom = quietFrom
+        self.isOpen.clear()
+        return
+
+    def endQuiet(self) -> None:
+        self.quietFrom = None
+        self.isOpen.set()
+        return
+
+    def handle(self, record: logging.LogRecord) -> None:
+        # Inside the quiet window records stay queued, and go out in order once it closes
+        # A window that's never closed only holds output back for maxQuiet seconds
+        quietFrom = self.quietFrom
+        if (quietFrom is not None) and (time.time() >= quietFrom):
+            self.isOpen.wait(timeout=max(0.0, quietFrom + self.maxQuiet - time.time()))
+        super().handle(record)
+        return
+
+    def stop(self) -> None:
+        self.endQuiet()
+        super().stop()
+        return
+
+
+class QueuedLogging:
+    def __init__(self) -> None:
+        self.config: Optional[dict] = None
+        self.listener: Optional[QuietQueueListener] = None
+
+    def install(self, config: dict, loggerName: str = "default") -> None:
+        # Log calls only enqueue the raw record; the listener thread formats and writes it
+        self.config = config["queuedLogging"]
+        if (not self.config["enabled"]) or (self.listener is not None):
+            return
+        logger = logging.getLogger(loggerName)
+        allHandlers = list(logger.handlers)
+        for handler in allHandlers:
+            logger.removeHandler(handler)
+        logQueue: queue.Queue = queue.Queue()
+        logger.addHandler(RawQueueHandler(logQueue))
+        self.listener = QuietQueueListener(logQueue, *allHandlers)
+        self.listener.start()
+        atexit.register(self.stop)
+        return
+
+    def stop(self) -> None:
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
+        return
+
+    @contextmanager
+    def quietWindow(self, fireDatetime: datetime):
+        # Hold back all output from shortly before the fire time until the block is done
+        if (self.listener is None) or (not self.config["quietWindow"]):  # type: ignore
+            yield
+            return
+        self.listener.startQuiet(
+            quietFrom=fireDatetime.timestamp() - self.config["quietLead"],  # type: ignore
+            maxQuiet=self.config["maxQuiet"],  # type: ignore
+        )
+        try:
+            yield
+        finally:
+            self.listener.endQuiet()
+
+
+queuedLogging = QueuedLogging()
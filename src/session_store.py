@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import logging
+import pathlib
+from typing import Optional
+
+REPO_DIR = pathlib.Path(__file__).parent.parent
+
+
+class SessionStore:
+    def __init__(self, config: dict) -> None:
+        self.config = config["sessionCache"]
+        self.logger = logging.getLogger("default")
+        self.stats = self.loadStats()
+
+    def getPath(self, filePath: str) -> str:
+        # Relative to the repo, not to wherever the assistant was started from
+        return os.path.join(REPO_DIR, filePath)
+
+    def encrypt(self, data: bytes) -> bytes:
+        # DPAPI ties the ciphertext to the current Windows user account
+        import win32crypt
+
+        return win32crypt.CryptProtectData(data, "TennisBookingAssistant", None, None, None, 0)
+
+    def decrypt(self, data: bytes) -> bytes:
+        import win32crypt
+
+        return win32crypt.CryptUnprotectData(data, None, None, None, 0)[1]
+
+    def loadStats(self) -> dict:
+        stats = dict(hits=0, misses=0)
+        if os.path.exists(self.getPath(self.config["statsFile"])):
+            try:
+                with open(self.getPath(self.config["statsFile"])) as statsJson:
+                    stats.update(json.load(statsJson))
+            except (OSError, ValueError):
+                self.logger.error("Couldn't read session cache stats, starting afresh.")
+        return stats
+
+    def recordResult(self, isHit: bool) -> None:
+        if not self.config["enabled"]:
+            return
+        self.stats["hits" if isHit else "misses"] += 1
+        with open(self.getPath(self.config["statsFile"]), "w") as statsJson:
+            json.dump(self.stats, statsJson, indent=4)
+        self.logger.info(
+            f"Session cache {'hit' if isHit else 'miss'} "
+            f"({self.stats['hits']} hits / {self.stats['misses']} misses)."
+        )
+        return
+
+    def loadAll(self) -> dict:
+        if not os.path.exists(self.getPath(self.config["file"])):
+            return dict()
+        try:
+            with open(self.getPath(self.config["file"]), "rb") as cacheFile:
+                return json.loads(self.decrypt(cacheFile.read()))
+        except ImportError:
+            self.logger.error("DPAPI isn't available, session cache is disabled.")
+        except Exception as ex:
+            self.logger.error("Couldn't read the session cache, discarding it.")
+            self.logger.error(ex)
+        return dict()
+
+    def saveAll(self, allSessions: dict) -> None:
+        try:
+            encryptedData = self.encrypt(json.dumps(allSessions).encode())
+        except ImportError:
+            # Never fall back to writing credentials in plain text
+            self.logger.error("DPAPI isn't available, session cache is disabled.")
+            return
+        with open(self.getPath(self.config["file"]), "wb") as cacheFile:
+            cacheFile.write(encryptedData)
+        return
+
+    def load(self, accountKey: str) -> Optional[list]:
+        if not self.config["enabled"]:
+            return None
+        session = self.loadAll().get(accountKey)
+        if session is None:
+            return None
+        if time.time() - session["savedAt"] > self.config["maxAge"]:
+            return None
+        return session["cookies"]
+
+    def save(self, accountKey: str, cookies: list) -> None:
+        if not self.config["enabled"]:
+            return
+        allSessions = self.loadAll()
+        allSessions[accountKey] = dict(savedAt=time.time(), cookies=cookies)
+        self.saveAll(allSessions)
+        return
+
+    def invalidate(self, accountKey: str) -> None:
+        if not self.config["enabled"]:
+            return
+        allSessions = self.loadAll()
+        if allSessions.pop(accountKey, None) is not None:
+            self.saveAll(allSessions)
+        return
@@ -0,0 +1,149 @@
+import os
+import json
+import math
+import time
+import logging
+import pathlib
+import threading
+from typing import Callable, List, Optional
+
+REPO_DIR = pathlib.Path(__file__).parent.parent
+
+
+class SlotSeeker:
+    def __init__(self, config: dict, getCoordinates: Callable, inputDevice) -> None:
+        self.config = config["slotSeek"]
+        self.appConfig = config
+        self.getCoordinates = getCoordinates
+        self.inputDevice = inputDevice
+        self.logger = logging.getLogger("default")
+        # Instances can seek on their own threads, and share the calibration file
+        self.lock = threading.Lock()
+
+    def getPath(self, filePath: str) -> str:
+        # Relative to the repo, not to wherever the assistant was started from
+        return os.path.join(REPO_DIR, filePath)
+
+    def getSizeKey(self, windowRect: tuple) -> str:
+        return f"{windowRect[2] - windowRect[0]}x{windowRect[3] - windowRect[1]}"
+
+    def loadProfiles(self) -> dict:
+        if not os.path.exists(self.getPath(self.config["calibrationFile"])):
+            return dict()
+        try:
+            with open(self.getPath(self.config["calibrationFile"])) as calibrationJson:
+                return json.load(calibrationJson)
+        except (OSError, ValueError):
+            self.logger.error("Couldn't read slot seek calibration, using defaults.")
+            return dict()
+
+    def saveProfile(self, windowRect: tuple, profile: dict) -> None:
+        with self.lock:
+            allProfiles = self.loadProfiles()
+            allProfiles[self.getSizeKey(windowRect)] = profile
+            with open(self.getPath(self.config["calibrationFile"]), "w") as calibrationJson:
+                json.dump(allProfiles, calibrationJson, indent=4)
+        return
+
+    def getDefaultProfile(self, windowRect: tuple) -> dict:
+        # One per-hour drag moves the strip by one slot, so its length is the slot width
+        dragStart = self.getCoordinates(element="timeSlotDragStart", windowRect=windowRect)
+        dragStop = self.getCoordinates(element="timeSlotDragStop", windowRect=windowRect)
+        seekStart = self.getCoordinates(element="timeSlotSeekStart", windowRect=windowRect)
+        seekStop = self.getCoordinates(element="timeSlotSeekStop", windowRect=windowRect)
+        return dict(
+            pixelsPerHour=dragStart[0] - dragStop[0],
+            maxDragPixels=seekStart[0] - seekStop[0],
+            verified=0,
+            mismatched=0,
+        )
+
+    def getProfile(self, windowRect: tuple) -> dict:
+        profile = self.getDefaultProfile(windowRect)
+        with self.lock:
+            profile.update(self.loadProfiles().get(self.getSizeKey(windowRect), dict()))
+        return profile
+
+    def isTrusted(self, windowRect: tuple) -> bool:
+        # A window size whose seeks keep missing goes back to per-hour drags
+        return self.getProfile(windowRect)["mismatched"] < self.config["maxMismatches"]
+
+    def planDrags(self, totalHours: int, profile: dict) -> List[int]:
+        # Fewest drags that fit the strip, each a whole number of hours since the strip
+        # snaps to a slot on every release
+        if totalHours <= 0:
+            return list()
+        hoursPerDrag = max(1, int(profile["maxDragPixels"] // profile["pixelsPerHour"]))
+        numDrags = math.ceil(totalHours / hoursPerDrag)
+        allHours = [totalHours // numDrags] * numDrags
+        for idx in range(totalHours % numDrags):
+            allHours[idx] += 1
+        return [round(dragHours * profile["pixelsPerHour"]) for dragHours in allHours]
+
+    def performDrag(self, appInfo: dict, startCoords: tuple, distance: int) -> None:
+        # Slow continuous move and a still hold before release, so the strip doesn't fling
+        self.inputDevice.drag(
+            appInfo=appInfo,
+            startCoords=startCoords,
+            stopCoords=(startCoords[0] - distance, startCoords[1]),
+            moveSteps=self.config["moveSteps"],
+            stepPause=self.config["stepPause"],
+            holdTime=self.config["holdTime"],
+        )
+        return
+
+    def seek(self, totalHours: int, appInfo: dict) -> None:
+        windowRect = appInfo["windowRect"]
+        profile = self.getProfile(windowRect)
+        startCoords = self.getCoordinates(
+            element="timeSlotSeekStart", windowRect=windowRect, isAbsolute=True
+        )
+        for distance in self.planDrags(totalHours=totalHours, profile=profile):
+            self.performDrag(appInfo=appInfo, startCoords=startCoords, distance=distance)
+        time.sleep(self.config["settleTime"])
+        return
+
+    def rewind(self, totalHours: int, appInfo: dict) -> None:
+        # Drag well past the first slot; the strip stops at its start
+        windowRect = appInfo["windowRect"]
+        profile = self.getProfile(windowRect)
+        stopCoords = self.getCoordinates(
+            element="timeSlotSeekStop", windowRect=windowRect, isAbsolute=True
+        )
+        for distance in self.planDrags(totalHours=totalHours + 2, profile=profile):
+            self.performDrag(appInfo=appInfo, startCoords=stopCoords, distance=-distance)
+        time.sleep(self.config["settleTime"])
+        return
+
+    def recordVerification(
+        self,
+        windowRect: tuple,
+        totalHours: int,
+        isMatch: Optional[bool],
+        landedHours: Optional[int] = None,
+    ) -> None:
+        # Misses in a row count against the window size; where the strip landed instead
+        # tells how far one hour really is at this size
+        if isMatch is None:
+            return
+        profile = self.getProfile(windowRect)
+        if isMatch:
+            profile["verified"] += 1
+            profile["mismatched"] = 0
+        else:
+            profile["mismatched"] += 1
+        if (not isMatch) and landedHours and (totalHours > 0):
+            pixelsPerHour = profile["pixelsPerHour"] * totalHours / landedHours
+            self.logger.info(
+                f"Seek landed {landedHours} hours out instead of {totalHours} at "
+                f"{self.getSizeKey(windowRect)}, {profile['pixelsPerHour']:.1f} -> "
+                f"{pixelsPerHour:.1f} pixels per hour."
+            )
+            profile["pixelsPerHour"] = pixelsPerHour
+        if profile["mismatched"] == self.config["maxMismatches"]:
+            self.logger.error(
+                f"Seeks at {self.getSizeKey(windowRect)} missed {profile['mismatched']} times "
+                f"in a row, using per-hour drags."
+            )
+        self.saveProfile(windowRect=windowRect, profile=profile)
+        return
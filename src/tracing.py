@@ -0,0 +1,179 @@
+import os
+import json
+import math
+import time
+import logging
+import pathlib
+import threading
+import functools
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+REPO_DIR = pathlib.Path(__file__).parent.parent
+
+
+def getTraceDir(config: dict) -> str:
+    # Relative to the repo, not to wherever the assistant was started from
+    return os.path.join(REPO_DIR, config["dir"])
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.logger = logging.getLogger("default")
+        # Monotonic clock, so spans stay comparable across wall clock adjustments
+        self.clock = time.perf_counter
+        self.lock = threading.Lock()
+        self.config: Optional[dict] = None
+        self.runStart: Optional[float] = None
+        self.allSpans: List[dict] = list()
+
+    def startRun(self, config: dict, runName: str) -> None:
+        self.config = config["tracing"]
+        if not self.config["enabled"]:
+            return
+        self.runStart = self.clock()
+        self.allSpans = [
+            dict(
+                type="run",
+                name=runName,
+                runId=datetime.now().strftime("%Y%m%d_%H%M%S"),
+                startEpoch=time.time(),
+            )
+        ]
+        return
+
+    def isActive(self) -> bool:
+        return self.runStart is not None
+
+    def addSpan(self, name: str, startTime: float, endTime: float, **attrs) -> None:
+        # Spans are buffered in memory, nothing touches the disk until the run ends
+        if not self.isActive():
+            return
+        span = dict(
+            type="span",
+            name=name,
+            thread=threading.current_thread().name,
+            start=round(startTime - self.runStart, 6),  # type: ignore
+            duration=round(endTime - startTime, 6),
+            **attrs,
+        )
+        with self.lock:
+            self.allSpans.append(span)
+        return
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        startTime = self.clock()
+        try:
+            yield attrs
+        except Exception as ex:
+            attrs["error"] = str(ex)
+            raise
+        finally:
+            self.addSpan(name, startTime, self.clock(), **attrs)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__name__):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def finishRun(self) -> None:
+        if not self.isActive():
+            return
+        with self.lock:
+            allSpans, self.allSpans = self.allSpans, list()
+            self.runStart = None
+        traceDir = getTraceDir(self.config)  # type: ignore
+        os.makedirs(traceDir, exist_ok=True)
+        traceFilePath = os.path.join(traceDir, f"trace_{allSpans[0]['runId']}.jsonl")
+        with open(traceFilePath, "w") as traceFile:
+            for span in allSpans:
+                traceFile.write(json.dumps(span) + "\n")
+        self.logger.info(f"Wrote {len(allSpans) - 1} trace spans to {traceFilePath}.")
+        return
+
+
+class TraceReport:
+    def __init__(self, config: dict) -> None:
+        self.config = config["tracing"]
+
+    def loadRuns(self) -> List[List[dict]]:
+        traceDir = getTraceDir(self.config)
+        if not os.path.isdir(traceDir):
+            return list()
+        allRuns = list()
+        for fileName in sorted(os.listdir(traceDir)):
+            if not (fileName.startswith("trace_") and fileName.endswith(".jsonl")):
+                continue
+            with open(os.path.join(traceDir, fileName)) as traceFile:
+                allSpans = [json.loads(line) for line in traceFile if line.strip()]
+            if allSpans and allSpans[0]["type"] == "run":
+                allRuns.append(allSpans)
+        return allRuns[-self.config["reportRuns"] :]
+
+    def getPercentile(self, allValues: List[float], percent: float) -> float:
+        # Nearest-rank percentile, fine for the handful of samples a run produces
+        sortedValues = sorted(allValues)
+        rank = max(1, math.ceil(percent * len(sortedValues) / 100))
+        return sortedValues[min(rank, len(sortedValues)) - 1]
+
+    def getRunMetrics(self, allSpans: List[dict]) -> Dict[str, List[float]]:
+        # Span durations in seconds, plus any millisecond attributes such as confirm skew
+        runMetrics: Dict[str, List[float]] = dict()
+        for span in allSpans[1:]:
+            runMetrics.setdefault(span["name"], list()).append(span["duration"])
+            for key, value in span.items():
+                if key.endswith("Ms") and isinstance(value, (int, float)):
+                    runMetrics.setdefault(f"{span['name']}.{key}", list()).append(value)
+        return runMetrics
+
+    def getReport(self) -> List[str]:
+        allRuns = self.loadRuns()
+        if not allRuns:
+            return ["No traces recorded yet."]
+        allRunMetrics = [(runSpans[0], self.getRunMetrics(runSpans)) for runSpans in allRuns]
+
+        # Keep phases in the order they happened in the latest run
+        allNames: List[str] = list()
+        for _, runMetrics in reversed(allRunMetrics):
+            allNames += [name for name in runMetrics if name not in allNames]
+
+        lines = [f"Trace report over the last {len(allRuns)} runs (p50 / p95):"]
+        for name in allNames:
+            unit = "ms" if name.endswith("Ms") else "s"
+            lines.append(name)
+            previousP50: List[float] = list()
+            for runInfo, runMetrics in allRunMetrics:
+                allValues = runMetrics.get(name)
+                if not allValues:
+                    continue
+                p50 = self.getPercentile(allValues, 50)
+                p95 = self.getPercentile(allValues, 95)
+                line = (
+                    f"  {runInfo['runId']}  {runInfo['name']:<14} n={len(allValues):<3d}"
+                    f"{p50:10.3f} {unit:<2} / {p95:10.3f} {unit}"
+                )
+                # Flag a run whose median is well off the median of the runs before it
+                if previousP50 and (unit == "s"):
+                    baseline = self.getPercentile(previousP50, 50)
+                    change = (p50 - baseline) / baseline if baseline > 0 else 0.0
+                    isSignificant = p50 - baseline > self.config["regressionFloor"]
+                    if isSignificant and (change > self.config["regressionThreshold"]):
+                        line += f"  regressed {change * 100:+.0f}%"
+                previousP50.append(p50)
+                lines.append(line)
+        return lines
+
+    def printReport(self) -> None:
+        print("\n".join(self.getReport()))
+        return
+
+
+tracer = Tracer()
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import logging
+import pathlib
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+REPO_DIR = pathlib.Path(__file__).parent.parent
+
+
+class WaitEngine:
+    def __init__(self, config: dict, captureImage: Optional[Callable] = None) -> None:
+        self.config = config["waitEngine"]
+        # Page captures come from the input device, which knows where an instance's screen is
+        self.captureImage = captureImage
+        self.logger = logging.getLogger("default")
+        self.clock = time.perf_counter
+        self.runId = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.references: Dict[str, dict] = self.loadReferences()
+        self.history: Dict[str, List[dict]] = self.loadJson(self.config["historyFile"], dict())
+        # Fingerprints captured this run, kept per instance until its navigation confirms them
+        self.candidates: Dict[str, Dict[str, str]] = dict()
+        # Instances navigate on their own threads when input doesn't need the foreground,
+        # and they all share the references, history and the files behind them
+        self.lock = threading.RLock()
+
+    def getPath(self, filePath: str) -> str:
+        # Relative to the repo, not to wherever the assistant was started from
+        return os.path.join(REPO_DIR, filePath)
+
+    def loadReferences(self) -> Dict[str, dict]:
+        allReferences = self.loadJson(self.config["referenceFile"], dict())
+        # Older files hold bare fingerprints
+        return {
+            referenceKey: dict(fingerprint=reference, misses=0)
+            if isinstance(reference, str)
+            else reference
+            for referenceKey, reference in allReferences.items()
+        }
+
+    def loadJson(self, filePath: str, default):
+        filePath = self.getPath(filePath)
+        if not os.path.exists(filePath):
+            return default
+        try:
+            with open(filePath) as jsonFile:
+                return json.load(jsonFile)
+        except (OSError, ValueError):
+            self.logger.error(f"Couldn't read {filePath}, starting afresh.")
+            return default
+
+    def saveJson(self, filePath: str, data) -> None:
+        with self.lock, open(self.getPath(filePath), "w") as jsonFile:
+            json.dump(data, jsonFile, indent=4)
+        return
+
+    def getFingerprint(self, appInfo: dict) -> str:
+        # Average hash of a downscaled grayscale capture of the instance's screen
+        hashSize = self.config["hashSize"]
+        image = self.captureImage(appInfo).convert("L").resize((hashSize, hashSize))  # type: ignore
+        allPixels = list(image.getdata())
+        meanPixel = sum(allPixels) / len(allPixels)
+        hashBits = "".join("1" if pixel > meanPixel else "0" for pixel in allPixels)
+        return f"{int(hashBits, 2):0{len(hashBits) // 4}x}"
+
+    def getReferenceKey(self, stepName: str, windowRect: tuple) -> str:
+        windowSize = f"{windowRect[2] - windowRect[0]}x{windowRect[3] - windowRect[1]}"
+        return f"{stepName}@{windowSize}"
+
+    def isMatch(self, fingerprint: str, reference: str) -> bool:
+        distance = bin(int(fingerprint, 16) ^ int(reference, 16)).count("1")
+        return distance <= self.config["matchThreshold"]
+
+    def getPageCheck(self, stepName: str, appInfo: dict) -> Optional[Callable]:
+        # Ready check against the cached fingerprint of the page this step lands on
+        if not self.config["enabled"]:
+            return None
+        referenceKey = self.getReferenceKey(stepName, appInfo["windowRect"])
+        with self.lock:
+            reference = self.references.get(referenceKey)
+        if reference is None:
+            return None
+
+        def pageCheck() -> bool:
+            isMatch = self.isMatch(
+                self.getFingerprint(appInfo), reference["fingerprint"]
+            )
+            if isMatch:
+                with self.lock:
+                    reference["misses"] = 0
+            return isMatch
+
+        return pageCheck
+
+    def learnReference(self, stepName: str, appInfo: dict) -> None:
+        # Called once a step has had its full worst-case wait. Without a reference, what the
+        # page looks like now becomes a candidate; with one, the reference missed again
+        if not self.config["enabled"]:
+            return
+        referenceKey = self.getReferenceKey(stepName, appInfo["windowRect"])
+        with self.lock:
+            if referenceKey in self.references:
+                self.recordMiss(referenceKey)
+                return
+        try:
+            fingerprint = self.getFingerprint(appInfo)
+        except Exception as ex:
+            self.logger.error(f"Couldn't capture reference for {stepName}.")
+            self.logger.error(ex)
+            return
+        with self.lock:
+            self.candidates.setdefault(appInfo["appTitle"], dict())[referenceKey] = fingerprint
+        return
+
+    def recordMiss(self, referenceKey: str) -> None:
+        # A reference that keeps timing out no longer matches the app, so drop it; the
+        # next run waits the full time and learns it afresh
+        with self.lock:
+            reference = self.references.get(referenceKey)
+            if reference is None:
+                return
+            reference["misses"] += 1
+            if reference["misses"] >= self.config["maxMisses"]:
+                self.logger.error(
+                    f"Reference {referenceKey} timed out {reference['misses']} times in a row, expiring it."
+                )
+                del self.references[referenceKey]
+            self.saveJson(self.config["referenceFile"], self.references)
+        return
+
+    def recordTimeout(self, stepName: str, appInfo: dict) -> None:
+        referenceKey = self.getReferenceKey(stepName, appInfo["windowRect"])
+        if self.config["enabled"]:
+            self.recordMiss(referenceKey)
+        return
+
+    def confirmReferences(self, appTitle: str) -> None:
+        # The instance got where it was going, so the pages it showed on the way were right
+        with self.lock:
+            allCandidates = self.candidates.pop(appTitle, dict())
+            if not allCandidates:
+                return
+            for referenceKey, fingerprint in allCandidates.items():
+                self.references.setdefault(referenceKey, dict(fingerprint=fingerprint, misses=0))
+            self.saveJson(self.config["referenceFile"], self.references)
+        return
+
+    def discardReferences(self, appTitle: str) -> None:
+        with self.lock:
+            self.candidates.pop(appTitle, None)
+        return
+
+    def waitFor(
+        self, stepName: str, timeout: float, readyCheck: Optional[Callable] = None
+    ) -> float:
+        startTime = self.clock()
+        if readyCheck is None:
+            time.sleep(timeout)
+            self.recordWait(stepName, self.clock() - startTime, timeout, isReady=False)
+            return self.clock() - startTime
+
+        isReady = False
+        time.sleep(min(self.config["pollInterval"], timeout))
+        while self.clock() - startTime < timeout:
+            try:
+                isReady = readyCheck()
+            except Exception:
+                isReady = False
+            if isReady:
+                break
+            time.sleep(self.config["pollInterval"])
+        elapsed = self.clock() - startTime
+        self.recordWait(stepName, elapsed, timeout, isReady=isReady)
+        return elapsed
+
+    def waitForPage(self, stepName: str, appInfo: dict, timeout: float) -> float:
+        pageCheck = self.getPageCheck(stepName=stepName, appInfo=appInfo)
+        elapsed = self.waitFor(stepName=stepName, timeout=timeout, readyCheck=pageCheck)
+        if (pageCheck is None) or (elapsed >= timeout):
+            self.learnReference(stepName=stepName, appInfo=appInfo)
+        return elapsed
+
+    def recordWait(
+        self, stepName: str, elapsed: float, timeout: float, isReady: bool
+    ) -> None:
+        with self.lock:
+            stepHistory = self.history.setdefault(stepName, list())
+            stepHistory.append(
+                dict(
+                    runId=self.runId,
+                    elapsed=round(elapsed, 3),
+                    timeout=timeout,
+                    isReady=isReady,
+                )
+            )
+            del stepHistory[: -self.config["historyLength"]]
+        return
+
+    def saveHistory(self) -> None:
+        if not self.config["enabled"]:
+            return
+        with self.lock:
+            self.saveJson(self.config["historyFile"], self.history)
+            # Keeps the miss counts that matched pages have reset
+            self.saveJson(self.config["referenceFile"], self.references)
+        return
+
+    def getSavingsReport(self) -> List[dict]:
+        allRunIds = {
+            record["runId"]
+            for stepHistory in self.history.values()
+            for record in stepHistory
+        }
+        numRuns = max(len(allRunIds), 1)
+        savingsReport = list()
+        for stepName, stepHistory in sorted(self.history.items()):
+            allElapsed = [record["elapsed"] for record in stepHistory]
+            totalSaved = sum(record["timeout"] - record["elapsed"] for record in stepHistory)
+            savingsReport.append(
+                dict(
+                    step=stepName,
+                    waits=len(stepHistory),
+                    readyRate=sum(record["isReady"] for record in stepHistory) / len(stepHistory),
+                    meanWait=sum(allElapsed) / len(allElapsed),
+                    maxWait=max(allElapsed),
+                    timeout=stepHistory[-1]["timeout"],
+                    savedPerRun=totalSaved / numRuns,
+                )
+            )
+        return savingsReport
+
+    def printSavingsReport(self) -> None:
+        savingsReport = self.getSavingsReport()
+        print(
+            f"{'Step':<24}{'Waits':>7}{'Ready':>8}{'Mean':>8}{'Max':>8}{'Timeout':>9}{'Saved/run':>11}"
+        )
+        for stepReport in savingsReport:
+            print(
+                f"{stepReport['step']:<24}{stepReport['waits']:>7}"
+                f"{stepReport['readyRate']:>8.0%}{stepReport['meanWait']:>8.1f}"
+                f"{stepReport['maxWait']:>8.1f}{stepReport['timeout']:>9.1f}"
+                f"{stepReport['savedPerRun']:>11.1f}"
+            )
+        totalSaved = sum(stepReport["savedPerRun"] for stepReport in savingsReport)
+        print(f"Total time saved per run: {totalSaved:.1f} s")
+        return
@@ -1,29 +1,104 @@
+import os
 import time
+import pathlib
 import datetime
-import logging
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Optional
 
 
 from selenium import webdriver
 from selenium.webdriver.chrome.webdriver import WebDriver
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.support.wait import WebDriverWait
+from selenium.webdriver.support.wait import POLL_FREQUENCY, WebDriverWait
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import SessionNotCreatedException
+from selenium.common.exceptions import SessionNotCreatedException, TimeoutException
 
+from base_web_assistant import BaseWebAssistant
+from tracing import tracer
 
-class WebAssistant:
-    def __init__(self, config: dict) -> None:
-        self.config = config["web"]
-        self.config["maxSlots"] = config["maxSlots"]
-        self.logger = logging.getLogger("default")
+REPO_DIR = pathlib.Path(__file__).parent.parent
 
-    def getApnaComplexDriver(self) -> WebDriver:
+FACILITY_ROWS_SCRIPT = """
+const facilitiesTable = document.getElementById("facilities");
+if (!facilitiesTable) { return null; }
+return Array.from(facilitiesTable.querySelectorAll("tbody tr")).map((row) => {
+    const allCells = Array.from(row.querySelectorAll("td"));
+    const lastCell = allCells[allCells.length - 1];
+    return {
+        cells: allCells.map((cell) => cell.innerText.trim()),
+        links: lastCell ? Array.from(lastCell.querySelectorAll("a")).map((link) => {
+            const image = link.querySelector("img");
+            return {href: link.href, title: image ? image.getAttribute("title") : null};
+        }) : [],
+    };
+});
+"""
+
+CLIENT_EVENTS_SCRIPT = """
+if (!window.jQuery || !jQuery.fn.fullCalendar) { return null; }
+const calendar = jQuery("#calendar");
+const view = calendar.fullCalendar("getView");
+const toSeconds = (date) => (date ? new Date(date).getTime() / 1000 : null);
+return {
+    start: toSeconds(view.visStart || view.start),
+    end: toSeconds(view.visEnd || view.end),
+    events: calendar.fullCalendar("clientEvents").map((event) => ({
+        title: event.title,
+        start: toSeconds(event.start),
+    })).filter((event) => event.start !== null),
+};
+"""
+
+GOTO_DATE_SCRIPT = """
+jQuery("#calendar").fullCalendar("gotoDate", new Date(arguments[0] * 1000));
+"""
+
+VIEW_EVENTS_SCRIPT = """
+const allContainers = document.querySelectorAll("#calendar .fc-event-container");
+if (!allContainers.length) { return []; }
+return Array.from(allContainers[allContainers.length - 1].querySelectorAll(".fc-event")).map(
+    (event) => ({
+        title: (event.querySelector(".fc-event-title") || {}).innerText || "",
+        time: (event.querySelector(".fc-event-time") || {}).innerText || "",
+    })
+);
+"""
+
+CALENDAR_READY_SCRIPT = """
+const calendar = document.getElementById("calendar");
+if (!calendar) { return false; }
+if (!window.jQuery || !jQuery.fn.fullCalendar) { return document.readyState !== "loading"; }
+return (jQuery.active === 0) && (calendar.querySelector(".fc-view") !== null);
+"""
+
+LEAN_CHROME_ARGS = [
+    "--headless=new",
+    "--window-size=1280,800",
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--no-first-run",
+    "--mute-audio",
+]
+
+
+class WebAssistant(BaseWebAssistant):
+    def launchDriver(self) -> WebDriver:
         options = Options()
         options.binary_location = self.config["chromeBinaryPath"]
         options.add_experimental_option("excludeSwitches", ["enable-logging"])
+        leanConfig = self.config["leanBrowser"]
+        if leanConfig["enabled"]:
+            # Only page text is read: no window, no images, and the page is handed over as
+            # soon as its DOM is parsed, with the waits below covering what comes later
+            for chromeArg in LEAN_CHROME_ARGS:
+                options.add_argument(chromeArg)
+            # A kept profile keeps Chrome's caches warm across runs; court calendars open as
+            # tabs of the one browser, which quits before the next launch, so one directory does
+            profileDir = os.path.join(REPO_DIR, leanConfig["profileDir"])
+            options.add_argument(f"--user-data-dir={profileDir}")
+            options.page_load_strategy = "eager"
         try:
             driver = webdriver.Chrome(
                 options=options, executable_path=self.config["chromeDriverExe"]
@@ -32,9 +107,52 @@ class WebAssistant:
             failureMsg = "Chrome driver is outdated. Please download the latest version from https://chromedriver.chromium.org/downloads"
             self.logger.error(failureMsg)
             quit()
+        if leanConfig["enabled"]:
+            # Stylesheets and fonts aren't covered by the image setting
+            driver.execute_cdp_cmd("Network.enable", dict())
+            driver.execute_cdp_cmd(
+                "Network.setBlockedURLs", dict(urls=leanConfig["blockedURLs"])
+            )
+        return driver
+
+    def getWait(self, driver: WebDriver, timeout: float) -> WebDriverWait:
+        leanConfig = self.config["leanBrowser"]
+        pollInterval = leanConfig["pollInterval"] if leanConfig["enabled"] else POLL_FREQUENCY
+        return WebDriverWait(driver, timeout, poll_frequency=pollInterval)
+
+    def waitForCalendar(self, driver: WebDriver, delay: int):
+        bookingCalendar = self.getWait(driver, delay).until(
+            EC.element_to_be_clickable((By.ID, "calendar"))
+        )
+        if self.config["leanBrowser"]["enabled"]:
+            # Eager page loads return before FullCalendar has fetched its events
+            self.getWait(driver, delay).until(
+                lambda currentDriver: currentDriver.execute_script(CALENDAR_READY_SCRIPT)
+            )
+        return bookingCalendar
 
+    @tracer.traced()
+    def getApnaComplexDriver(self) -> WebDriver:
+        driver = self.launchDriver()
         # Navigate to facilities page url
         driver.get(self.config["apnaComplexURL"])
+
+        # Try the cached session before logging in
+        accountKey = self.getAccountKey()
+        cachedCookies = self.sessionStore.load(accountKey)
+        if cachedCookies is not None:
+            self.addCookies(driver=driver, cookies=cachedCookies)
+            driver.get(self.config["apnaComplexURL"])
+            try:
+                self.getWait(driver, self.config["sessionCache"]["probeTimeout"]).until(
+                    EC.presence_of_element_located((By.ID, "facilities"))
+                )
+                self.sessionStore.recordResult(isHit=True)
+                return driver
+            except TimeoutException:
+                self.sessionStore.invalidate(accountKey)
+        self.sessionStore.recordResult(isHit=False)
+
         # Enter email
         emailBox = driver.find_element(by=By.ID, value="email")
         emailBox.send_keys(self.config["apnaComplexCreds"]["email"])
@@ -44,96 +162,129 @@ class WebAssistant:
         # Submit login form
         pwdBox.submit()
         # Wait for page to load
-        WebDriverWait(driver, self.config["webDriverDelay"]).until(
+        self.getWait(driver, self.config["webDriverDelay"]).until(
             EC.presence_of_element_located((By.ID, "facilities"))
         )
+        self.sessionStore.save(accountKey, driver.get_cookies())
         return driver
 
-    def isValidCourt(
-        self, allCells: list[WebElement], courtNum: Optional[int]
-    ) -> tuple:
-        facilityName = allCells[0].text
-        isTennisCourt = facilityName.startswith("Tennis Court")
-        if not isTennisCourt:
-            return False, 0
-        currentCourtNum = int(facilityName.split(" ")[-1])
-        isValid = (courtNum is None) or (courtNum == currentCourtNum)
-        return isValid, currentCourtNum
+    def addCookies(self, driver: WebDriver, cookies: list) -> None:
+        cookieKeys = ["name", "value", "path", "secure", "httpOnly", "expiry"]
+        for cookie in cookies:
+            driver.add_cookie({key: cookie[key] for key in cookieKeys if key in cookie})
+        return
+
+    def openCourtTabs(self, driver: WebDriver, viewingLinks: dict) -> Dict[str, str]:
+        # One tab per court in the logged-in browser; window.open doesn't wait for the page,
+        # so all calendars load at once and share the session without another Chrome
+        courtTabs = dict()
+        for court, viewingURL in viewingLinks.items():
+            if viewingURL is None:
+                continue
+            knownHandles = set(driver.window_handles)
+            driver.execute_script("window.open(arguments[0], '_blank');", viewingURL)
+            courtTabs[court] = (set(driver.window_handles) - knownHandles).pop()
+        return courtTabs
+
+    def checkCourtTabs(self, driver: WebDriver, viewingLinks: dict, checkFunc: Callable) -> dict:
+        # A driver runs one command at a time, so the loaded tabs are read in turn
+        courtTabs = self.openCourtTabs(driver=driver, viewingLinks=viewingLinks)
+        courtResults: Dict[str, Optional[object]] = {court: None for court in viewingLinks}
+        for court in viewingLinks:
+            try:
+                if court not in courtTabs:
+                    raise ValueError(f"No viewing link for {court}.")
+                driver.switch_to.window(courtTabs[court])
+                courtResults[court] = checkFunc(court, viewingLinks[court])
+            except Exception as ex:
+                self.logger.error(f"Booking failed while checking exising bookings for {court}.")
+                self.logger.error(ex)
+        return courtResults
 
     def getCourtLinks(
         self, driver: WebDriver, delay: int, courtNum: Optional[int]
     ) -> dict:
-        courtLinks: Dict[str, Dict[str, Optional[str]]] = dict(
-            viewing=dict(Court1=None, Court2=None),
-            booking=dict(Court1=None, Court2=None),
-        )
-        linkTitles = dict(
-            viewing="View bookings for this facility",
-            booking="Make a booking for this facility",
-        )
+        # Pull the whole facilities table in one round trip and parse it locally
+        self.getWait(driver, delay).until(EC.presence_of_element_located((By.ID, "facilities")))
+        allRows = driver.execute_script(FACILITY_ROWS_SCRIPT) or list()
+        return self.parseCourtLinks(allRows=allRows, courtNum=courtNum)
 
-        facilitiesTable = driver.find_element(By.ID, "facilities")
-        allFacilityRows = facilitiesTable.find_elements(By.XPATH, ".//tbody//tr")
-        allFacilityRows.reverse()
-        for row in allFacilityRows:
-            allCells = row.find_elements(By.XPATH, ".//td")
-            isValid, currentCourtNum = self.isValidCourt(allCells, courtNum)
-            if isValid:
-                allLinks = allCells[-1]
-                allLinks = allLinks.find_elements(By.XPATH, ".//a")
-                for currentLink in allLinks:
-                    imageTitle = currentLink.find_elements(By.XPATH, ".//img")[
-                        0
-                    ].get_attribute("title")
-                    linkURL = currentLink.get_attribute("href")
-                    if imageTitle == linkTitles["viewing"]:
-                        courtLinks["viewing"][f"Court{currentCourtNum}"] = linkURL
-                    elif imageTitle == linkTitles["booking"]:
-                        courtLinks["booking"][f"Court{currentCourtNum}"] = linkURL
-
-        return courtLinks
+    def isRangeCovered(self, loadedRanges: list, rangeStart: float, rangeEnd: float) -> bool:
+        coveredUntil = rangeStart
+        for loadedStart, loadedEnd in sorted(loadedRanges):
+            if loadedStart > coveredUntil:
+                break
+            coveredUntil = max(coveredUntil, loadedEnd)
+        return coveredUntil >= rangeEnd
 
-    def getActiveBookings(
-        self, driver: WebDriver, delay: int, viewingURL: str, apartmentName: str
-    ) -> int:
-        def getBookingCount(bookingCalendar, checkExpired):
-            bookingCount = 0
-            eventsContainer = bookingCalendar.find_elements(
-                By.CLASS_NAME, "fc-event-container"
+    def getLoadedEvents(self, driver: WebDriver, delay: int) -> Optional[list]:
+        # FullCalendar only holds the events of the range it shows, and today and tomorrow
+        # can straddle a week or month boundary, so page to tomorrow too when they do
+        today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        rangeStart = today.timestamp()
+        rangeEnd = (today + datetime.timedelta(days=2)).timestamp()
+        allEvents: Dict[tuple, dict] = dict()
+        loadedRanges: list = list()
+        for gotoDate in (None, today + datetime.timedelta(days=1)):
+            if gotoDate is not None:
+                if self.isRangeCovered(loadedRanges, rangeStart, rangeEnd):
+                    break
+                driver.execute_script(GOTO_DATE_SCRIPT, gotoDate.timestamp())
+                self.getWait(driver, delay).until(
+                    lambda currentDriver: currentDriver.execute_script(CALENDAR_READY_SCRIPT)
+                )
+            calendarData = driver.execute_script(CLIENT_EVENTS_SCRIPT)
+            if (calendarData is None) or (None in (calendarData["start"], calendarData["end"])):
+                break
+            loadedRanges.append((calendarData["start"], calendarData["end"]))
+            for bookingEvent in calendarData["events"]:
+                allEvents[(bookingEvent["title"], bookingEvent["start"])] = bookingEvent
+        if self.isRangeCovered(loadedRanges, rangeStart, rangeEnd):
+            return list(allEvents.values())
+        if len(loadedRanges) > 1:
+            # Back to today, where the rendered view fallback starts from
+            driver.execute_script(GOTO_DATE_SCRIPT, rangeStart)
+            self.getWait(driver, delay).until(
+                lambda currentDriver: currentDriver.execute_script(CALENDAR_READY_SCRIPT)
             )
-            allEvents = eventsContainer[-1].find_elements(By.CLASS_NAME, "fc-event")
-            for bookingEvent in allEvents:
-                bookingApartment = bookingEvent.find_element(
-                    By.CLASS_NAME, "fc-event-title"
-                ).text
-                bookingSlot = bookingEvent.find_element(
-                    By.CLASS_NAME, "fc-event-time"
-                ).text
-                if checkExpired and int(bookingSlot[0]) < datetime.datetime.now().hour:
-                    continue
-                if apartmentName in bookingApartment:
-                    bookingCount += 1
-            return bookingCount
+        return None
 
+    def getActiveBookings(
+        self,
+        driver: WebDriver,
+        delay: int,
+        viewingURL: str,
+        apartmentName: str,
+        isLoaded: bool = False,
+    ) -> int:
         bookingCount = 0
         try:
-            driver.get(viewingURL)
-            bookingCalendar = WebDriverWait(driver, delay).until(
-                EC.element_to_be_clickable((By.ID, "calendar"))
-            )
+            if not isLoaded:
+                driver.get(viewingURL)
+            bookingCalendar = self.waitForCalendar(driver=driver, delay=delay)
+            # All loaded events straight from FullCalendar, without switching views
+            allEvents = self.getLoadedEvents(driver=driver, delay=delay)
+            if allEvents is not None:
+                return self.countEventBookings(
+                    allEvents=allEvents, apartmentName=apartmentName
+                )
+
             buttonClasses = ["fc-button-agendaDay", "fc-button-next"]
             for buttonClass in buttonClasses:
                 checkExpired = buttonClass == "fc-button-agendaDay"
                 dayViewButton = bookingCalendar.find_element(By.CLASS_NAME, buttonClass)
                 dayViewButton.click()
                 time.sleep(1)
-                bookingCount += getBookingCount(
-                    bookingCalendar=bookingCalendar, checkExpired=checkExpired
+                bookingCount += self.countViewBookings(
+                    allEvents=driver.execute_script(VIEW_EVENTS_SCRIPT) or list(),
+                    apartmentName=apartmentName,
+                    checkExpired=checkExpired,
                 )
 
         except Exception as ex:
             self.logger.error("Unknown error occured during active booking checks.")
             self.logger.error(ex)
+            self.onLinkError(linkURL=viewingURL)
 
         return bookingCount
 
@@ -141,57 +292,52 @@ class WebAssistant:
         # Initialize the webdriver and navigate to facilities page
         driver = self.getApnaComplexDriver()
         # Get the court booking and viewing links from the facilities table
-        courtLinks = self.getCourtLinks(
-            driver=driver, delay=self.config["webDriverDelay"], courtNum=None
+        courtLinks = self.getCachedCourtLinks(
+            loadFunc=lambda: self.getCourtLinks(
+                driver=driver, delay=self.config["webDriverDelay"], courtNum=None
+            )
+        )
+
+        def checkCourt(court: str, viewingURL: str) -> int:
+            return self.getActiveBookings(
+                driver=driver,
+                delay=self.config["webDriverDelay"],
+                viewingURL=viewingURL,
+                apartmentName=apartmentName,
+                isLoaded=True,
+            )
+
+        existingBookings = self.checkCourtTabs(
+            driver=driver, viewingLinks=courtLinks["viewing"], checkFunc=checkCourt
         )
-        viewingLinks = courtLinks["viewing"]
-        existingBookings: Dict[str, Optional[int]] = dict(Court1=None, Court2=None)
-        try:
-            for court in viewingLinks:
-                existingBookings[court] = self.getActiveBookings(
-                    driver=driver,
-                    delay=self.config["webDriverDelay"],
-                    viewingURL=viewingLinks[court],
-                    apartmentName=apartmentName,
-                )
-        except Exception as ex:
-            self.logger.error(f"Booking failed while checking exising bookings.")
-            self.logger.error(ex)
 
-        driver.close()
         driver.quit()
         return existingBookings, courtLinks
 
-    def getBookingTimeSlot(self, slotHour: int, nextHourCutoff: int) -> tuple:
-        if slotHour is None:
-            slotHour = int(datetime.datetime.now().strftime("%H"))
-            currentMin = int(datetime.datetime.now().strftime("%M"))
-            if currentMin > nextHourCutoff:
-                slotHour += 1
+    def getSlotBookings(self, apartmentName: str, bookingDate: datetime.date) -> tuple:
+        # Existing booking counts and hour owners per court from FullCalendar's loaded events
+        driver = self.getApnaComplexDriver()
+        courtLinks = self.getCachedCourtLinks(
+            loadFunc=lambda: self.getCourtLinks(
+                driver=driver, delay=self.config["webDriverDelay"], courtNum=None
+            )
+        )
 
-        bookingDatetime = datetime.datetime.now() + datetime.timedelta(days=1)
-        bookingDatetime = bookingDatetime.replace(
-            hour=slotHour, minute=0, second=0, microsecond=1
+        def checkCourt(court: str, viewingURL: str) -> tuple:
+            self.waitForCalendar(driver=driver, delay=self.config["webDriverDelay"])
+            allEvents = self.getLoadedEvents(driver=driver, delay=self.config["webDriverDelay"])
+            if allEvents is None:
+                # Rendered views only carry times, not dates, so they can't place a slot
+                raise RuntimeError(f"No calendar events available for {court}.")
+            return (
+                self.countEventBookings(allEvents=allEvents, apartmentName=apartmentName),
+                self.getHourOwners(
+                    allEvents=allEvents, apartmentName=apartmentName, bookingDate=bookingDate
+                ),
+            )
+
+        courtSlots = self.checkCourtTabs(
+            driver=driver, viewingLinks=courtLinks["viewing"], checkFunc=checkCourt
         )
-        return slotHour, bookingDatetime
-
-    def selectCourtNum(self, existingBookings: dict, numSlots: int) -> Optional[list]:
-        alreadyUsedSlots = existingBookings["Court1"] + existingBookings["Court2"]
-        avaiableSlots = self.config["maxSlots"] - alreadyUsedSlots
-        if avaiableSlots <= 0:
-            return None
-
-        numSlots = min(numSlots, avaiableSlots)
-        courtNumList:List[Optional[int]] = [None] * numSlots
-
-        newBookings = existingBookings.copy()
-        courtPreference = ["Court1", "Court2"]
-        for i in range(numSlots):
-            if newBookings[courtPreference[0]] < 2:
-                courtNumList[i] = int(courtPreference[0][-1])
-                newBookings[courtPreference[0]] += 1
-            elif newBookings[courtPreference[1]] < 2:
-                courtNumList[i] = int(courtPreference[1][-1])
-                newBookings[courtPreference[1]] += 1
-
-        return courtNumList
+        driver.quit()
+        return self.splitSlotBookings(courtSlots)
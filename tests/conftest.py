@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+import pathlib
+
+import pytest
+
+repoDir = pathlib.Path(__file__).parent.parent
+sys.path.append(os.path.join(repoDir, "src"))
+sys.path.append(os.path.join(repoDir, "benchmarks"))
+
+APP_LOAD = 0.3
+
+
+def loadConfig() -> dict:
+    with open(os.path.join(repoDir, "config.json")) as configJson:
+        return json.load(configJson)
+
+
+@pytest.fixture
+def config() -> dict:
+    return loadConfig()
+
+
+@pytest.fixture(scope="session")
+def emulator():
+    # The simulated BlueStacks from the end to end benchmark, registered in place of the
+    # Windows modules before app_assistant is first imported; the import keeps these for
+    # the whole session
+    from fake_emulator import FakeEmulator, installFakeModules
+
+    emulator = FakeEmulator(
+        appConfig=loadConfig()["app"],
+        latencies=dict(boot=0.05, appLoad=0.05, pageLoad=0.05, toggle=0.02, scroll=0.02),
+    )
+    installFakeModules(emulator)
+    return emulator
+
+
+@pytest.fixture
+def appAssistant(config, emulator, tmp_path):
+    from app_assistant import AppAssistant
+
+    appConfig = config["app"]
+    appConfig["inputBackend"] = "desktop"
+    appConfig["sleepDuration"].update(instanceLoad=0, appLoad=APP_LOAD)
+    appConfig["waitEngine"].update(
+        pollInterval=0.02,
+        referenceFile=str(tmp_path / "references.json"),
+        historyFile=str(tmp_path / "history.json"),
+    )
+    appConfig["navigationMacro"]["file"] = str(tmp_path / "macro.json")
+    appConfig["slotSeek"]["calibrationFile"] = str(tmp_path / "seek.json")
+    appConfig["latencyCalibration"]["file"] = str(tmp_path / "latency.json")
+    emulator.stopAllInstances()
+    emulator.hangingBoots = dict()
+    return AppAssistant(config=config)
@@ -0,0 +1,83 @@
+import socket
+
+import pytest
+
+from adb_input import AdbClient, AdbError, AdbInput
+from fake_adb_server import FakeAdbServer
+from fake_emulator import FakeEmulator
+
+
+@pytest.fixture
+def adbServer(config):
+    adbServer = FakeAdbServer(
+        emulator=FakeEmulator(appConfig=config["app"], latencies=dict()),
+        appConfig=config["app"],
+        inputLatency=0.0,
+    ).start()
+    config["app"]["adb"]["port"] = adbServer.port
+    yield adbServer
+    adbServer.stop()
+
+
+@pytest.fixture
+def adbInput(config, adbServer):
+    adbInput = AdbInput(config=config["app"])
+    adbInput.registerApp(
+        appTitle="ApnaComplex1", appInfo=dict(appTitle="ApnaComplex1", windowRect=(0, 0, 480, 820))
+    )
+    return adbInput
+
+
+def test_request_framing():
+    client = AdbClient(host="127.0.0.1", port=0, timeout=1)
+    clientSock, serverSock = socket.socketpair()
+    with clientSock, serverSock:
+        clientSock.settimeout(1)
+        serverSock.settimeout(1)
+        client.sendRequest(clientSock, "host:transport:127.0.0.1:5555")
+        assert serverSock.recv(1024) == b"001dhost:transport:127.0.0.1:5555"
+        serverSock.sendall(b"OKAY")
+        client.readStatus(clientSock)
+        serverSock.sendall(b"FAIL000edevice offline")
+        with pytest.raises(AdbError, match="device offline"):
+            client.readStatus(clientSock)
+        serverSock.sendall(b"WHAT")
+        with pytest.raises(AdbError, match="Unexpected"):
+            client.readStatus(clientSock)
+
+
+def test_connect_and_unknown_device(config, adbServer):
+    adbConfig = config["app"]["adb"]
+    client = AdbClient(host=adbConfig["host"], port=adbServer.port, timeout=1)
+    assert client.connect("127.0.0.1:5555") == "connected to 127.0.0.1:5555"
+    with pytest.raises(AdbError, match="not found"):
+        client.openTransport("127.0.0.1:9999")
+
+
+def test_click_goes_to_the_instance_serial(adbServer, adbInput):
+    appInfo = dict(appTitle="ApnaComplex1", windowRect=(0, 0, 480, 820))
+    adbInput.prepareClick(appInfo, (224, 426))
+    adbInput.click(appInfo, (224, 426))
+    assert [(command["serial"], command["command"]) for command in adbServer.allCommands] == [
+        ("127.0.0.1:5555", "input tap 450 800")
+    ]
+    with pytest.raises(AdbError, match="ApnaComplex2"):
+        adbInput.click(dict(appTitle="ApnaComplex2", windowRect=(0, 0, 480, 820)), (224, 426))
+
+
+@pytest.mark.parametrize("windowRect", [(0, 0, 480, 820), (100, 50, 1060, 1690)])
+def test_device_coords_scale_with_the_window(adbServer, adbInput, windowRect):
+    xScale = (windowRect[2] - windowRect[0]) / 480
+    yScale = (windowRect[3] - windowRect[1]) / 820
+    for windowCoords in [(0, 32), (224, 426), (447, 819)]:
+        screenCoords = (
+            windowRect[0] + round(windowCoords[0] * xScale),
+            windowRect[1] + round(windowCoords[1] * yScale),
+        )
+        deviceCoords = adbInput.toDeviceCoords(windowRect, screenCoords)
+        # The fake server maps device pixels back onto a default-sized window
+        landedCoords = adbServer.toWindowCoords(*deviceCoords)
+        assert abs(landedCoords[0] - windowCoords[0]) <= 1
+        assert abs(landedCoords[1] - windowCoords[1]) <= 1
+    # Points off the Android screen are clamped onto it
+    assert adbInput.toDeviceCoords(windowRect, (windowRect[0], windowRect[1])) == (0, 0)
@@ -0,0 +1,67 @@
+import pytest
+
+from batch_planner import BatchPlanner
+from booking_verifier import BookingVerifier
+
+
+@pytest.fixture
+def bookingVerifier(config):
+    config["batchPlanner"].update(courts=[1, 2], perCourtCap=2)
+    config["maxSlots"] = 4
+    return BookingVerifier(config=config, batchPlanner=BatchPlanner(config=config))
+
+
+ALL_BOOKING_ARGS = [
+    dict(courtNum=1, slotHour=7),
+    dict(courtNum=2, slotHour=7),
+    dict(courtNum=1, slotHour=8),
+]
+
+
+def test_calendar_decides_where_it_can(bookingVerifier):
+    slotOwners = dict(Court1={7: "ours"}, Court2={7: "taken"})
+    calendarOutcomes = bookingVerifier.getCalendarOutcomes(ALL_BOOKING_ARGS, slotOwners)
+    assert calendarOutcomes == [True, False, None]
+    # An unreadable court calendar, or none at all, leaves its bookings unverified
+    assert bookingVerifier.getCalendarOutcomes(ALL_BOOKING_ARGS, dict(Court1={7: "ours"})) == [
+        True,
+        None,
+        None,
+    ]
+    assert bookingVerifier.getCalendarOutcomes(ALL_BOOKING_ARGS, None) == [None] * 3
+    # The result screen only fills in the gaps
+    assert bookingVerifier.getOutcomes(calendarOutcomes, [False, True, True]) == [
+        True,
+        False,
+        True,
+    ]
+
+
+def test_lost_instances_rebook_free_opened_slots(bookingVerifier):
+    slotOwners = dict(Court1={7: "ours"}, Court2={7: "taken"})
+    existingBookings = dict(Court1=1, Court2=0)
+    # Nothing left at the only hour that has opened
+    assert bookingVerifier.planRebooking(1, [7], existingBookings, slotOwners) == []
+    assert bookingVerifier.planRebooking(2, [7, 8], existingBookings, slotOwners) == [
+        dict(courtNum=1, slotHour=8),
+        dict(courtNum=2, slotHour=8),
+    ]
+
+
+def test_unreadable_courts_are_never_rebooked(bookingVerifier):
+    slotOwners = dict(Court1={7: "ours"})
+    assert (2, 8) in bookingVerifier.getTakenSlots(slotOwners)
+    allBookingArgs = bookingVerifier.planRebooking(
+        2, [7, 8], dict(Court1=1, Court2=0), slotOwners
+    )
+    # Both lost instances go for the one free slot, the second as a hedge
+    assert allBookingArgs == [dict(courtNum=1, slotHour=8), dict(courtNum=1, slotHour=8)]
+
+
+def test_rebooking_stays_within_the_quota(bookingVerifier):
+    # Three slots held already, so only one more new slot can be taken
+    existingBookings = dict(Court1=2, Court2=1)
+    allBookingArgs = bookingVerifier.planRebooking(
+        3, [8, 9], existingBookings, dict(Court1=dict(), Court2=dict())
+    )
+    assert {(args["courtNum"], args["slotHour"]) for args in allBookingArgs} == {(2, 8)}
@@ -0,0 +1,34 @@
+import pytest
+
+from clock_sync import ClockSync
+from apnacomplex_stub import ApnaComplexStub
+
+
+@pytest.fixture(params=[-2.75, 0.0, 3.4])
+def stub(request):
+    stub = ApnaComplexStub(clockSkew=request.param).start()
+    yield stub
+    stub.stop()
+
+
+def getClockConfig(stub: ApnaComplexStub, **overrides) -> dict:
+    clockConfig = stub.getWebConfig()["clockSync"]
+    clockConfig.update(overrides)
+    return dict(clockSync=clockConfig)
+
+
+def test_endpoint_offset_within_bound(stub):
+    clockConfig = getClockConfig(
+        stub, timeEndpoint=f"{stub.baseURL}/time", samples=4, sampleInterval=0.01
+    )
+    clockEstimate = ClockSync(config=clockConfig).estimateOffset()
+    # The skew sits inside the reported bound, which is no wider than the round trip
+    assert abs(clockEstimate["offset"] - stub.clockSkew) <= clockEstimate["error"] + 0.001
+    assert clockEstimate["error"] < 0.01
+
+
+def test_date_header_offset_within_bound(stub):
+    # Each bisection sample waits for a server second boundary, so keep the count low
+    clockEstimate = ClockSync(config=getClockConfig(stub, samples=5)).estimateOffset()
+    assert abs(clockEstimate["offset"] - stub.clockSkew) <= clockEstimate["error"] + 0.001
+    assert clockEstimate["error"] < 0.1
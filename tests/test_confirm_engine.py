@@ -0,0 +1,80 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from confirm_engine import ConfirmEngine
+from precise_scheduler import PreciseScheduler
+
+
+class FakeSite:
+    # The slot goes to whichever click lands once the site has taken enough of them
+    def __init__(self, clicksToWin: int) -> None:
+        self.clicksToWin = clicksToWin
+        self.allClicks: list = list()
+        self.lock = threading.Lock()
+
+    def click(self, appIdx: int) -> None:
+        with self.lock:
+            self.allClicks.append(appIdx)
+        return
+
+    def isWon(self, appIdx: int) -> bool:
+        return len(self.allClicks) >= self.clicksToWin
+
+
+@pytest.fixture
+def scheduler(config):
+    return PreciseScheduler(config=config)
+
+
+def fireTargets(engine: ConfirmEngine, allTargets: list) -> list:
+    engine.arm(allTargets=allTargets, fireDatetime=datetime.now() + timedelta(seconds=0.2))
+    return engine.release()
+
+
+def test_hedged_clicks_stop_once_the_slot_is_won(scheduler):
+    site = FakeSite(clicksToWin=2)
+    engine = ConfirmEngine(
+        clickFunc=site.click, scheduler=scheduler, successFunc=site.isWon, pollInterval=0.005
+    )
+    allResults = fireTargets(
+        engine,
+        [
+            dict(appIdx=0, coords=(1, 1), slotKey="court1", offsets=[0.0, 0.1, 0.2]),
+            dict(appIdx=1, coords=(2, 2), slotKey="court1", offsets=[0.1, 0.2]),
+        ],
+    )
+    # Both instances clicked in the second wave, nobody in the third
+    assert sorted(site.allClicks) == [0, 0, 1]
+    assert [len(result["allClicks"]) for result in allResults] == [2, 1]
+    assert all(result["wonOffset"] == 0.1 for result in allResults)
+    assert engine.getOffsetStats() == {
+        "+0": dict(clicks=1, wins=0),
+        "+100": dict(clicks=2, wins=1),
+    }
+
+
+def test_every_offset_fires_without_a_success_check(scheduler):
+    site = FakeSite(clicksToWin=1)
+    engine = ConfirmEngine(clickFunc=site.click, scheduler=scheduler)
+    (result,) = fireTargets(
+        engine, [dict(appIdx=0, coords=(1, 1), offsets=[-0.05, 0.0, 0.05], fireDelay=0.1)]
+    )
+    assert [click["offset"] for click in result["allClicks"]] == [-0.05, 0.0, 0.05]
+    assert result["isSuccess"]
+    # Skews are against each click's own offset, moved by the instance's fire delay
+    for click in result["allClicks"]:
+        assert click["fireDelay"] == 0.1
+        assert -1 < click["skewMs"] < 50
+    assert engine.getOffsetStats()["-50"] == dict(clicks=1, wins=0)
+
+
+def test_failed_click_is_reported(scheduler):
+    def clickFunc(appIdx: int) -> None:
+        raise RuntimeError("Window went away")
+
+    engine = ConfirmEngine(clickFunc=clickFunc, scheduler=scheduler)
+    (result,) = fireTargets(engine, [dict(appIdx=0, coords=(1, 1))])
+    assert not result["isSuccess"]
+    assert result["error"] == "Window went away"
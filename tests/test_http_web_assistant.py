@@ -0,0 +1,83 @@
+import datetime
+
+import pytest
+import requests
+
+from apnacomplex_stub import ApnaComplexStub
+from http_web_assistant import HttpWebAssistant
+
+
+@pytest.fixture
+def stub():
+    stub = ApnaComplexStub().start()
+    yield stub
+    stub.stop()
+
+
+def getWebAssistant(config: dict, stub: ApnaComplexStub, **creds) -> HttpWebAssistant:
+    config["web"].update(stub.getWebConfig())
+    config["web"]["apnaComplexCreds"].update(creds)
+    config["web"]["clockSync"]["enabled"] = False
+    config["web"]["sessionCache"]["enabled"] = False
+    config["web"]["linkCache"]["enabled"] = False
+    return HttpWebAssistant(config=config)
+
+
+def getLogins(stub: ApnaComplexStub) -> int:
+    return sum(path == "/login" for _, command, path in stub.requestLog if command == "POST")
+
+
+def test_login(config, stub):
+    webAssistant = getWebAssistant(config, stub)
+    session, facilitiesHtml = webAssistant.getApnaComplexSession()
+    assert 'id="facilities"' in facilitiesHtml
+    assert session.cookies.get("session") in stub.sessions
+    assert getLogins(stub) == 1
+
+
+def test_login_with_wrong_password(config, stub):
+    webAssistant = getWebAssistant(config, stub, password="wrong")
+    with pytest.raises(requests.HTTPError):
+        webAssistant.getApnaComplexSession()
+    assert not stub.sessions
+
+
+def test_court_links(config, stub):
+    webAssistant = getWebAssistant(config, stub)
+    _, facilitiesHtml = webAssistant.getApnaComplexSession()
+    courtLinks = webAssistant.getCourtLinks(
+        facilitiesHtml=facilitiesHtml,
+        facilitiesURL=config["web"]["apnaComplexURL"],
+        courtNum=None,
+    )
+    assert courtLinks["viewing"] == {
+        f"Court{courtNum}": f"{stub.baseURL}/facilities/calendar/{facilityId}"
+        for courtNum, facilityId in [(1, 201), (2, 202), (3, 203)]
+    }
+    assert courtLinks["booking"]["Court1"] == f"{stub.baseURL}/facilities/book/201"
+
+
+def test_existing_bookings(config, stub):
+    webAssistant = getWebAssistant(config, stub)
+    existingBookings, _ = webAssistant.getExistingBookings(apartmentName=config["apartmentName"])
+    # Court 1 reads its events feed, court 2 its inline events; today's 6:00 booking
+    # only counts until that hour has passed
+    assert existingBookings == dict(
+        Court1=1 + (datetime.datetime.now().hour <= 6), Court2=1, Court3=0
+    )
+
+
+def test_slot_bookings_on_a_warm_session(config, stub):
+    webAssistant = getWebAssistant(config, stub)
+    webAssistant.keepWarm()
+    stub.addEvent("Tennis Court 3", config["apartmentName"], dayOffset=1, hour=10)
+    existingBookings, slotOwners = webAssistant.getSlotBookings(
+        apartmentName=config["apartmentName"],
+        bookingDate=datetime.date.today() + datetime.timedelta(days=1),
+    )
+    assert existingBookings["Court3"] == 1
+    assert slotOwners == dict(
+        Court1={7: "taken"}, Court2={18: "ours", 19: "taken"}, Court3={6: "taken", 10: "ours"}
+    )
+    webAssistant.keepWarm()
+    assert getLogins(stub) == 1
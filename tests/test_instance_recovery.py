@@ -0,0 +1,47 @@
+import time
+
+
+def superviseRestarts(appAssistant, allApps: list) -> None:
+    # Navigation would check on restarting instances between its own steps
+    deadline = time.perf_counter() + 4 * appAssistant.config["sleepDuration"]["appLoad"]
+    while any(
+        appAssistant.isInstancePending(instance)
+        for instance in appAssistant.allInstances.values()
+    ):
+        assert time.perf_counter() < deadline
+        appAssistant.checkAllApps(allApps)
+        time.sleep(0.02)
+    return
+
+
+def test_hung_instance_restarts_on_its_own(appAssistant, emulator):
+    emulator.hangingBoots = dict(ApnaComplex2=1)
+    allApps = appAssistant.loadAllApnaComplexApps(numApps=3)
+    allInstances = appAssistant.allInstances
+    # The healthy ones loaded on their first launch and didn't wait on the hung one
+    assert [appInfo["appTitle"] for appInfo in allApps] == [
+        "ApnaComplex1",
+        "ApnaComplex2",
+        "ApnaComplex3",
+    ]
+    assert [allInstances[f"ApnaComplex{num}"]["stage"] for num in (1, 3)] == ["ready"] * 2
+    assert [allInstances[f"ApnaComplex{num}"]["launchCount"] for num in (1, 3)] == [1, 1]
+    assert allInstances["ApnaComplex2"]["launchCount"] == 2
+    assert appAssistant.isInstancePending(allInstances["ApnaComplex2"])
+
+    superviseRestarts(appAssistant, allApps)
+    assert allInstances["ApnaComplex2"]["stage"] == "ready"
+    # The dict navigation already holds was filled in once the window came back
+    assert allApps[1]["windowRect"] is not None
+    assert emulator.findWindow("ApnaComplex2").getVisiblePage() != "androidHome"
+
+
+def test_instance_is_given_up_after_max_retries(appAssistant, emulator, config):
+    maxRetries = config["app"]["maxRetries"]
+    emulator.hangingBoots = dict(ApnaComplex1=maxRetries)
+    allApps = appAssistant.loadAllApnaComplexApps(numApps=2)
+    superviseRestarts(appAssistant, allApps)
+    assert appAssistant.allInstances["ApnaComplex1"]["stage"] == "failed"
+    assert appAssistant.allInstances["ApnaComplex1"]["launchCount"] == maxRetries
+    assert appAssistant.allInstances["ApnaComplex2"]["stage"] == "ready"
+    assert appAssistant.checkAllApps(allApps) == 1
@@ -0,0 +1,120 @@
+import socket
+
+import pytest
+import requests
+
+from apnacomplex_stub import ApnaComplexStub
+from latency_probe import LatencyProbe, LatencyProfile
+
+
+def getFreePort() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def calibrationConfig(config, tmp_path):
+    calibrationConfig = config["app"]["latencyCalibration"]
+    calibrationConfig.update(
+        file=str(tmp_path / "latency.json"),
+        probePorts=dict(ApnaComplex1=getFreePort()),
+        bookingHosts=["127.0.0.1"],
+        timeout=1,
+    )
+    return config["app"]
+
+
+@pytest.fixture
+def latencyProbe(calibrationConfig):
+    latencyProbe = LatencyProbe(config=calibrationConfig)
+    latencyProbe.start()
+    yield latencyProbe
+    latencyProbe.stop()
+
+
+@pytest.fixture
+def stub():
+    stub = ApnaComplexStub().start()
+    yield stub
+    stub.stop()
+
+
+def getThroughProbe(latencyProbe: LatencyProbe, url: str) -> requests.Response:
+    session = requests.Session()
+    # The probe stands in for the proxy the emulator is pointed at
+    session.trust_env = False
+    port = latencyProbe.config["probePorts"]["ApnaComplex1"]
+    session.proxies = dict(http=f"http://127.0.0.1:{port}")
+    return session.get(url, timeout=2)
+
+
+def test_lead_comes_from_a_rolling_low_percentile(calibrationConfig):
+    latencyProfile = LatencyProfile(config=calibrationConfig)
+    profileConfig = latencyProfile.config
+    for _ in range(profileConfig["minSamples"] - 1):
+        latencyProfile.addSample("ApnaComplex1", 0.1)
+    assert latencyProfile.getLead("ApnaComplex1") is None
+    for latency in [0.2] * profileConfig["sampleLength"]:
+        latencyProfile.addSample("ApnaComplex1", latency)
+    # The early quick samples have aged out of the window
+    assert latencyProfile.allSamples["ApnaComplex1"] == [0.2] * profileConfig["sampleLength"]
+    assert latencyProfile.getLead("ApnaComplex1") == pytest.approx(
+        0.2 - profileConfig["safetyMargin"]
+    )
+    latencyProfile.saveSamples()
+    assert LatencyProfile(config=calibrationConfig).allSamples == latencyProfile.allSamples
+
+
+def test_probe_times_the_request_after_a_click(latencyProbe, stub):
+    assert not latencyProbe.isRouted("ApnaComplex1")
+    assert getThroughProbe(latencyProbe, stub.baseURL + "/login").status_code == 200
+    assert latencyProbe.isRouted("ApnaComplex1")
+    # Nothing was clicked, so there's nothing to time
+    assert latencyProbe.waitForLatency("ApnaComplex1", latencyProbe.clock() + 0.1) is None
+
+    latencyProbe.markClick("ApnaComplex1")
+    getThroughProbe(latencyProbe, stub.baseURL + "/login")
+    latency = latencyProbe.waitForLatency("ApnaComplex1", latencyProbe.clock() + 1)
+    assert 0 < latency < 1
+
+
+def test_rehearsal_clicks_never_reach_the_site(latencyProbe, stub):
+    latencyProbe.dropRequests = True
+    latencyProbe.markClick("ApnaComplex1")
+    numRequests = len(stub.requestLog)
+    with pytest.raises(requests.ConnectionError):
+        getThroughProbe(latencyProbe, stub.baseURL + "/login")
+    assert latencyProbe.waitForLatency("ApnaComplex1", latencyProbe.clock() + 1) is not None
+    assert len(stub.requestLog) == numRequests
+    # Once the app has left the confirm page its traffic flows again
+    latencyProbe.unblock("ApnaComplex1")
+    assert getThroughProbe(latencyProbe, stub.baseURL + "/login").status_code == 200
+
+
+def getCalibratedDelays(appAssistant, allOffsets: list, confirmLeadTime: float) -> list:
+    allApps = [dict(appTitle=f"ApnaComplex{num}") for num in (1, 2)]
+    allTargets = [dict(appIdx=idx, offsets=allOffsets) for idx in range(len(allApps))]
+    latencyProfile = appAssistant.latencyProfile
+    for _ in range(latencyProfile.config["minSamples"]):
+        latencyProfile.addSample("ApnaComplex1", 0.12)
+    return [
+        target["fireDelay"]
+        for target in appAssistant.getCalibratedTargets(
+            allTargets=allTargets, allApps=allApps, confirmLeadTime=confirmLeadTime
+        )
+    ]
+
+
+def test_requests_never_reach_the_site_before_the_opening(appAssistant):
+    calibrationConfig = appAssistant.config["latencyCalibration"]
+    lead = 0.12 - calibrationConfig["safetyMargin"]
+    # Measured instances click their lead ahead of the opening, the rest the default lead
+    assert getCalibratedDelays(appAssistant, [0.0], confirmLeadTime=1) == pytest.approx(
+        [1 - lead, 1 - calibrationConfig["defaultLead"]]
+    )
+    # The earliest hedged click moves back, so its request too lands after the opening
+    hedgedDelays = getCalibratedDelays(appAssistant, [-0.05, 0.0, 0.05], confirmLeadTime=1)
+    assert hedgedDelays[0] == pytest.approx(1 - lead + 0.05)
+    # Never more lead than the fire time has ahead of the opening
+    assert getCalibratedDelays(appAssistant, [0.0], confirmLeadTime=0.03) == [0.0, 0.0]
@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("selenium")
+
+import web_assistant  # noqa: E402
+from web_assistant import LEAN_CHROME_ARGS, WebAssistant  # noqa: E402
+
+
+class RecordingDriver:
+    def __init__(self, options, executable_path: str) -> None:
+        self.options = options
+        self.allCdpCommands: list = list()
+
+    def execute_cdp_cmd(self, command: str, args: dict) -> None:
+        self.allCdpCommands.append((command, args))
+        return
+
+
+@pytest.fixture
+def webAssistant(config, tmp_path, monkeypatch):
+    monkeypatch.setattr(web_assistant.webdriver, "Chrome", RecordingDriver)
+    config["web"]["leanBrowser"]["profileDir"] = str(tmp_path / "chrome_profile")
+    config["web"]["sessionCache"]["enabled"] = False
+    config["web"]["linkCache"]["enabled"] = False
+    return WebAssistant(config=config)
+
+
+def test_lean_profile_options(webAssistant):
+    leanConfig = webAssistant.config["leanBrowser"]
+    leanConfig["enabled"] = True
+    driver = webAssistant.launchDriver()
+    for chromeArg in LEAN_CHROME_ARGS:
+        assert chromeArg in driver.options.arguments
+    assert any(
+        chromeArg.startswith(f"--user-data-dir={leanConfig['profileDir']}")
+        for chromeArg in driver.options.arguments
+    )
+    assert driver.options.page_load_strategy == "eager"
+    assert driver.allCdpCommands == [
+        ("Network.enable", dict()),
+        ("Network.setBlockedURLs", dict(urls=leanConfig["blockedURLs"])),
+    ]
+    assert webAssistant.getWait(driver, 5)._poll == leanConfig["pollInterval"]
+
+
+def test_default_profile_is_unchanged(webAssistant):
+    driver = webAssistant.launchDriver()
+    assert not set(LEAN_CHROME_ARGS) & set(driver.options.arguments)
+    assert driver.allCdpCommands == []
@@ -0,0 +1,77 @@
+import pytest
+
+from navigation_macro import NavigationMacro
+
+
+@pytest.fixture
+def navigationMacro(config, tmp_path):
+    config["app"]["navigationMacro"]["file"] = str(tmp_path / "macro.json")
+    return NavigationMacro(config=config["app"])
+
+
+def getHandCodedSteps(numScrolls: int) -> list:
+    allSteps = [
+        dict(kind="click", name="facilities", elementTemplate="facilitiesButton", settle=5),
+        dict(kind="click", name="header", elementTemplate="header", settle=1),
+    ]
+    allSteps += [
+        dict(kind="scroll", element="scrollPoint", wheelDist=-1, settle=1)
+        for _ in range(numScrolls)
+    ]
+    allSteps += [
+        dict(
+            kind="click",
+            name="court",
+            elementTemplate="court{courtNum}",
+            settle=5,
+            reference="court",
+        ),
+        dict(kind="timeSlot"),
+        dict(kind="timeSlot"),
+    ]
+    return allSteps
+
+
+def test_scroll_ticks_replay_as_one_batch(navigationMacro, config):
+    navigationMacro.recordSequence(getHandCodedSteps(numScrolls=12))
+    sequence = navigationMacro.getSequence()
+    assert [step["name"] for step in sequence] == [
+        "facilities",
+        "header",
+        "facilitiesScroll",
+        "court",
+        "timeSlot",
+    ]
+    assert sequence[2]["wheelDist"] == -12
+    assert sequence[2]["slowSettle"] == 12
+    assert sequence[3]["element"] == "court{courtNum}"
+    # The recorded macro is what the next run starts from
+    assert NavigationMacro(config=config["app"]).getSequence() == sequence
+
+
+def test_settles_are_tuned_from_verified_waits(navigationMacro):
+    macroStep = dict(name="court", slowSettle=5)
+    minSamples = navigationMacro.config["minSamples"]
+    for _ in range(minSamples - 1):
+        navigationMacro.recordWait("court", 0.8, isReady=True)
+    # Too few measurements to go below the hand-coded wait yet
+    assert navigationMacro.getTunedSettle(macroStep) == 5
+    # A wait that ran out says nothing about how long the page really took
+    navigationMacro.recordWait("court", 5, isReady=False)
+    navigationMacro.recordWait("court", 1.2, isReady=True)
+    assert navigationMacro.getTunedSettle(macroStep) == pytest.approx(
+        1.2 * navigationMacro.config["safetyFactor"]
+    )
+    # Never slower than the hand-coded path, never below the floor
+    navigationMacro.macro["samples"]["court"] = [4.0] * minSamples
+    assert navigationMacro.getTunedSettle(macroStep) == 5
+    navigationMacro.macro["samples"]["court"] = [0.01] * minSamples
+    assert navigationMacro.getTunedSettle(macroStep) == navigationMacro.config["minSettle"]
+
+
+def test_samples_are_a_rolling_window(navigationMacro):
+    sampleLength = navigationMacro.config["sampleLength"]
+    for sampleIdx in range(sampleLength + 5):
+        navigationMacro.recordWait("header", sampleIdx, isReady=True)
+    allSamples = navigationMacro.macro["samples"]["header"]
+    assert allSamples == list(range(5, sampleLength + 5))
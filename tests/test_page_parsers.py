@@ -0,0 +1,81 @@
+import datetime
+
+import pytest
+
+from apnacomplex_stub import ApnaComplexStub
+from base_web_assistant import BaseWebAssistant
+from page_parsers import parseCalendarEvents, parseFacilityRows
+
+
+@pytest.fixture
+def stub():
+    # Only renders the fixtures, the server is never started
+    stub = ApnaComplexStub()
+    yield stub
+    stub.server.server_close()
+
+
+@pytest.fixture
+def webAssistant(config):
+    return BaseWebAssistant(config=config)
+
+
+def test_facility_rows(stub):
+    allRows = parseFacilityRows(stub.renderFacilities())
+    assert [row["cells"][0] for row in allRows] == [
+        facility["facilityName"] for facility in stub.facilityData["facilities"]
+    ]
+    assert [link["title"] for link in allRows[2]["links"]] == [
+        "View bookings for this facility",
+        "Make a booking for this facility",
+    ]
+
+
+def test_facility_rows_without_table():
+    assert parseFacilityRows("<html><body>Log in</body></html>") is None
+
+
+def test_court_links(stub, webAssistant):
+    allRows = parseFacilityRows(stub.renderFacilities())
+    courtLinks = webAssistant.parseCourtLinks(allRows=allRows, courtNum=None)
+    assert courtLinks["viewing"] == {
+        "Court1": "/facilities/calendar/201",
+        "Court2": "/facilities/calendar/202",
+        "Court3": "/facilities/calendar/203",
+    }
+    assert courtLinks["booking"]["Court2"] == "/facilities/book/202"
+    # A single court leaves the others unset
+    courtLinks = webAssistant.parseCourtLinks(allRows=allRows, courtNum=2)
+    assert courtLinks["viewing"] == dict(Court1=None, Court2="/facilities/calendar/202")
+
+
+def test_calendar_feed_url(stub):
+    calendarEvents = parseCalendarEvents(stub.renderCalendar(201))
+    assert calendarEvents == dict(feedURL="/facilities/events/201", allEvents=list())
+
+
+def test_inline_calendar_events(stub, config, webAssistant):
+    calendarEvents = parseCalendarEvents(stub.renderCalendar(202))
+    assert calendarEvents["feedURL"] is None
+    assert [event["title"] for event in calendarEvents["allEvents"]] == [
+        "Bougainvillea-E-501",
+        "Lotus-C-304",
+    ]
+    bookingCount = webAssistant.countEventBookings(
+        allEvents=calendarEvents["allEvents"], apartmentName=config["apartmentName"]
+    )
+    assert bookingCount == 1
+    hourOwners = webAssistant.getHourOwners(
+        allEvents=calendarEvents["allEvents"],
+        apartmentName=config["apartmentName"],
+        bookingDate=datetime.date.today() + datetime.timedelta(days=1),
+    )
+    assert hourOwners == {18: "ours", 19: "taken"}
+
+
+def test_feed_event_bookings(stub, config, webAssistant):
+    # Today's 6:00 booking only counts until that hour has passed
+    bookingCount = webAssistant.countEventBookings(
+        allEvents=stub.getEvents(201), apartmentName=config["apartmentName"]
+    )
+    assert bookingCount == 1 + (datetime.datetime.now().hour <= 6)
@@ -0,0 +1,36 @@
+import sys
+import time
+
+import pytest
+
+from precise_scheduler import PreciseScheduler
+
+
+def getStealTicks() -> int:
+    # Time the hypervisor ran someone else on this VM's CPU, from the aggregate cpu line
+    with open("/proc/stat") as statFile:
+        return int(statFile.readline().split()[8])
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="timer resolution is only bounded on Linux")
+def test_wake_error_p90_under_1ms(config):
+    scheduler = PreciseScheduler(config=config)
+    allErrors = list()
+    for wakeIdx in range(200):
+        stealTicks = getStealTicks()
+        # Spread the wakes over the coarse, fine and spin phases
+        deadline = scheduler.clock() + 0.005 + (wakeIdx % 5) * 0.03
+        scheduler.sleepUntil(deadline=deadline)
+        wakeError = abs(time.perf_counter() - deadline)
+        # A wake the host stole the CPU during says nothing about the scheduler
+        if getStealTicks() == stealTicks:
+            allErrors.append(wakeError)
+    if len(allErrors) < 40:
+        pytest.skip(f"only {len(allErrors)} of 200 wakes ran without CPU steal")
+    allErrors.sort()
+    # The tail belongs to the OS preempting the spin on a loaded or single-core host,
+    # which no scheduler can help; the median and p90 are the scheduler's own
+    median = allErrors[len(allErrors) // 2]
+    p90 = allErrors[int(0.9 * (len(allErrors) - 1))]
+    assert median < 0.001, f"median wake error {median * 1000:.3f} ms"
+    assert p90 < 0.001, f"p90 wake error {p90 * 1000:.3f} ms"
@@ -0,0 +1,74 @@
+import io
+import time
+import logging
+import threading
+
+import pytest
+
+from queued_logging import QueuedLogging
+
+
+class SlowHandler(logging.StreamHandler):
+    # Stands in for a slow disk or console, and notes the thread that formats each record
+    def __init__(self, delay: float) -> None:
+        super().__init__(io.StringIO())
+        self.delay = delay
+        self.formatThreads: list = list()
+
+    def format(self, record: logging.LogRecord) -> str:
+        self.formatThreads.append(threading.current_thread().name)
+        return super().format(record)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        time.sleep(self.delay)
+        super().emit(record)
+
+
+@pytest.fixture
+def logSetup():
+    logger = logging.getLogger("test_queued_logging")
+    logger.setLevel(logging.INFO)
+    handler = SlowHandler(delay=0.02)
+    handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    queuedLogging = QueuedLogging()
+    queuedLogging.install(
+        config=dict(
+            queuedLogging=dict(enabled=True, quietWindow=False, quietLead=1, maxQuiet=1)
+        ),
+        loggerName=logger.name,
+    )
+    yield logger, handler, queuedLogging
+    queuedLogging.stop()
+    for currentHandler in list(logger.handlers):
+        logger.removeHandler(currentHandler)
+
+
+def test_log_call_returns_without_waiting_on_the_handler(logSetup):
+    logger, handler, queuedLogging = logSetup
+    allDelays = list()
+    for logIdx in range(20):
+        startTime = time.perf_counter()
+        logger.info(f"Message {logIdx}")
+        allDelays.append(time.perf_counter() - startTime)
+    allDelays.sort()
+    # The handler takes 20 ms a record, the call itself only enqueues; the tail is left
+    # out, a loaded host can preempt any single call
+    assert allDelays[len(allDelays) // 2] < 0.001
+    assert allDelays[int(0.9 * (len(allDelays) - 1))] < 0.005
+
+
+def test_records_are_formatted_and_written_by_the_listener(logSetup):
+    logger, handler, queuedLogging = logSetup
+    logger.info("Court %s booked", 1)
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("Confirm failed")
+    queuedLogging.stop()
+    output = handler.stream.getvalue()
+    assert "INFO Court 1 booked" in output
+    assert "ERROR Confirm failed" in output
+    assert "ZeroDivisionError" in output
+    assert threading.current_thread().name not in handler.formatThreads
+    assert len(handler.formatThreads) == 2
@@ -0,0 +1,67 @@
+import pytest
+
+from slot_seeker import SlotSeeker
+
+WINDOW_RECT = (0, 0, 480, 820)
+
+
+class RecordingInput:
+    def __init__(self) -> None:
+        self.allDrags: list = list()
+
+    def drag(self, appInfo: dict, startCoords: tuple, stopCoords: tuple, **pacing) -> None:
+        self.allDrags.append(startCoords[0] - stopCoords[0])
+        return
+
+
+@pytest.fixture
+def slotSeeker(config, tmp_path):
+    appConfig = config["app"]
+    appConfig["slotSeek"].update(calibrationFile=str(tmp_path / "seek.json"), settleTime=0)
+
+    def getCoordinates(element: str, windowRect: tuple, isAbsolute: bool = False) -> tuple:
+        position = appConfig["mousePosition"][element]
+        return (position["x"], position["y"])
+
+    return SlotSeeker(config=appConfig, getCoordinates=getCoordinates, inputDevice=RecordingInput())
+
+
+def seekPixels(slotSeeker: SlotSeeker, totalHours: int) -> int:
+    slotSeeker.inputDevice.allDrags = list()
+    slotSeeker.seek(totalHours=totalHours, appInfo=dict(windowRect=WINDOW_RECT))
+    return sum(slotSeeker.inputDevice.allDrags)
+
+
+def test_seek_drags_whole_hours(slotSeeker):
+    profile = slotSeeker.getProfile(WINDOW_RECT)
+    hoursPerDrag = int(profile["maxDragPixels"] // profile["pixelsPerHour"])
+    seekPixels(slotSeeker, 5)
+    assert len(slotSeeker.inputDevice.allDrags) == -(-5 // hoursPerDrag)
+    for distance in slotSeeker.inputDevice.allDrags:
+        assert distance <= profile["maxDragPixels"]
+        assert distance % profile["pixelsPerHour"] == 0
+
+
+def test_missed_seek_recalibrates_the_window_size(slotSeeker):
+    pixelsPerHour = slotSeeker.getProfile(WINDOW_RECT)["pixelsPerHour"]
+    # Five hours' worth of pixels only moved the strip four slots, so hours are wider
+    slotSeeker.recordVerification(
+        windowRect=WINDOW_RECT, totalHours=5, isMatch=False, landedHours=4
+    )
+    profile = slotSeeker.getProfile(WINDOW_RECT)
+    assert profile["pixelsPerHour"] == pytest.approx(pixelsPerHour * 5 / 4)
+    assert seekPixels(slotSeeker, 4) == pytest.approx(5 * pixelsPerHour, abs=2)
+    # Other window sizes keep their own calibration
+    assert slotSeeker.getProfile((0, 0, 960, 1640))["mismatched"] == 0
+
+
+def test_repeated_misses_stop_seeking(slotSeeker, config):
+    maxMismatches = config["app"]["slotSeek"]["maxMismatches"]
+    for _ in range(maxMismatches - 1):
+        slotSeeker.recordVerification(windowRect=WINDOW_RECT, totalHours=5, isMatch=False)
+    assert slotSeeker.isTrusted(WINDOW_RECT)
+    # A verified seek clears the run of misses
+    slotSeeker.recordVerification(windowRect=WINDOW_RECT, totalHours=5, isMatch=True)
+    for _ in range(maxMismatches):
+        slotSeeker.recordVerification(windowRect=WINDOW_RECT, totalHours=5, isMatch=False)
+    assert not slotSeeker.isTrusted(WINDOW_RECT)
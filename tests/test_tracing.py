@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from tracing import TraceReport, Tracer
+
+
+@pytest.fixture
+def tracingConfig(config, tmp_path):
+    config["tracing"].update(enabled=True, dir=str(tmp_path / "traces"))
+    return config
+
+
+def getSpans(name: str, allDurations: list, **attrs) -> list:
+    return [
+        dict(type="span", name=name, start=0, duration=duration, **attrs)
+        for duration in allDurations
+    ]
+
+
+def writeRun(tracingConfig: dict, runId: str, allSpans: list) -> None:
+    os.makedirs(tracingConfig["tracing"]["dir"], exist_ok=True)
+    allSpans = [dict(type="run", name="book", runId=runId, startEpoch=0)] + allSpans
+    traceFilePath = os.path.join(tracingConfig["tracing"]["dir"], f"trace_{runId}.jsonl")
+    with open(traceFilePath, "w") as traceFile:
+        traceFile.write("\n".join(json.dumps(span) for span in allSpans))
+    return
+
+
+def test_spans_are_written_when_the_run_ends(tracingConfig):
+    tracer = Tracer()
+    tracer.startRun(config=tracingConfig, runName="book")
+
+    @tracer.traced()
+    def navigateToBooking() -> None:
+        return
+
+    navigateToBooking()
+    with pytest.raises(ValueError):
+        with tracer.span("confirmBooking", appIdx=0) as attrs:
+            attrs["skewMs"] = 0.4
+            raise ValueError("Click failed")
+    assert not os.path.exists(tracingConfig["tracing"]["dir"])
+    tracer.finishRun()
+
+    (fileName,) = os.listdir(tracingConfig["tracing"]["dir"])
+    with open(os.path.join(tracingConfig["tracing"]["dir"], fileName)) as traceFile:
+        runInfo, navigateSpan, confirmSpan = [json.loads(line) for line in traceFile]
+    assert fileName == f"trace_{runInfo['runId']}.jsonl"
+    assert runInfo["name"] == "book"
+    assert navigateSpan["name"] == "navigateToBooking"
+    assert confirmSpan == dict(
+        confirmSpan, appIdx=0, skewMs=0.4, error="Click failed", type="span"
+    )
+    assert 0 <= navigateSpan["start"] <= confirmSpan["start"]
+    assert not tracer.isActive()
+
+
+def test_disabled_tracing_writes_nothing(tracingConfig):
+    tracingConfig["tracing"]["enabled"] = False
+    tracer = Tracer()
+    tracer.startRun(config=tracingConfig, runName="book")
+    with tracer.span("getAllBookingArgs"):
+        pass
+    tracer.finishRun()
+    assert not os.path.exists(tracingConfig["tracing"]["dir"])
+
+
+def test_report_compares_phases_across_runs(tracingConfig):
+    writeRun(tracingConfig, "20260101_070000", getSpans("navigate", [10, 11, 12]))
+    writeRun(tracingConfig, "20260102_070000", getSpans("navigate", [10, 10, 11]))
+    writeRun(
+        tracingConfig,
+        "20260103_070000",
+        getSpans("navigate", [20, 21, 22]) + getSpans("confirmBooking", [0.1], skewMs=0.3),
+    )
+    report = TraceReport(config=tracingConfig)
+    runMetrics = report.getRunMetrics(report.loadRuns()[-1])
+    assert runMetrics["confirmBooking"] == [0.1]
+    assert runMetrics["confirmBooking.skewMs"] == [0.3]
+
+    lines = report.getReport()
+    navigateLines = lines[lines.index("navigate") + 1 : lines.index("navigate") + 4]
+    assert [line.split()[0] for line in navigateLines] == [
+        "20260101_070000",
+        "20260102_070000",
+        "20260103_070000",
+    ]
+    # Only the night the median jumped by far more than the threshold is flagged
+    assert "regressed" not in navigateLines[1]
+    assert "regressed" in navigateLines[2]
+    # Millisecond attributes are reported but never judged against the seconds threshold
+    assert "confirmBooking.skewMs" in lines
+
+
+def test_percentiles_are_nearest_rank(tracingConfig):
+    report = TraceReport(config=tracingConfig)
+    allValues = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert report.getPercentile(allValues, 50) == 3.0
+    assert report.getPercentile(allValues, 95) == 5.0
+    assert report.getPercentile([7.0], 50) == 7.0